@@ -0,0 +1,168 @@
+import os
+import threading
+import time
+from .board import Board
+from .piece import Queen
+
+# Assumed until a search of the kind has been measured: mean effective branching factor of
+# minimax at depths 3-5 on random positions, and nodes per second on the grid backend.
+DEFAULT_BRANCHING_FACTOR = {"kpk": 4.5, "kqk": 8.0}
+DEFAULT_NODES_PER_SECOND = 10000
+# Weight of the newest search in the running averages.
+SMOOTHING = 0.2
+# Algorithms whose cost grows with ai_depth; the others are cheap or bound their own work.
+DEPTH_ALGORITHMS = ('minimax', 'pvs')
+# A downgraded time budget below this is not worth a search; greedy answers instead.
+MIN_TIME_BUDGET_MS = 100
+
+def material_key(board: Board) -> str:
+    return "kqk" if isinstance(board.white_piece, Queen) else "kpk"
+
+class Admission:
+    """How one AI search request runs, as decided by AdmissionController.admit().
+
+    action is "search" (as requested), "depth" or "time_budget" (a cheaper search), "greedy", or
+    "cache" once the caller answers a downgraded request from the analysis cache instead.
+    """
+    __slots__ = (
+        'client', 'kind', 'action', 'reason', 'requested_depth', 'depth', 'time_budget_ms',
+        'estimated_nodes', 'estimated_ms', 'predicted_ms', 'started', 'waited'
+    )
+
+    def __init__(self, client: str, kind: tuple[str, str], depth: int, time_budget_ms: int | None):
+        self.client = client
+        self.kind = kind
+        self.action = "search"
+        self.reason = None
+        self.requested_depth = self.depth = depth
+        self.time_budget_ms = time_budget_ms
+        self.estimated_nodes = 0
+        self.estimated_ms = self.predicted_ms = 0.0
+        self.started = time.perf_counter()
+        self.waited = False
+
+    @property
+    def downgraded(self) -> bool:
+        return self.action != "search"
+
+    def report(self) -> dict:
+        """The analysis["admission"] record of a downgraded request."""
+        return {
+            "action": self.action, "reason": self.reason, "requested_depth": self.requested_depth,
+            "depth": self.depth, "time_budget_ms": self.time_budget_ms, "estimated_nodes": self.estimated_nodes,
+            "estimated_ms": round(self.estimated_ms, 1), "predicted_ms": round(self.predicted_ms, 1)
+        }
+
+class AdmissionController:
+    """Estimates what a minimax/PVS search will cost and downgrades the requests that do not fit.
+
+    A search of depth d is expected to visit b^d nodes, b being the running average of the
+    effective branching factor measured for its material and algorithm, at the nodes per second
+    measured for them. Its predicted latency adds the estimated time left of the searches in
+    flight, spread over the workers, when no worker is free. A request may not be estimated above
+    max_nodes, a client's searches in flight above client_max_nodes, nor its predicted latency
+    above slo_ms. Such a request gets the deepest depth that fits (a smaller time budget when it
+    plays on one); when none does it is answered by greedy, unless the caller has a cached result.
+    """
+
+    def __init__(self, workers: int, slo_ms: float, max_nodes: int, client_max_nodes: int):
+        self.workers = workers
+        self.slo_ms = slo_ms
+        self.max_nodes = max_nodes
+        self.client_max_nodes = client_max_nodes
+        # (material, algorithm) -> running averages
+        self.branching_factors = {}
+        self.nodes_per_second = {}
+        self.in_flight: set[Admission] = set()
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.downgrades = {}
+
+    def estimate(self, kind: tuple[str, str], depth: int) -> tuple[int, float]:
+        """(nodes, milliseconds) a search of depth is expected to take."""
+        branching_factor = self.branching_factors.get(kind, DEFAULT_BRANCHING_FACTOR[kind[0]])
+        nodes = int(branching_factor ** depth)
+        return nodes, nodes / self.nodes_per_second.get(kind, DEFAULT_NODES_PER_SECOND) * 1000
+
+    def _wait_ms(self, now: float) -> float:
+        if len(self.in_flight) < self.workers:
+            return 0.0
+        left = sum(max(admission.estimated_ms - (now - admission.started) * 1000, 0.0) for admission in self.in_flight)
+        return left / self.workers
+
+    def admit(self, client: str, material: str, algorithm: str, depth: int, time_budget_ms: int | None) -> Admission:
+        """Decides how a request runs; pass it to release() once it has been answered."""
+        admission = Admission(client, (material, algorithm), depth, time_budget_ms)
+        if algorithm not in DEPTH_ALGORITHMS:
+            return admission
+        with self.lock:
+            now = time.perf_counter()
+            wait_ms = self._wait_ms(now)
+            admission.waited = wait_ms > 0
+            client_nodes = sum(other.estimated_nodes for other in self.in_flight if other.client == client)
+            if time_budget_ms is not None:
+                # An iterative search stops at its budget whatever its depth.
+                admission.estimated_ms = time_budget_ms
+                admission.predicted_ms = wait_ms + time_budget_ms
+                if admission.predicted_ms > self.slo_ms:
+                    admission.reason = "slo"
+                    admission.time_budget_ms = int(self.slo_ms - wait_ms)
+                    admission.action = "time_budget" if admission.time_budget_ms >= MIN_TIME_BUDGET_MS else "greedy"
+                    admission.estimated_ms = admission.time_budget_ms
+                    admission.predicted_ms = wait_ms + admission.estimated_ms
+                admission.estimated_nodes = int(admission.estimated_ms / 1000 * self.nodes_per_second.get(admission.kind, DEFAULT_NODES_PER_SECOND))
+            else:
+                for candidate in range(depth, 0, -1):
+                    nodes, estimated_ms = self.estimate(admission.kind, candidate)
+                    failed = (
+                        "request_cap" if nodes > self.max_nodes else
+                        "client_cap" if client_nodes + nodes > self.client_max_nodes else
+                        "slo" if wait_ms + estimated_ms > self.slo_ms else None
+                    )
+                    admission.reason = admission.reason or failed
+                    if failed is None:
+                        break
+                else:
+                    candidate, nodes, estimated_ms = 0, 0, 0.0
+                admission.depth, admission.estimated_nodes, admission.estimated_ms = candidate, nodes, estimated_ms
+                admission.predicted_ms = wait_ms + estimated_ms
+                if candidate == 0:
+                    admission.action = "greedy"
+                elif candidate < depth:
+                    admission.action = "depth"
+            self.admitted += 1
+            if admission.action != "greedy":
+                self.in_flight.add(admission)
+        return admission
+
+    def release(self, admission: Admission, analysis: dict | None = None):
+        """Ends an admitted request, learning from its search's analysis the branching factor and, when it did not queue, the speed."""
+        seconds = time.perf_counter() - admission.started
+        with self.lock:
+            self.in_flight.discard(admission)
+            if admission.downgraded:
+                self.downgrades[admission.action] = self.downgrades.get(admission.action, 0) + 1
+            if not analysis or admission.action in ("cache", "greedy") or admission.kind[1] not in DEPTH_ALGORITHMS:
+                return
+            if analysis.get("search_depth", 0) >= 2 and analysis.get("effective_branching_factor"):
+                previous = self.branching_factors.get(admission.kind, DEFAULT_BRANCHING_FACTOR[admission.kind[0]])
+                self.branching_factors[admission.kind] = previous + SMOOTHING * (analysis["effective_branching_factor"] - previous)
+            if not admission.waited and analysis.get("nodes_visited") and seconds > 0:
+                previous = self.nodes_per_second.get(admission.kind, DEFAULT_NODES_PER_SECOND)
+                self.nodes_per_second[admission.kind] = previous + SMOOTHING * (analysis["nodes_visited"] / seconds - previous)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "slo_ms": self.slo_ms, "max_nodes": self.max_nodes, "client_max_nodes": self.client_max_nodes,
+                "admitted": self.admitted, "in_flight": len(self.in_flight), "downgrades": dict(self.downgrades),
+                "branching_factors": {f"{material}/{algorithm}": round(value, 3) for (material, algorithm), value in self.branching_factors.items()},
+                "nodes_per_second": {f"{material}/{algorithm}": int(value) for (material, algorithm), value in self.nodes_per_second.items()}
+            }
+
+def create_admission_controller(workers: int) -> AdmissionController:
+    """Builds the controller from ADMISSION_SLO_MS (default SEARCH_TIMEOUT_MS), ADMISSION_MAX_NODES and ADMISSION_CLIENT_MAX_NODES."""
+    slo_ms = float(os.getenv("ADMISSION_SLO_MS", os.getenv("SEARCH_TIMEOUT_MS", "30000")))
+    max_nodes = int(os.getenv("ADMISSION_MAX_NODES", "1000000"))
+    client_max_nodes = int(os.getenv("ADMISSION_CLIENT_MAX_NODES", str(2 * max_nodes)))
+    return AdmissionController(workers, slo_ms, max_nodes, client_max_nodes)
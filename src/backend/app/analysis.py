@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import AsyncIterator, Iterable, Iterator
+from .game import BOARD_BACKENDS, Game
+from .positions import load_epd, load_position
+from .solver import SELECTIVE_OPTIONS
+from .workers import SearchPool, SearchPoolFull
+
+# How long a batch waits before retrying when interactive searches fill the pool.
+POOL_FULL_RETRY_SECONDS = 0.1
+
+def read_positions(lines: Iterable[str], config: dict, board_backend: str = 'grid') -> Iterator[dict]:
+    """Parses a position file lazily into {"index", "id", "state", "cache_key"} records, or {"index", "id", "error"}.
+
+    A line containing '/' is an EPD record ("placement side; id name", as in bench.py). Other
+    lines are read three at a time like /api/setup_from_file (WK, WP, BK) with white to move;
+    blank lines only separate positions. state is a Game.to_state() snapshot for SearchPool
+    and cache_key the game's Game.cache_key().
+    """
+    index, block = 0, []
+    for line in lines:
+        line = line.strip()
+        if not line or '/' in line:
+            if block:
+                yield {"index": index, "id": " ".join(block), "error": "Expected three lines: WK, WP, BK."}
+                index, block = index + 1, []
+            if line:
+                yield _position_record(index, line, lambda: load_epd(line, board_backend), config)
+                index += 1
+            continue
+        block.append(line)
+        if len(block) == 3:
+            text = "\n".join(block)
+            yield _position_record(index, " ".join(block), lambda: (" ".join(block), load_position(text, board_backend)), config)
+            index, block = index + 1, []
+    if block:
+        yield {"index": index, "id": " ".join(block), "error": "Expected three lines: WK, WP, BK."}
+
+def _position_record(index: int, name: str, load, config: dict) -> dict:
+    try:
+        name, board = load()
+    except (ValueError, IndexError) as e:
+        return {"index": index, "id": name, "error": f"Invalid position: {e}"}
+    if not (board.white_king and board.white_piece and board.black_king):
+        return {"index": index, "id": name, "error": "Invalid position: needs a white king, a white pawn or queen and a black king."}
+    game = Game()
+    game.board, game.solver_config = board, config
+    return {"index": index, "id": name, "state": game.to_state(), "cache_key": game.cache_key()}
+
+def format_result(record: dict, result, seconds: float) -> dict:
+    """One NDJSON row for a finished run_search() or AnalysisCache.get() result."""
+    row = {"index": record["index"], "id": record["id"]}
+    if result is None:
+        # No legal moves: the side to move is mated or stalemated.
+        return {**row, "best_move": None, "evaluation": None, "mate_in": None, "nodes": 0, "seconds": round(seconds, 4)}
+    ((from_row, from_col), (to_row, to_col)), evaluation, analysis = result
+    game = Game()
+    row = {
+        **row,
+        "best_move": game.coords_to_notation(from_row, from_col) + game.coords_to_notation(to_row, to_col),
+        "evaluation": evaluation, "mate_in": game.calculate_mate_in(evaluation, analysis.get("search_depth")),
+        "nodes": analysis.get("nodes_visited", 0), "search_depth": analysis.get("search_depth"),
+        "seconds": round(seconds, 4)
+    }
+    if analysis.get("cache") == "hit":
+        row.update(nodes=0, cached=True)
+    return row
+
+async def _analyse(pool: SearchPool, record: dict, time_budget_ms: int | None, timeout_seconds: float, cache=None) -> dict:
+    time_start = time.perf_counter()
+    # Only fixed-depth searches are answered from the cache; budgeted ones still fill it.
+    if cache is not None and time_budget_ms is None:
+        result = await asyncio.to_thread(cache.get, *record["cache_key"])
+        if result is not None:
+            return format_result(record, result, time.perf_counter() - time_start)
+    while True:
+        try:
+            result = await pool.search(record["state"], time_budget_ms, timeout_seconds)
+            if cache is not None:
+                await asyncio.to_thread(cache.put, *record["cache_key"], result)
+            return format_result(record, result, time.perf_counter() - time_start)
+        except SearchPoolFull:
+            await asyncio.sleep(POOL_FULL_RETRY_SECONDS)
+        except TimeoutError:
+            return {"index": record["index"], "id": record["id"], "error": "AI search timed out."}
+        except Exception as e:
+            return {"index": record["index"], "id": record["id"], "error": f"Search failed: {e}"}
+
+async def analyse_stream(pool: SearchPool, records: Iterable[dict], time_budget_ms: int | None, timeout_seconds: float, max_in_flight: int, cache=None) -> AsyncIterator[dict]:
+    """Yields one result row per record, in completion order.
+
+    At most max_in_flight records are parsed and submitted ahead of the results, so memory
+    stays bounded however long the input is. Closing the generator cancels those searches.
+    With an AnalysisCache, rows it can answer are marked "cached" and new results are stored.
+    """
+    records, pending, exhausted = iter(records), set(), False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                record = next(records, None)
+                if record is None:
+                    exhausted = True
+                elif "error" in record:
+                    yield record
+                else:
+                    pending.add(asyncio.ensure_future(_analyse(pool, record, time_budget_ms, timeout_seconds, cache)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+def read_checkpoint(path: str) -> set[int]:
+    """Indices already written to an NDJSON output. A half-written last line is cut off so appending continues cleanly."""
+    if not os.path.exists(path):
+        return set()
+    done, valid_bytes = set(), 0
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["index"])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(line)
+    with open(path, "r+b") as f:
+        f.truncate(valid_bytes)
+    return done
+
+async def analyse_file(input_path: str, output_path: str, config: dict, board_backend: str, workers: int, timeout_seconds: float, resume: bool = True) -> dict:
+    done = read_checkpoint(output_path) if resume else set()
+    pool = SearchPool(workers, max_queue=workers)
+    counts = {"skipped": len(done), "analysed": 0, "errors": 0}
+    try:
+        with open(input_path) as source, open(output_path, "a" if resume else "w") as output:
+            records = (record for record in read_positions(source, config, board_backend) if record["index"] not in done)
+            async for row in analyse_stream(pool, records, config["time_budget_ms"], timeout_seconds, workers):
+                output.write(json.dumps(row) + "\n")
+                output.flush()
+                counts["errors" if "error" in row else "analysed"] += 1
+    finally:
+        pool.shutdown()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse a file of positions and write one NDJSON result per position.")
+    parser.add_argument("input", help="EPD lines and/or three-line WK/WP/BK blocks.")
+    parser.add_argument("output", help="NDJSON file. Positions already in it are skipped unless --restart is given.")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--algorithm", choices=["minimax", "pvs", "greedy", "tablebase", "pns"], default="minimax")
+    parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default="grid")
+    parser.add_argument("--time-budget-ms", type=int)
+    parser.add_argument("--selective", nargs="+", choices=SELECTIVE_OPTIONS, default=[], help="Selective search options for minimax/pvs.")
+    parser.add_argument("--timeout-ms", type=int, help="Give up on a single position after this long.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--restart", action="store_true", help="Overwrite the output instead of resuming.")
+    args = parser.parse_args()
+
+    config = {"algorithm": args.algorithm, "ai_depth": args.depth, "time_budget_ms": args.time_budget_ms, "threads": 1, "selective": sorted(args.selective)}
+    timeout_seconds = args.timeout_ms / 1000 if args.timeout_ms else float("inf")
+    time_start = time.perf_counter()
+    counts = asyncio.run(analyse_file(args.input, args.output, config, args.backend, args.workers, timeout_seconds, not args.restart))
+    print(f"{counts['analysed']} analysed, {counts['errors']} errors, {counts['skipped']} already done "
+          f"in {time.perf_counter() - time_start:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+import argparse
+import copy
+import json
+import platform
+import random
+import re
+import sys
+import time
+import tracemalloc
+from .board import Board, GameHistory
+from .game import BOARD_BACKENDS
+from .greedy import GreedySolver
+from .minimax import StaticEvaluator, MATE_THRESHOLD
+from .parallel import ParallelAISolver, get_root_pool
+from .pns import ProofNumberSolver
+from .positions import load_epd, load_position
+from .pvs import PVSSolver
+from .solver import AISolver, SELECTIVE_OPTIONS
+from .tablebase import load_tablebase
+
+# White to move, one position per line in the same order as Board.from_text: WK, WP, BK.
+BENCH_POSITIONS = [
+    "e1\ne2\ne8",
+    "d5\nd4\nd7",
+    "b6\nb5\nb8",
+]
+
+# EPD-style records: placement, side to move, then "; id". Reports from different commits
+# are compared by id, so change a record only together with its id. The perft totals were
+# checked against the original grid move generator (depths 1-4) and the bitboard backend.
+PERFT_SUITE = [
+    ("4k3/8/8/8/8/8/4P3/4K3 w; id kpk-start", [6, 30, 210, 1424, 10819, 72339]),
+    ("8/3k4/8/3K4/3P4/8/8/8 b; id kpk-opposition", [5, 31, 154, 1146, 6552, 51180]),
+    ("7k/8/5K2/8/8/8/8/6Q1 w; id kqk-corner", [28, 38, 1006, 2640, 72447, 181761]),
+]
+
+SEARCH_SUITE = [
+    "4k3/8/8/8/8/8/4P3/4K3 w; id kpk-start",
+    "3k4/8/8/3K4/3P4/8/8/8 w; id kpk-opposition",
+    "1k6/8/1K6/1P6/8/8/8/8 w; id kpk-knight-file",
+    "8/8/8/4k3/8/8/P7/K7 w; id kpk-rook-pawn",
+    "8/8/2k5/8/8/8/6P1/5K2 b; id kpk-defender-close",
+    "8/8/8/3k4/8/8/8/Q3K3 w; id kqk-center",
+    "7k/8/5K2/8/8/8/8/6Q1 w; id kqk-corner",
+    "8/8/8/8/8/2k5/8/Q6K b; id kqk-black-to-move",
+]
+
+# Positions where PVS once scored differently from minimax, checked by bench_pvs besides SEARCH_SUITE.
+PVS_POSITIONS = [
+    "8/8/4K3/8/Q7/3k4/8/8 w; id kqk-scout-bound",
+]
+
+def perft(board: Board, depth: int) -> int:
+    if depth == 0:
+        return 1
+    nodes = 0
+    for piece, moves in board.get_all_legal_moves(board.to_move).items():
+        for move in moves:
+            if depth == 1:
+                nodes += 1
+                continue
+            board.push((piece, move))
+            nodes += perft(board, depth - 1)
+            board.pop()
+    return nodes
+
+def bench_perft(max_depth: int, board_backend: str = 'grid'):
+    rows = []
+    for record, expected in PERFT_SUITE:
+        name, board = load_epd(record, board_backend)
+        for depth in range(1, min(max_depth, len(expected)) + 1):
+            time_start = time.perf_counter()
+            nodes = perft(board, depth)
+            rows.append({
+                "id": name, "depth": depth, "nodes": nodes, "expected": expected[depth - 1],
+                "ok": nodes == expected[depth - 1], "seconds": round(time.perf_counter() - time_start, 4)
+            })
+    return rows
+
+def _peak_memory(search) -> int:
+    tracemalloc.start()
+    try:
+        search()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def _move_text(result) -> str | None:
+    if not result:
+        return None
+    (piece, (row, col)), _, _ = result
+    return f"{chr(ord('a') + piece.col)}{8 - piece.row}{chr(ord('a') + col)}{8 - row}"
+
+def bench_suite(depth: int, board_backend: str = 'grid', measure_memory: bool = True):
+    """Runs SEARCH_SUITE with minimax (every depth up to `depth`) and greedy.
+
+    Each depth gets a fresh solver, so time-to-depth is the cost of reaching that depth from
+    scratch. Peak memory comes from a separate traced run because tracing slows the search.
+    """
+    rows = []
+    for record in SEARCH_SUITE:
+        name, _ = load_epd(record, board_backend)
+        time_to_depth, nodes, seconds, result = {}, 0, 0.0, None
+        for search_depth in range(1, depth + 1):
+            _, board = load_epd(record, board_backend)
+            solver = AISolver(StaticEvaluator(), search_depth=search_depth)
+            time_start = time.perf_counter()
+            result = solver.find_best_move(board)
+            seconds = time.perf_counter() - time_start
+            time_to_depth[search_depth] = round(seconds, 4)
+            nodes = result[2]["nodes_visited"] if result else 0
+        row = {
+            "id": name, "algorithm": "minimax", "depth": depth, "best_move": _move_text(result),
+            "evaluation": result[1] if result else None, "nodes": nodes, "seconds": round(seconds, 4),
+            "nodes_per_second": int(nodes / seconds) if seconds else 0, "time_to_depth": time_to_depth
+        }
+        if measure_memory:
+            _, board = load_epd(record, board_backend)
+            row["peak_memory_bytes"] = _peak_memory(lambda: AISolver(StaticEvaluator(), search_depth=depth).find_best_move(board))
+        rows.append(row)
+
+        _, board = load_epd(record, board_backend)
+        # The greedy fallback picks a random move, so seed it for comparable runs.
+        random.seed(0)
+        time_start = time.perf_counter()
+        result = GreedySolver().find_best_move(board)
+        seconds = time.perf_counter() - time_start
+        row = {
+            "id": name, "algorithm": "greedy", "best_move": _move_text(result),
+            "evaluation": result[1] if result else None,
+            "decision_rule": result[2]["decision_rule"] if result else None, "seconds": round(seconds, 6)
+        }
+        if measure_memory:
+            _, board = load_epd(record, board_backend)
+            random.seed(0)
+            row["peak_memory_bytes"] = _peak_memory(lambda: GreedySolver().find_best_move(board))
+        rows.append(row)
+    return rows
+
+def bench_mate(max_depth: int, max_nodes: int, board_backend: str = 'grid'):
+    """Nodes ProofNumberSolver needs to prove a mate on SEARCH_SUITE, against minimax deepening until it scores one.
+
+    minimax_nodes adds up depths 1 to the first depth with a mate score (or max_depth), as iterative deepening pays them.
+    """
+    rows = []
+    for record in SEARCH_SUITE:
+        name, board = load_epd(record, board_backend)
+        proof = ProofNumberSolver(max_nodes=max_nodes).prove(board)
+        minimax_nodes, mate_depth = 0, None
+        for depth in range(1, max_depth + 1):
+            _, board = load_epd(record, board_backend)
+            result = AISolver(StaticEvaluator(), search_depth=depth).find_best_move(board)
+            minimax_nodes += result[2]["nodes_visited"] if result else 0
+            if result and abs(result[1]) >= MATE_THRESHOLD:
+                mate_depth = depth
+                break
+        rows.append({
+            "id": name, "result": proof["result"], "plies": proof.get("plies"), "pns_nodes": proof["nodes"],
+            "pns_seconds": proof["seconds"], "minimax_mate_depth": mate_depth, "minimax_nodes": minimax_nodes
+        })
+    return rows
+
+def bench_selective(depth: int, count: int, board_backend: str = 'grid'):
+    """Minimax without tablebase leaves at depth, with no selective search, each option alone and all of them.
+
+    Runs on the won positions among random_positions(count). A move solves its position when the
+    tablebase still scores it a win and, when the mate is within depth plies, a shortest mate.
+    """
+    tablebase = load_tablebase()
+    if tablebase is None:
+        raise SystemExit("The selective benchmark grades moves with the tablebase: run python -m app.tablebase generate first.")
+    positions = [board for board in random_positions(count, board_backend) if tablebase.probe_dtm(board) is not None]
+    rows = []
+    for name, selective in [("none", ()), *((option, (option,)) for option in SELECTIVE_OPTIONS), ("all", SELECTIVE_OPTIONS)]:
+        solved = nodes = 0
+        time_start = time.perf_counter()
+        for board in positions:
+            dtm = tablebase.probe_dtm(board)
+            (piece, move), _, analysis = AISolver(StaticEvaluator(), search_depth=depth, selective=selective).find_best_move(board)
+            nodes += analysis["nodes_visited"]
+            board.push((piece, move))
+            reply_dtm = tablebase.probe_dtm(board) if tablebase.covers(board) else None
+            board.pop()
+            solved += reply_dtm is not None and (dtm > depth or reply_dtm == dtm - 1)
+        rows.append({
+            "selective": name, "positions": len(positions), "solved": solved, "nodes": nodes,
+            "nodes_per_solved": nodes // solved if solved else None, "seconds": round(time.perf_counter() - time_start, 2)
+        })
+    return rows
+
+def _search_excluding(solver: AISolver, board: Board, depth: int, excluded: set) -> tuple | None:
+    """(root move, value) of a fixed-depth search that skips the excluded root moves, as one more request would."""
+    legal_moves = {}
+    for piece, moves in solver.start_search(board).items():
+        remaining = {move for move in moves if ((piece.row, piece.col), move) not in excluded}
+        if remaining:
+            legal_moves[piece] = remaining
+    if not legal_moves:
+        return None
+    if solver.use_pvs:
+        (piece, move), value, _ = solver.iterative_deepening(board, legal_moves, None, depth)
+    else:
+        (piece, move), value = solver.search_root(board, legal_moves, depth)
+    return ((piece.row, piece.col), move), value
+
+def bench_multipv(depth: int, lines: int, algorithm: str = 'minimax', board_backend: str = 'grid'):
+    """One multipv search for the best `lines` root moves on SEARCH_SUITE, against that many searches excluding the moves already found.
+
+    same_scores says whether both found the same scores, best first; tied moves may come in a different order, and
+    transposition table hits, which depend on what was searched before, can change a runner-up's score a little.
+    """
+    solver_class = PVSSolver if algorithm == 'pvs' else AISolver
+    rows = []
+    for record in SEARCH_SUITE:
+        name, board = load_epd(record, board_backend)
+        # Untimed, so that both timings find the position status cache warm.
+        solver_class(StaticEvaluator(), search_depth=depth).find_best_move(board, multipv=lines)
+        solver = solver_class(StaticEvaluator(), search_depth=depth)
+        time_start = time.perf_counter()
+        _, _, analysis = solver.find_best_move(board, multipv=lines)
+        multipv_seconds = time.perf_counter() - time_start
+        multipv_nodes = analysis["nodes_visited"]
+        excluded, values, separate_nodes = set(), [], 0
+        time_start = time.perf_counter()
+        for _ in range(lines):
+            solver = solver_class(StaticEvaluator(), search_depth=depth)
+            result = _search_excluding(solver, board, depth, excluded)
+            separate_nodes += solver.move_count
+            if result is None:
+                break
+            excluded.add(result[0])
+            values.append(result[1])
+        separate_seconds = time.perf_counter() - time_start
+        rows.append({
+            "id": name, "lines": len(analysis["multipv"]), "multipv_nodes": multipv_nodes, "multipv_seconds": round(multipv_seconds, 4),
+            "separate_nodes": separate_nodes, "separate_seconds": round(separate_seconds, 4),
+            "same_scores": [line["evaluation"] for line in analysis["multipv"]] == values
+        })
+    return rows
+
+def bench_pvs(depth: int, count: int, board_backend: str = 'grid'):
+    """Minimax and PVS scores at a fixed depth on SEARCH_SUITE, PVS_POSITIONS and random_positions(count); ok when they agree."""
+    positions = [load_epd(record, board_backend) for record in SEARCH_SUITE + PVS_POSITIONS]
+    positions += [(f"random-{index}", board) for index, board in enumerate(random_positions(count, board_backend))]
+    rows = []
+    for name, board in positions:
+        _, minimax_value, minimax_analysis = AISolver(StaticEvaluator(), search_depth=depth).find_best_move(board)
+        _, pvs_value, pvs_analysis = PVSSolver(StaticEvaluator(), search_depth=depth).find_best_move(board)
+        rows.append({
+            "id": name, "minimax": minimax_value, "pvs": pvs_value, "minimax_nodes": minimax_analysis["nodes_visited"],
+            "pvs_nodes": pvs_analysis["nodes_visited"], "ok": minimax_value == pvs_value
+        })
+    return rows
+
+class CopyingAISolver(AISolver):
+    """AISolver that searches a deepcopy of the board at every node, as minimax did before Board.push/pop."""
+
+    def minimax(self, board: Board, depth: int, alpha: float, beta: float, is_maximizing_player: bool, history: set, ply: int | None = None):
+        return super().minimax(copy.deepcopy(board), depth, alpha, beta, is_maximizing_player, history, ply)
+
+def _time_search(solver_class, depth: int, board_backend: str) -> tuple[int, float]:
+    """(nodes, seconds) of one solver_class searching BENCH_POSITIONS in turn."""
+    solver = solver_class(StaticEvaluator(), search_depth=depth)
+    total_nodes, total_time = 0, 0.0
+    for position in BENCH_POSITIONS:
+        board = load_position(position, board_backend)
+        time_start = time.perf_counter()
+        _, _, analysis = solver.find_best_move(board)
+        total_time += time.perf_counter() - time_start
+        total_nodes += analysis["nodes_visited"]
+    return total_nodes, total_time
+
+def bench_search(depths: list[int], board_backend: str = 'grid', reference: bool = False):
+    """Minimax nodes/s on BENCH_POSITIONS; with reference also CopyingAISolver's, which must search the same nodes."""
+    rows = []
+    for depth in depths:
+        if reference:
+            # Untimed, so that both timings find the position status cache warm.
+            _time_search(AISolver, depth, board_backend)
+        total_nodes, total_time = _time_search(AISolver, depth, board_backend)
+        row = {
+            "depth": depth, "nodes": total_nodes, "seconds": round(total_time, 3),
+            "nodes_per_second": int(total_nodes / total_time) if total_time else 0
+        }
+        if reference:
+            copy_nodes, copy_time = _time_search(CopyingAISolver, depth, board_backend)
+            row.update({
+                "copy_nodes": copy_nodes, "copy_seconds": round(copy_time, 3),
+                "copy_nodes_per_second": int(copy_nodes / copy_time) if copy_time else 0
+            })
+        rows.append(row)
+    return rows
+
+def bench_scaling(depth: int, thread_counts: list[int], board_backend: str = 'grid'):
+    """Times fixed-depth searches of BENCH_POSITIONS with each worker count against the serial search.
+
+    The root pool has SEARCH_THREADS workers, so larger counts run like that one.
+    """
+    rows, serial_results, serial_time = [], None, None
+    for threads in [1] + [t for t in thread_counts if t != 1]:
+        if threads > 1:
+            # Start the worker processes before timing.
+            get_root_pool().executor.submit(int).result()
+        results, total_time = [], 0.0
+        for position in BENCH_POSITIONS:
+            solver = ParallelAISolver(StaticEvaluator(), search_depth=depth, threads=threads)
+            board = load_position(position, board_backend)
+            time_start = time.perf_counter()
+            (piece, move), value, _ = solver.find_best_move(board)
+            total_time += time.perf_counter() - time_start
+            results.append(((piece.row, piece.col), move, value))
+        if threads == 1:
+            serial_results, serial_time = results, total_time
+        if threads in thread_counts:
+            rows.append({
+                "threads": threads, "seconds": round(total_time, 3),
+                "speedup": round(serial_time / total_time, 2) if total_time else 0.0,
+                "matches_serial": results == serial_results
+            })
+    return rows
+
+def play_long_game(plies: int, board_backend: str = 'grid', seed: int = 0) -> Board:
+    """A game of plies random king moves around a pawn that never moves, so it never ends."""
+    _, board = load_epd("8/8/8/3k4/8/8/P7/K7 w; id long-game", board_backend)
+    rng = random.Random(seed)
+    for _ in range(plies):
+        king = board.white_king if board.to_move == 'white' else board.black_king
+        moves = sorted(move for move in board.get_legal_moves_for_piece(king) if board.get_piece(*move) is None)
+        board.make_move(king, *rng.choice(moves))
+    return board
+
+def random_positions(count: int, board_backend: str = 'grid', seed: int = 0) -> list[Board]:
+    """count legal white-to-move KPK and KQK positions, half of each, with black not in check."""
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < count:
+        piece = 'P' if len(boards) % 2 == 0 else 'Q'
+        white_king, black_king = rng.sample(range(64), 2)
+        piece_square = rng.randrange(8, 56) if piece == 'P' else rng.randrange(64)
+        if len({white_king, black_king, piece_square}) < 3 or max(abs(white_king // 8 - black_king // 8), abs(white_king % 8 - black_king % 8)) <= 1:
+            continue
+        rows = [["1"] * 8 for _ in range(8)]
+        rows[white_king // 8][white_king % 8], rows[black_king // 8][black_king % 8], rows[piece_square // 8][piece_square % 8] = 'K', 'k', piece
+        placement = "/".join(re.sub("1+", lambda run: str(len(run.group())), "".join(row)) for row in rows)
+        _, board = load_epd(f"{placement} w; id random", board_backend)
+        if not board.is_check('black'):
+            boards.append(board)
+    return boards
+
+def bench_greedy(count: int, board_backend: str = 'grid'):
+    """Per-move GreedySolver latency over random positions, and how often each rule decided."""
+    boards = random_positions(count, board_backend)
+    solver, latencies, rules = GreedySolver(), [], {}
+    random.seed(0)
+    for board in boards:
+        time_start = time.perf_counter()
+        result = solver.find_best_move(board)
+        latencies.append(time.perf_counter() - time_start)
+        rule = result[2]["decision_rule"] if result else "No Move"
+        rules[rule] = rules.get(rule, 0) + 1
+    latencies.sort()
+    return {
+        "positions": count, "moves_per_second": int(count / sum(latencies)),
+        "mean_us": round(sum(latencies) / count * 1e6, 1), "p50_us": round(latencies[count // 2] * 1e6, 1),
+        "p99_us": round(latencies[min(count - 1, count * 99 // 100)] * 1e6, 1), "rules": rules
+    }
+
+def _retained_memory(build) -> int:
+    """Bytes still allocated by build()'s result once it returns."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        retained = tracemalloc.get_traced_memory()[0] - before
+        del result
+        return retained
+    finally:
+        tracemalloc.stop()
+
+def bench_history(plies_list: list[int], board_backend: str = 'grid', seeks: int = 2000):
+    """History memory of a long game and playback seek latency, against one FEN string per ply."""
+    rows = []
+    for plies in plies_list:
+        board = play_long_game(plies, board_backend)
+        state = board.history.to_state()
+        history_bytes = _retained_memory(lambda: GameHistory.from_state(state))
+
+        def fen_history():
+            fens = []
+            for ply in range(len(board.history)):
+                board.load_position(board.history.position(ply))
+                fens.append(board.to_fen())
+            return fens
+        fen_bytes = _retained_memory(fen_history)
+        fens = fen_history()
+        targets = [random.Random(ply).randrange(len(fens)) for ply in range(seeks)]
+        time_start = time.perf_counter()
+        for ply in targets:
+            board.load_position(board.history.position(ply))
+        seek_seconds = time.perf_counter() - time_start
+        time_start = time.perf_counter()
+        for ply in targets:
+            board.load_from_fen(fens[ply])
+        fen_seconds = time.perf_counter() - time_start
+        rows.append({
+            "plies": plies, "history_bytes": history_bytes, "fen_history_bytes": fen_bytes,
+            "seek_us": round(seek_seconds / seeks * 1e6, 2), "fen_seek_us": round(fen_seconds / seeks * 1e6, 2)
+        })
+    return rows
+
+# Must stay identical between commits unless move generation or search results change on purpose.
+EXACT_FIELDS = ("nodes", "ok", "best_move", "evaluation", "decision_rule")
+
+def compare_reports(old: dict, new: dict, tolerance: float = 0.1) -> list[str]:
+    """Lists changed results, and slowdowns beyond tolerance, between two suite reports."""
+    problems = []
+    for section in ("perft", "suite"):
+        old_rows = {(row["id"], row.get("algorithm"), row.get("depth")): row for row in old.get(section, [])}
+        for row in new.get(section, []):
+            key = (row["id"], row.get("algorithm"), row.get("depth"))
+            if key not in old_rows:
+                continue
+            old_row, label = old_rows[key], " ".join(str(part) for part in key if part is not None)
+            for field in EXACT_FIELDS:
+                if field in row and row[field] != old_row.get(field):
+                    problems.append(f"{section} {label}: {field} {old_row.get(field)} -> {row[field]}")
+            if old_row.get("seconds") and row["seconds"] > old_row["seconds"] * (1 + tolerance):
+                problems.append(f"{section} {label}: seconds {old_row['seconds']} -> {row['seconds']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks and move generation checks for the KPK/KQK engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search_parser = commands.add_parser("search", help="Minimax nodes/s on BENCH_POSITIONS.")
+    search_parser.add_argument("--depths", type=int, nargs="+", default=[5, 6, 7, 8, 9])
+    search_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+    search_parser.add_argument("--threads", type=int, nargs="+", help="Report root-parallel speedup for these worker counts, e.g. 1 2 4 8.")
+    search_parser.add_argument("--reference", action="store_true", help="Also time the deepcopy-per-node search it replaced.")
+
+    perft_parser = commands.add_parser("perft", help="Count PERFT_SUITE leaf nodes and check them against the known totals.")
+    perft_parser.add_argument("--depth", type=int, default=5)
+    perft_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+
+    suite_parser = commands.add_parser("suite", help="perft plus minimax and greedy on SEARCH_SUITE.")
+    suite_parser.add_argument("--depth", type=int, default=6)
+    suite_parser.add_argument("--perft-depth", type=int, default=4)
+    suite_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+    suite_parser.add_argument("--no-memory", action="store_true", help="Skip the traced peak-memory runs.")
+    suite_parser.add_argument("--json", help="Write the report to this file instead of stdout.")
+
+    history_parser = commands.add_parser("history", help="Game history memory and playback seek time for long games.")
+    history_parser.add_argument("--plies", type=int, nargs="+", default=[100, 1000, 10000])
+    history_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+
+    greedy_parser = commands.add_parser("greedy", help="GreedySolver per-move latency on random KPK/KQK positions.")
+    greedy_parser.add_argument("--positions", type=int, default=2000)
+    greedy_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+
+    mate_parser = commands.add_parser("mate", help="Proof-number mate search against minimax on SEARCH_SUITE.")
+    mate_parser.add_argument("--max-depth", type=int, default=6, help="Deepest minimax search tried.")
+    mate_parser.add_argument("--max-nodes", type=int, default=200000)
+    mate_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+
+    selective_parser = commands.add_parser("selective", help="Nodes per correctly solved random position for each selective search option.")
+    selective_parser.add_argument("--depth", type=int, default=4)
+    selective_parser.add_argument("--positions", type=int, default=200)
+    selective_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+
+    multipv_parser = commands.add_parser("multipv", help="One multipv search against one search per line on SEARCH_SUITE.")
+    multipv_parser.add_argument("--depth", type=int, default=5)
+    multipv_parser.add_argument("--lines", type=int, default=3)
+    multipv_parser.add_argument("--algorithm", choices=["minimax", "pvs"], default="minimax")
+    multipv_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+
+    pvs_parser = commands.add_parser("pvs", help="Check that PVS scores SEARCH_SUITE and random positions like minimax.")
+    pvs_parser.add_argument("--depth", type=int, default=4)
+    pvs_parser.add_argument("--positions", type=int, default=50, help="Random positions checked besides the fixed ones.")
+    pvs_parser.add_argument("--backend", choices=sorted(BOARD_BACKENDS), default='grid')
+
+    compare_parser = commands.add_parser("compare", help="Diff two suite --json reports.")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown.")
+    args = parser.parse_args()
+
+    if args.command == "search" and args.threads:
+        print(f"{'depth':>5} {'threads':>7} {'seconds':>10} {'speedup':>8} {'same':>5}")
+        for depth in args.depths:
+            for row in bench_scaling(depth, args.threads, args.backend):
+                print(f"{depth:>5} {row['threads']:>7} {row['seconds']:>10} {row['speedup']:>8} {str(row['matches_serial']):>5}")
+    elif args.command == "search" and args.reference:
+        rows = bench_search(args.depths, args.backend, reference=True)
+        print(f"{'depth':>5} {'nodes':>10} {'copy nodes':>10} {'copy s':>10} {'copy n/s':>10} {'push/pop s':>10} {'push/pop n/s':>12} {'speedup':>8}")
+        for row in rows:
+            speedup = round(row["copy_seconds"] / row["seconds"], 2) if row["seconds"] else 0.0
+            print(f"{row['depth']:>5} {row['nodes']:>10} {row['copy_nodes']:>10} {row['copy_seconds']:>10} {row['copy_nodes_per_second']:>10} "
+                  f"{row['seconds']:>10} {row['nodes_per_second']:>12} {speedup:>8}{'' if row['nodes'] == row['copy_nodes'] else '  MISMATCH'}")
+        sys.exit(0 if all(row["nodes"] == row["copy_nodes"] for row in rows) else 1)
+    elif args.command == "search":
+        print(f"{'depth':>5} {'nodes':>10} {'seconds':>10} {'nodes/s':>10}")
+        for row in bench_search(args.depths, args.backend):
+            print(f"{row['depth']:>5} {row['nodes']:>10} {row['seconds']:>10} {row['nodes_per_second']:>10}")
+    elif args.command == "perft":
+        rows = bench_perft(args.depth, args.backend)
+        print(f"{'id':<20} {'depth':>5} {'nodes':>8} {'expected':>8} {'seconds':>8}")
+        for row in rows:
+            print(f"{row['id']:<20} {row['depth']:>5} {row['nodes']:>8} {row['expected']:>8} {row['seconds']:>8}{'' if row['ok'] else '  MISMATCH'}")
+        sys.exit(0 if all(row["ok"] for row in rows) else 1)
+    elif args.command == "suite":
+        report = {
+            "python": platform.python_version(), "backend": args.backend, "depth": args.depth,
+            "perft": bench_perft(args.perft_depth, args.backend),
+            "suite": bench_suite(args.depth, args.backend, not args.no_memory),
+            "history": bench_history([1000], args.backend)
+        }
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if args.json:
+            with open(args.json, "w") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        sys.exit(0 if all(row["ok"] for row in report["perft"]) else 1)
+    elif args.command == "history":
+        print(f"{'plies':>6} {'bytes':>9} {'fen bytes':>10} {'seek us':>8} {'fen us':>8}")
+        for row in bench_history(args.plies, args.backend):
+            print(f"{row['plies']:>6} {row['history_bytes']:>9} {row['fen_history_bytes']:>10} {row['seek_us']:>8} {row['fen_seek_us']:>8}")
+    elif args.command == "greedy":
+        report = bench_greedy(args.positions, args.backend)
+        print(f"{report['positions']} positions: {report['moves_per_second']} moves/s, "
+              f"mean {report['mean_us']} us, p50 {report['p50_us']} us, p99 {report['p99_us']} us")
+        for rule, count in sorted(report["rules"].items(), key=lambda item: -item[1]):
+            print(f"{count:>6}  {rule}")
+    elif args.command == "mate":
+        print(f"{'id':<20} {'result':>8} {'plies':>6} {'pns nodes':>10} {'pns s':>8} {'mm depth':>8} {'mm nodes':>10}")
+        for row in bench_mate(args.max_depth, args.max_nodes, args.backend):
+            print(f"{row['id']:<20} {row['result']:>8} {str(row['plies']):>6} {row['pns_nodes']:>10} {row['pns_seconds']:>8} "
+                  f"{str(row['minimax_mate_depth']):>8} {row['minimax_nodes']:>10}")
+    elif args.command == "selective":
+        print(f"{'selective':<24} {'solved':>11} {'nodes':>10} {'nodes/solved':>12} {'seconds':>8}")
+        for row in bench_selective(args.depth, args.positions, args.backend):
+            print(f"{row['selective']:<24} {row['solved']:>5}/{row['positions']:<5} {row['nodes']:>10} {str(row['nodes_per_solved']):>12} {row['seconds']:>8}")
+    elif args.command == "multipv":
+        print(f"{'id':<20} {'lines':>5} {'multipv nodes':>13} {'multipv s':>9} {'separate nodes':>14} {'separate s':>10} {'same':>5}")
+        for row in bench_multipv(args.depth, args.lines, args.algorithm, args.backend):
+            print(f"{row['id']:<20} {row['lines']:>5} {row['multipv_nodes']:>13} {row['multipv_seconds']:>9} "
+                  f"{row['separate_nodes']:>14} {row['separate_seconds']:>10} {str(row['same_scores']):>5}")
+    elif args.command == "pvs":
+        rows = bench_pvs(args.depth, args.positions, args.backend)
+        print(f"{'id':<20} {'minimax':>8} {'pvs':>8} {'mm nodes':>10} {'pvs nodes':>10}")
+        for row in rows:
+            if not row["ok"] or not row["id"].startswith("random-"):
+                print(f"{row['id']:<20} {row['minimax']:>8} {row['pvs']:>8} {row['minimax_nodes']:>10} {row['pvs_nodes']:>10}{'' if row['ok'] else '  MISMATCH'}")
+        print(f"{sum(not row['ok'] for row in rows)} of {len(rows)} positions scored differently.")
+        sys.exit(0 if all(row["ok"] for row in rows) else 1)
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        problems = compare_reports(old, new, args.tolerance)
+        print("\n".join(problems) if problems else "No differences.")
+        sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
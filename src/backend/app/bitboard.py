@@ -0,0 +1,140 @@
+from .board import Board
+from .piece import Piece, King, Pawn, Queen
+
+# Squares are indexed row * 8 + col, so bit 0 is a8 and bit 63 is h1.
+DIRECTIONS = [
+    (-1, -1), (-1, 0), (-1, 1), (0, -1),
+    (0, 1), (1, -1), (1, 0), (1, 1)
+]
+
+def square_index(row: int, col: int) -> int:
+    return row * 8 + col
+
+def _build_step_tables(steps):
+    masks, targets = [], []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        mask, square_targets = 0, []
+        for dr, dc in steps:
+            new_row, new_col = row + dr, col + dc
+            if 0 <= new_row < 8 and 0 <= new_col < 8:
+                mask |= 1 << square_index(new_row, new_col)
+                square_targets.append((1 << square_index(new_row, new_col), (new_row, new_col)))
+        masks.append(mask)
+        targets.append(square_targets)
+    return masks, targets
+
+def _build_ray_tables():
+    rays = []
+    for dr, dc in DIRECTIONS:
+        table = []
+        for sq in range(64):
+            row, col = divmod(sq, 8)
+            ray, squares = 0, []
+            for i in range(1, 8):
+                new_row, new_col = row + i * dr, col + i * dc
+                if not (0 <= new_row < 8 and 0 <= new_col < 8):
+                    break
+                ray |= 1 << square_index(new_row, new_col)
+                squares.append((1 << square_index(new_row, new_col), (new_row, new_col)))
+            table.append((ray, squares))
+        # Rays pointing towards higher indices meet their nearest blocker at the lowest set bit.
+        rays.append((table, dr * 8 + dc > 0))
+    return rays
+
+KING_ATTACKS, KING_TARGETS = _build_step_tables(DIRECTIONS)
+PAWN_ATTACKS, _ = _build_step_tables([(-1, -1), (-1, 1)])
+QUEEN_RAYS = _build_ray_tables()
+
+def queen_attacks(sq: int, occupancy: int) -> int:
+    attacks = 0
+    for table, towards_higher in QUEEN_RAYS:
+        ray = table[sq][0]
+        blockers = ray & occupancy
+        if blockers:
+            nearest = (blockers & -blockers).bit_length() - 1 if towards_higher else blockers.bit_length() - 1
+            ray ^= table[nearest][0]
+        attacks |= ray
+    return attacks
+
+def squares_of(mask: int) -> set[tuple]:
+    squares = set()
+    while mask:
+        low_bit = mask & -mask
+        squares.add(divmod(low_bit.bit_length() - 1, 8))
+        mask ^= low_bit
+    return squares
+
+class BitBoard(Board):
+    """Board whose attack and legal-move generation runs on integer bitboards.
+
+    The grid and Piece objects are kept so Game, the solvers and the evaluator work unchanged;
+    only the hot queries are answered from precomputed king/pawn tables and queen ray tables.
+    """
+
+    def occupancy(self) -> int:
+        occupancy = 0
+        for piece in (self.white_king, self.white_piece, self.black_king):
+            if piece is not None:
+                occupancy |= 1 << square_index(piece.row, piece.col)
+        return occupancy
+
+    def attack_mask(self, by_color: str, occupancy: int | None = None) -> int:
+        if by_color == 'black':
+            return KING_ATTACKS[square_index(self.black_king.row, self.black_king.col)]
+        attacks = KING_ATTACKS[square_index(self.white_king.row, self.white_king.col)]
+        piece = self.white_piece
+        if isinstance(piece, Pawn):
+            attacks |= PAWN_ATTACKS[square_index(piece.row, piece.col)]
+        elif isinstance(piece, Queen):
+            if occupancy is None:
+                occupancy = self.occupancy()
+            attacks |= queen_attacks(square_index(piece.row, piece.col), occupancy)
+        return attacks
+
+    def get_all_attacked_squares(self, by_color: str) -> set[tuple]:
+        return squares_of(self.attack_mask(by_color))
+
+    def is_check(self, color: str) -> bool:
+        king = self.white_king if color == 'white' else self.black_king
+        opponent_color = 'black' if color == 'white' else 'white'
+        return bool(self.attack_mask(opponent_color) >> square_index(king.row, king.col) & 1)
+
+    def get_legal_moves_for_piece(self, piece: Piece) -> set[tuple]:
+        # Candidates are collected in the same order as Piece.generate_possible_moves and then
+        # filtered, so the resulting sets iterate exactly like the grid backend's.
+        sq = square_index(piece.row, piece.col)
+        if isinstance(piece, Pawn):
+            return piece.generate_possible_moves(self)
+        if isinstance(piece, King):
+            own_pieces = 0
+            if piece.color == 'black':
+                # The king leaves its square, so queen rays are traced as if it were empty.
+                # A captured piece never defends its own square, so captures need no special case.
+                forbidden = self.attack_mask('white', self.occupancy() & ~(1 << sq))
+            else:
+                if self.white_piece is not None:
+                    own_pieces = 1 << square_index(self.white_piece.row, self.white_piece.col)
+                forbidden = self.attack_mask('black')
+            possible_moves = {coords for bit, coords in KING_TARGETS[sq] if not own_pieces & bit}
+            return {move for move in possible_moves if not forbidden >> square_index(*move) & 1}
+        occupancy = self.occupancy()
+        possible_moves = set()
+        for table, _ in QUEEN_RAYS:
+            for bit, coords in table[sq][1]:
+                if occupancy & bit:
+                    if self.get_piece(*coords).color != piece.color:
+                        possible_moves.add(coords)
+                    break
+                possible_moves.add(coords)
+        return {move for move in possible_moves}
+
+    def get_all_legal_moves(self, for_color: str) -> dict[Piece, set[tuple]]:
+        pieces = [self.black_king] if for_color == 'black' else [self.white_king, self.white_piece]
+        all_moves = {}
+        # Row-major order, matching the grid scan so move ordering ties break the same way.
+        for piece in sorted((p for p in pieces if p is not None), key=lambda p: (p.row, p.col)):
+            moves = self.get_legal_moves_for_piece(piece)
+            if moves:
+                all_moves[piece] = moves
+        return all_moves
@@ -1,7 +1,118 @@
-import copy
 import random
+from array import array
 from .piece import Piece, King, Pawn, Queen
 
+# Zobrist keys: one random 64-bit number per (color, piece type, square) plus one for black to move.
+_zobrist_rng = random.Random(20240917)
+ZOBRIST_PIECES = {
+    (color, piece_type): [_zobrist_rng.getrandbits(64) for _ in range(64)]
+    for color in ('white', 'black') for piece_type in ('king', 'pawn', 'queen')
+}
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+
+def piece_zobrist(piece: Piece) -> int:
+    return ZOBRIST_PIECES[(piece.color, piece.piece_type)][piece.row * 8 + piece.col]
+
+# Packed positions: white king, black king and white piece squares in 6 bits each, then the
+# white piece type (0 once it has been captured). The side to move is not part of it.
+PACKED_PIECE_TYPES = {None: 0, 'pawn': 1, 'queen': 2}
+PACKED_PAWN, PACKED_QUEEN = 1, 2
+# Plies between two stored position snapshots in GameHistory.
+SNAPSHOT_INTERVAL = 8
+
+def pack_position(white_king: int, black_king: int, white_piece: int, piece_type: int) -> int:
+    return white_king | black_king << 6 | white_piece << 12 | piece_type << 18
+
+def unpack_position(position: int) -> tuple[int, int, int, int]:
+    return position & 63, position >> 6 & 63, position >> 12 & 63, position >> 18
+
+def encode_move(from_square: tuple, to_square: tuple) -> int:
+    return (from_square[0] * 8 + from_square[1]) << 6 | to_square[0] * 8 + to_square[1]
+
+def play_packed_move(position: int, move: int) -> int:
+    """The packed position after an encoded move, without building a Board."""
+    white_king, black_king, white_piece, piece_type = unpack_position(position)
+    from_square, to_square = move >> 6, move & 63
+    if from_square == white_king:
+        white_king = to_square
+    elif from_square == black_king:
+        black_king = to_square
+        if piece_type and to_square == white_piece:
+            white_piece, piece_type = 0, 0
+    else:
+        white_piece = to_square
+        if piece_type == PACKED_PAWN and to_square < 8:
+            piece_type = PACKED_QUEEN
+    return pack_position(white_king, black_king, white_piece, piece_type)
+
+def packed_zobrist_key(position: int) -> int:
+    """Board.zobrist_key of a packed position."""
+    white_king, black_king, white_piece, piece_type = unpack_position(position)
+    key = ZOBRIST_PIECES[('white', 'king')][white_king] ^ ZOBRIST_PIECES[('black', 'king')][black_king]
+    if piece_type:
+        key ^= ZOBRIST_PIECES[('white', 'pawn' if piece_type == PACKED_PAWN else 'queen')][white_piece]
+    return key
+
+class GameHistory:
+    """The positions of a game, stored as 12-bit moves from its start position.
+
+    Every SNAPSHOT_INTERVAL plies the packed position is kept as well, so position(ply) replays
+    fewer than SNAPSHOT_INTERVAL moves. repetition_keys holds the Zobrist placement key of every
+    position, for the search's repetition check.
+    """
+    __slots__ = ('moves', 'snapshots', 'last_position', 'repetition_keys')
+
+    def __init__(self, start_position: int):
+        self.moves = array('H')
+        self.snapshots = array('I', [start_position])
+        self.last_position = start_position
+        self.repetition_keys = {packed_zobrist_key(start_position)}
+
+    def __len__(self) -> int:
+        """Number of positions, the start position included."""
+        return len(self.moves) + 1
+
+    def append(self, move: int, position: int):
+        self.moves.append(move)
+        if len(self.moves) % SNAPSHOT_INTERVAL == 0:
+            self.snapshots.append(position)
+        self.last_position = position
+        self.repetition_keys.add(packed_zobrist_key(position))
+
+    def position(self, ply: int) -> int:
+        """The packed position after ply moves."""
+        snapshot = ply // SNAPSHOT_INTERVAL
+        position = self.snapshots[snapshot]
+        for move in self.moves[snapshot * SNAPSHOT_INTERVAL:ply]:
+            position = play_packed_move(position, move)
+        return position
+
+    def truncate(self, length: int):
+        """Keeps the first length positions."""
+        if length >= len(self):
+            return
+        del self.moves[length - 1:]
+        del self.snapshots[(length - 1) // SNAPSHOT_INTERVAL + 1:]
+        # Positions can repeat, so the key set is rebuilt rather than trimmed.
+        position = self.snapshots[0]
+        self.repetition_keys = {packed_zobrist_key(position)}
+        for move in self.moves:
+            position = play_packed_move(position, move)
+            self.repetition_keys.add(packed_zobrist_key(position))
+        self.last_position = position
+
+    def to_state(self) -> dict:
+        return {"start": self.snapshots[0], "moves": self.moves.tolist()}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'GameHistory':
+        history = cls(state["start"])
+        position = history.last_position
+        for move in state["moves"]:
+            position = play_packed_move(position, move)
+            history.append(move, position)
+        return history
+
 class Board:
     def __init__(self):
         self.grid = [[None for _ in range(8)] for _ in range(8)]
@@ -9,7 +120,10 @@ class Board:
         self.white_king: King = None
         self.white_piece: Piece = None
         self.black_king: King = None
-        self.move_history = []
+        self.history: GameHistory | None = None
+        self._undo_stack = []
+        # Incremental Zobrist key of the piece placement; hash_key() adds the side to move.
+        self.zobrist_key = 0
 
     @classmethod
     def from_text(cls, text_input: str):
@@ -22,7 +136,7 @@ class Board:
         board.place_piece(King('white', *board._notation_to_coords(wk_pos)))
         board.place_piece(Pawn('white', *board._notation_to_coords(wp_pos)))
         board.place_piece(King('black', *board._notation_to_coords(bk_pos)))
-        board.move_history.append(board.to_fen())
+        board.start_history()
         return board
 
     @classmethod
@@ -43,11 +157,12 @@ class Board:
         board.place_piece(King('white', *wk_coords))
         board.place_piece(Pawn('white', *pawn_coords))
         board.place_piece(King('black', *bk_coords))
-        board.move_history.append(board.to_fen())
+        board.start_history()
         return board
 
     def place_piece(self, piece: Piece):
         self.grid[piece.row][piece.col] = piece
+        self.zobrist_key ^= piece_zobrist(piece)
         if isinstance(piece, King):
             if piece.color == 'white':
                 self.white_king = piece
@@ -59,10 +174,70 @@ class Board:
     def get_piece(self, row: int, col: int) -> Piece | None:
         return self.grid[row][col]
 
+    def hash_key(self) -> int:
+        return self.zobrist_key ^ ZOBRIST_BLACK_TO_MOVE if self.to_move == 'black' else self.zobrist_key
+
+    def start_history(self):
+        """Makes the current position the first one of the game's history."""
+        self.history = GameHistory(self.packed_position())
+
+    def packed_position(self) -> int:
+        piece = self.white_piece
+        return pack_position(
+            self.white_king.row * 8 + self.white_king.col, self.black_king.row * 8 + self.black_king.col,
+            piece.row * 8 + piece.col if piece else 0, PACKED_PIECE_TYPES[piece.piece_type if piece else None]
+        )
+
+    def load_position(self, position: int):
+        """Sets up a packed position, like load_from_fen but without parsing. History and side to move are kept."""
+        white_king, black_king, white_piece, piece_type = unpack_position(position)
+        # Only three squares can be occupied, so they are cleared instead of rebuilding the grid.
+        for piece in (self.white_king, self.white_piece, self.black_king):
+            if piece is not None:
+                self.grid[piece.row][piece.col] = None
+        self.zobrist_key = 0
+        self.white_piece = None
+        self.place_piece(King('white', *divmod(white_king, 8)))
+        if piece_type:
+            self.place_piece((Pawn if piece_type == PACKED_PAWN else Queen)('white', *divmod(white_piece, 8)))
+        self.place_piece(King('black', *divmod(black_king, 8)))
+
     def make_move(self, piece: Piece, new_row: int, new_col: int):
+        move = encode_move((piece.row, piece.col), (new_row, new_col))
+        self._apply_move(piece, new_row, new_col)
+        self.history.append(move, self.packed_position())
+
+    def push(self, move: tuple[Piece, tuple[int, int]]):
+        """Makes a search move in place; pop() takes it back without touching history."""
+        piece, (new_row, new_col) = move
+        self._undo_stack.append(self._apply_move(piece, new_row, new_col))
+
+    def pop(self):
+        piece, old_row, old_col, captured, previous_white_piece, previous_to_move, previous_key = self._undo_stack.pop()
+        # A promoted queen sits on the pawn's square, so clearing that square also removes it.
+        self.grid[piece.row][piece.col] = captured
+        self.grid[old_row][old_col] = piece
+        piece.row, piece.col = old_row, old_col
+        self.white_piece = previous_white_piece
+        self.to_move = previous_to_move
+        self.zobrist_key = previous_key
+
+    def undo_depth(self) -> int:
+        return len(self._undo_stack)
+
+    def pop_to(self, undo_depth: int):
+        """Takes back pushed moves until only undo_depth of them remain, e.g. after an aborted search."""
+        while len(self._undo_stack) > undo_depth:
+            self.pop()
+
+    def _apply_move(self, piece: Piece, new_row: int, new_col: int) -> tuple:
         old_row, old_col = piece.row, piece.col
+        captured = self.grid[new_row][new_col]
+        undo_token = (piece, old_row, old_col, captured, self.white_piece, self.to_move, self.zobrist_key)
+        self.zobrist_key ^= piece_zobrist(piece)
         self.grid[old_row][old_col] = None
-        if self.get_piece(new_row, new_col) is not None:
+        if captured is not None:
+            self.zobrist_key ^= piece_zobrist(captured)
             self.white_piece = None
         self.grid[new_row][new_col] = piece
         piece.row, piece.col = new_row, new_col
@@ -70,8 +245,11 @@ class Board:
             promoted_queen = Queen('white', new_row, new_col)
             self.grid[new_row][new_col] = promoted_queen
             self.white_piece = promoted_queen
+            self.zobrist_key ^= piece_zobrist(promoted_queen)
+        else:
+            self.zobrist_key ^= piece_zobrist(piece)
         self.to_move = 'white' if self.to_move == 'black' else 'black'
-        self.move_history.append(self.to_fen())
+        return undo_token
 
     def get_all_attacked_squares(self, by_color: str) -> set[tuple]:
         attacked_squares = set()
@@ -145,10 +323,9 @@ class Board:
     
     def undo_move(self):
         """BONUS 4: Reverts the board to the previous state."""
-        if len(self.move_history) > 1:
-            self.move_history.pop()
-            last_fen = self.move_history[-1]
-            self.load_from_fen(last_fen)
+        if len(self.history) > 1:
+            self.history.truncate(len(self.history) - 1)
+            self.load_position(self.history.last_position)
             self.to_move = 'white' if self.to_move == 'black' else 'black'
             return True
         return False
@@ -172,6 +349,7 @@ class Board:
 
     def load_from_fen(self, fen: str):
         self.grid = [[None for _ in range(8)] for _ in range(8)]
+        self.zobrist_key = 0
         rows = fen.split('/')
         for r, row_str in enumerate(rows):
             c = 0
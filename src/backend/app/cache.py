@@ -0,0 +1,185 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from .analysis import analyse_stream, read_positions
+from .board import encode_move, pack_position, packed_zobrist_key, play_packed_move, unpack_position
+from .workers import SearchPool
+
+# Bump when a change to the search or evaluation makes stored results stale; older files are cleared.
+CACHE_VERSION = 3
+# Evicting scans the table, so it runs once per this many stores instead of on every one.
+EVICT_EVERY = 64
+# Analysis fields that describe one particular run rather than the position.
+RUN_FIELDS = ("profile", "timings_ms", "ponder", "thinking_time", "cache", "multipv", "admission")
+
+def mirror_position(position: int) -> int:
+    """The position reflected across the d/e-file line; KPK and KQK play the same on both wings."""
+    white_king, black_king, white_piece, piece_type = unpack_position(position)
+    return pack_position(white_king ^ 7, black_king ^ 7, white_piece ^ 7 if piece_type else 0, piece_type)
+
+def _mirror_move(move) -> list:
+    (from_row, from_col), (to_row, to_col) = move
+    return [[from_row, 7 - from_col], [to_row, 7 - to_col]]
+
+class AnalysisCache:
+    """Search results shared across sessions and restarts, in a SQLite file.
+
+    Keyed like Game.cache_key() by position, side to move, algorithm and depth; a position and
+    its mirror image share one entry. get() answers with the deepest stored result at or above the requested depth.
+    Every EVICT_EVERY stores, entries past max_entries are evicted least-recently-used first. Results do not depend on
+    the game's history, so get() turns down a stored move that returns to a position the game has already had;
+    the live search scores that as a draw, which is what keeps it from cycling.
+    With path None the cache is disabled and never hits.
+    """
+
+    def __init__(self, path: str | None, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = self.misses = self.stores = 0
+        self.lock = threading.Lock()
+        if path is None:
+            return
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != CACHE_VERSION:
+                conn.execute("DROP TABLE IF EXISTS analyses")
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (CACHE_VERSION,))
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analyses "
+                "(position INTEGER NOT NULL, to_move TEXT NOT NULL, algorithm TEXT NOT NULL, depth INTEGER NOT NULL, "
+                # No type on evaluation, so integer scores come back as integers.
+                "move TEXT NOT NULL, evaluation NOT NULL, analysis TEXT NOT NULL, last_used REAL NOT NULL, "
+                "PRIMARY KEY (position, to_move, algorithm, depth))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS analyses_last_used ON analyses (last_used)")
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, position: int, to_move: str, algorithm: str, depth: int, repetition_keys: set[int] = frozenset()):
+        """A stored search_ai_move() result for the position, or None; see Game.repetition_keys()."""
+        if not self.enabled:
+            return None
+        mirrored = mirror_position(position) < position
+        key = mirror_position(position) if mirrored else position
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT depth, move, evaluation, analysis FROM analyses "
+                "WHERE position = ? AND to_move = ? AND algorithm = ? AND depth >= ? ORDER BY depth DESC LIMIT 1",
+                (key, to_move, algorithm, depth)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE analyses SET last_used = ? WHERE position = ? AND to_move = ? AND algorithm = ? AND depth = ?",
+                    (time.time(), key, to_move, algorithm, row[0])
+                )
+        move = json.loads(row[1]) if row is not None else None
+        if move is not None and mirrored:
+            move = _mirror_move(move)
+        if move is not None and packed_zobrist_key(play_packed_move(position, encode_move(*move))) in repetition_keys:
+            move = None
+        with self.lock:
+            if move is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if move is None:
+            return None
+        analysis = json.loads(row[3])
+        if mirrored and "pv" in analysis:
+            analysis["pv"] = [_mirror_move(pv_move) for pv_move in analysis["pv"]]
+        (from_row, from_col), (to_row, to_col) = move
+        return ((from_row, from_col), (to_row, to_col)), row[2], {**analysis, "cache": "hit"}
+
+    def put(self, position: int, to_move: str, algorithm: str, depth: int, result):
+        """Stores a search_ai_move() result under the depth it actually reached."""
+        if not self.enabled or not result:
+            return
+        move, value, analysis = result
+        if depth:
+            # A time budget may have stopped the search shallower or taken it deeper than asked.
+            depth = analysis.get("search_depth") or depth
+        analysis = {field: analysis[field] for field in analysis if field not in RUN_FIELDS}
+        if position > mirror_position(position):
+            position = mirror_position(position)
+            move = _mirror_move(move)
+            if "pv" in analysis:
+                analysis["pv"] = [_mirror_move(pv_move) for pv_move in analysis["pv"]]
+        with self.lock:
+            self.stores += 1
+            evict = self.stores % EVICT_EVERY == 0
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (position, to_move, algorithm, depth, move, evaluation, analysis, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (position, to_move, algorithm, depth, json.dumps(move), value, json.dumps(analysis, separators=(',', ':')), time.time())
+            )
+            if evict:
+                conn.execute(
+                    "DELETE FROM analyses WHERE rowid IN "
+                    "(SELECT rowid FROM analyses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def stats(self) -> dict:
+        with self.lock:
+            looked_up = self.hits + self.misses
+            counts = {
+                "hits": self.hits, "misses": self.misses, "stores": self.stores,
+                "hit_rate": self.hits / looked_up if looked_up else 0.0
+            }
+        if not self.enabled:
+            return {"enabled": False, **counts}
+        with closing(self._connect()) as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(analysis)), 0) FROM analyses").fetchone()
+        return {"enabled": True, "entries": entries, "max_entries": self.max_entries, "bytes": size, **counts}
+
+def create_analysis_cache() -> AnalysisCache:
+    """Builds the cache at ANALYSIS_CACHE_PATH (empty to disable) holding up to ANALYSIS_CACHE_MAX results."""
+    path = os.getenv("ANALYSIS_CACHE_PATH", "analysis_cache.db")
+    return AnalysisCache(path or None, int(os.getenv("ANALYSIS_CACHE_MAX", "100000")))
+
+async def warm_cache(cache: AnalysisCache, pool: SearchPool, path: str, config: dict, board_backend: str = 'grid') -> dict:
+    """Searches every position of a position file (see analysis.read_positions) that the cache cannot answer yet."""
+    counts = {"cached": 0, "searched": 0, "errors": 0}
+    with open(path) as source:
+        records = read_positions(source, config, board_backend)
+        async for row in analyse_stream(pool, records, config["time_budget_ms"], float("inf"), pool.workers, cache):
+            counts["errors" if "error" in row else "cached" if row.get("cached") else "searched"] += 1
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill the analysis cache from a file of positions.")
+    parser.add_argument("input", help="EPD lines and/or three-line WK/WP/BK blocks.")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--algorithm", choices=["minimax", "pvs", "greedy", "tablebase", "pns"], default="minimax")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    cache = create_analysis_cache()
+    if not cache.enabled:
+        sys.exit("ANALYSIS_CACHE_PATH is empty: the cache is disabled.")
+    config = {"algorithm": args.algorithm, "ai_depth": args.depth, "time_budget_ms": None, "threads": 1}
+    pool = SearchPool(args.workers, max_queue=args.workers)
+    time_start = time.perf_counter()
+    try:
+        counts = asyncio.run(warm_cache(cache, pool, args.input, config))
+    finally:
+        pool.shutdown()
+    print(f"{counts['searched']} searched, {counts['cached']} already cached, {counts['errors']} errors "
+          f"in {time.perf_counter() - time_start:.1f}s; {cache.stats()['entries']} entries in {cache.path}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,164 @@
 import sys
 import time
 import math
-from .board import Board
+from .board import Board, GameHistory, encode_move, packed_zobrist_key
+from .bitboard import BitBoard
 from .piece import King, Pawn, Queen
-from .minimax import StaticEvaluator, MATE_SCORE
+from .minimax import StaticEvaluator, MATE_SCORE, MATE_THRESHOLD
 from .solver import AISolver
+from .parallel import ParallelAISolver
+from .pvs import PVSSolver
 from .greedy import GreedySolver
+from .pns import ProofNumberSolver
+from .status import position_status
+from .tablebase import TablebaseSolver, load_tablebase
+
+BOARD_BACKENDS = {'grid': Board, 'bitboard': BitBoard}
 
 class Game:
     def __init__(self):
         self.board: Board | None = None
         self.solver = None
+        self.solver_config: dict = {}
         self.current_move_index: int = 0
 
-    def initialize_solver(self, algorithm: str, ai_depth: int):
+    def initialize_solver(self, algorithm: str, ai_depth: int, time_budget_ms: int | None = None, threads: int = 1, ponder: bool = False, selective: list[str] = ()):
+        self.solver_config = {
+            "algorithm": algorithm, "ai_depth": ai_depth, "time_budget_ms": time_budget_ms, "threads": threads, "ponder": ponder,
+            "selective": sorted(set(selective))
+        }
+        selective = tuple(self.solver_config["selective"])
+        # Minimax probes the tablebase at its leaves whenever the file has been generated.
+        tablebase = load_tablebase()
+        if algorithm == 'pvs':
+            search_solver = PVSSolver(StaticEvaluator(), search_depth=ai_depth, tablebase=tablebase, time_budget_ms=time_budget_ms, selective=selective)
+        elif threads > 1:
+            search_solver = ParallelAISolver(StaticEvaluator(), search_depth=ai_depth, tablebase=tablebase, time_budget_ms=time_budget_ms, threads=threads, selective=selective)
+        else:
+            search_solver = AISolver(StaticEvaluator(), search_depth=ai_depth, tablebase=tablebase, time_budget_ms=time_budget_ms, selective=selective)
         if algorithm == 'greedy':
             self.solver = GreedySolver()
+        elif algorithm == 'tablebase' and tablebase is not None:
+            self.solver = TablebaseSolver(tablebase, fallback_solver=search_solver)
+        elif algorithm == 'pns':
+            # Minimax plays the positions the mate search cannot prove within its limits.
+            self.solver = ProofNumberSolver(time_budget_ms=time_budget_ms, fallback_solver=search_solver)
         else:
-            self.solver = AISolver(StaticEvaluator(), search_depth=ai_depth)
+            self.solver = search_solver
 
-    def setup_game_from_positions(self, white_king_pos: str, white_pawn_pos: str, black_king_pos: str, ai_depth: int = 5, algorithm: str = 'minimax'):
+    def to_state(self) -> dict:
+        """JSON-serialisable snapshot of the game: move history, playback position and solver config."""
+        state = {"solver_config": self.solver_config}
+        if self.board:
+            state.update({
+                "board_backend": next(name for name, cls in BOARD_BACKENDS.items() if type(self.board) is cls),
+                "history": self.board.history.to_state(),
+                "current_move_index": self.current_move_index,
+                "to_move": self.board.to_move
+            })
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'Game':
+        game = cls()
+        if "history" in state:
+            game.board = BOARD_BACKENDS[state["board_backend"]]()
+            game.board.history = GameHistory.from_state(state["history"])
+            game.board.load_position(game.board.history.position(state["current_move_index"]))
+            game.board.to_move = state["to_move"]
+            game.current_move_index = state["current_move_index"]
+        if state["solver_config"]:
+            game.initialize_solver(**state["solver_config"])
+        return game
+
+    def setup_game_from_positions(self, white_king_pos: str, white_pawn_pos: str, black_king_pos: str, ai_depth: int = 5, algorithm: str = 'minimax', board_backend: str = 'grid', time_budget_ms: int | None = None, threads: int = 1, ponder: bool = False, selective: list[str] = ()):
         try:
-            self.board = Board.from_text(f"{white_king_pos}\n{white_pawn_pos}\n{black_king_pos}")
+            self.board = BOARD_BACKENDS[board_backend].from_text(f"{white_king_pos}\n{white_pawn_pos}\n{black_king_pos}")
             self.board.to_move = 'black'
-            self.initialize_solver(algorithm, ai_depth)
+            self.initialize_solver(algorithm, ai_depth, time_budget_ms, threads, ponder, selective)
             self.current_move_index = 0
             return self.get_game_state()
         except (ValueError, IndexError) as e:
             return {"error": f"Invalid setup position: {e}"}
 
-    def setup_game_from_text(self, text_content: str, ai_depth: int = 5, algorithm: str = 'minimax'):
+    def setup_game_from_text(self, text_content: str, ai_depth: int = 5, algorithm: str = 'minimax', board_backend: str = 'grid', time_budget_ms: int | None = None, threads: int = 1, ponder: bool = False, selective: list[str] = ()):
         try:
-            self.board = Board.from_text(text_content)
+            self.board = BOARD_BACKENDS[board_backend].from_text(text_content)
             self.board.to_move = 'black'
-            self.initialize_solver(algorithm, ai_depth)
+            self.initialize_solver(algorithm, ai_depth, time_budget_ms, threads, ponder, selective)
             self.current_move_index = 0
             return self.get_game_state()
         except (ValueError, IndexError) as e:
             return {"error": f"Invalid file content: {e}"}
 
-    def setup_game_random(self, ai_depth: int = 5, algorithm: str = 'minimax'):
-        self.board = Board.from_random()
+    def setup_game_random(self, ai_depth: int = 5, algorithm: str = 'minimax', board_backend: str = 'grid', time_budget_ms: int | None = None, threads: int = 1, ponder: bool = False, selective: list[str] = ()):
+        self.board = BOARD_BACKENDS[board_backend].from_random()
         self.board.to_move = 'black'
-        self.initialize_solver(algorithm, ai_depth)
+        self.initialize_solver(algorithm, ai_depth, time_budget_ms, threads, ponder, selective)
         self.current_move_index = 0
         return self.get_game_state()
 
     def get_game_state(self):
         if not self.board: return {"error": "Game not set up."}
-        legal_moves_dict = self.board.get_all_legal_moves(self.board.to_move)
+        status = position_status(self.board)
         serializable_moves = {}
-        for piece, moves in legal_moves_dict.items():
-            piece_pos_key = f"{piece.row},{piece.col}"
+        for (row, col), moves in status.legal_moves.items():
+            piece_pos_key = f"{row},{col}"
             serializable_moves[piece_pos_key] = list(moves)
         return {
             "board_fen": self.board.to_fen(), "turn": self.board.to_move,
-            "legal_moves": serializable_moves, "is_check": self.board.is_check(self.board.to_move),
-            "is_checkmate": self.board.is_checkmate(self.board.to_move),
-            "is_stalemate": self.board.is_stalemate(self.board.to_move),
-            "winner": self.get_winner(), "history_count": len(self.board.move_history),
+            "legal_moves": serializable_moves, "is_check": status.is_check,
+            "is_checkmate": status.is_checkmate,
+            "is_stalemate": status.is_stalemate,
+            "winner": status.winner, "history_count": len(self.board.history),
             "current_move_index": self.current_move_index
         }
     def handle_player_move(self, start_coords: tuple, end_coords: tuple):
         if not self.board or not self.solver: return {"error": "Game not set up."}
         if self.board.to_move != 'black': return {"error": "It's not the player's turn."}
-        if self.current_move_index < len(self.board.move_history) - 1:
-            self.board.move_history = self.board.move_history[:self.current_move_index + 1]
+        self.board.history.truncate(self.current_move_index + 1)
         piece_to_move = self.board.get_piece(start_coords[0], start_coords[1])
         if not piece_to_move or piece_to_move.color != 'black': return {"error": "Invalid piece to move."}
-        legal_moves = self.board.get_legal_moves_for_piece(piece_to_move)
+        legal_moves = position_status(self.board).legal_moves.get(start_coords, ())
         if end_coords not in legal_moves: return {"error": "Illegal move."}
         self.board.make_move(piece_to_move, end_coords[0], end_coords[1])
         self.current_move_index += 1
         return self.get_game_state()
     
-    def request_ai_move(self):
+    def request_ai_move(self, time_budget_ms: int | None = None):
+        error = self.check_ai_turn()
+        if error: return error
+        time_start = time.time()
+        result = self.search_ai_move(time_budget_ms)
+        return self.apply_ai_move(result, time_start)
+
+    def check_ai_turn(self):
         if not self.board or not self.solver: return {"error": "Game not set up."}
         if self.board.to_move != 'white': return {"error": "It's not the AI's turn."}
-        if self.current_move_index < len(self.board.move_history) - 1:
-            self.board.move_history = self.board.move_history[:self.current_move_index + 1]
+        return None
 
-        time_start = time.time()
+    def search_ai_move(self, time_budget_ms: int | None = None, ponder: bool = False, multipv: int = 1):
+        """Runs the solver without moving. Returns ((from, to), evaluation, analysis) in board coordinates, or None.
 
-        result = self.solver.find_best_move(self.board)
-        if not result: return self.get_game_state()
+        With ponder, time_budget_ms is the pondering budget for AISolver.ponder(). multipv only applies to minimax/PVS.
+        """
+        self.board.history.truncate(self.current_move_index + 1)
+        if ponder:
+            result = self.solver.ponder(self.board, time_budget_ms)
+        elif isinstance(self.solver, AISolver):
+            result = self.solver.find_best_move(self.board, time_budget_ms=time_budget_ms, multipv=multipv)
+        else:
+            result = self.solver.find_best_move(self.board)
+        if not result: return None
         (piece_to_move, dest_coords), eval_score, analysis_data = result
-        if isinstance(piece_to_move, King):
-            from_row, from_col = self.board.white_king.row, self.board.white_king.col
-        elif isinstance(piece_to_move, Pawn) or isinstance(piece_to_move, Queen):
-            from_row, from_col = self.board.white_piece.row, self.board.white_piece.col
+        return ((piece_to_move.row, piece_to_move.col), dest_coords), eval_score, analysis_data
+
+    def apply_ai_move(self, result, time_start: float):
+        """Plays a search_ai_move() result, which may have been computed on a copy of this game."""
+        self.board.history.truncate(self.current_move_index + 1)
+        if not result: return self.get_game_state()
+        ((from_row, from_col), dest_coords), eval_score, analysis_data = result
+        piece_to_move = self.board.get_piece(from_row, from_col)
         self.board.make_move(piece_to_move, dest_coords[0], dest_coords[1])
         self.current_move_index += 1
         response = self.get_game_state()
@@ -96,32 +166,100 @@ class Game:
         time_end = time.time()
         analysis_data['thinking_time'] = time_end - time_start
 
+        lines = analysis_data.pop('multipv', None)
         response['ai_move'] = {
             "from": self.coords_to_notation(from_row, from_col),
             "to": self.coords_to_notation(dest_coords[0], dest_coords[1]),
-            "evaluation": eval_score, "mate_in": self.calculate_mate_in(eval_score),
+            "evaluation": eval_score, "mate_in": self.calculate_mate_in(eval_score, analysis_data.get('search_depth')),
             "analysis": analysis_data
         }
+        if lines is not None:
+            response['ai_move']['multipv'] = [{
+                "from": self.coords_to_notation(*line["move"][0]), "to": self.coords_to_notation(*line["move"][1]),
+                "evaluation": line["evaluation"], "mate_in": self.calculate_mate_in(line["evaluation"], analysis_data.get('search_depth')),
+                "pv": [{"from": self.coords_to_notation(*from_square), "to": self.coords_to_notation(*to_square)} for from_square, to_square in line["pv"]]
+            } for line in lines]
         return response
+
+    def cache_key(self) -> tuple[int, str, str, int]:
+        """(position, side to move, algorithm, depth) an AnalysisCache keeps this game's search under."""
+        algorithm = self.solver_config["algorithm"]
+        # Greedy and tablebase moves do not depend on a depth. A tablebase game plays minimax at ai_depth
+        # without tablebase.bin, and for positions the table does not win for white; a proof-number game
+        # does for every position it cannot prove, so it is keyed by that depth.
+        depth_independent = algorithm == 'greedy'
+        if isinstance(self.solver, TablebaseSolver):
+            tablebase = self.solver.tablebase
+            depth_independent = tablebase.covers(self.board) and (self.board.to_move == 'black' or tablebase.is_win(self.board))
+        depth = 0 if depth_independent else self.solver_config["ai_depth"]
+        if depth and self.solver_config.get("selective"):
+            # A selective search can find a different move, so it keeps its own entries.
+            algorithm = "+".join([algorithm, *self.solver_config["selective"]])
+        return self.board.packed_position(), self.board.to_move, algorithm, depth
+
+    def repetition_keys(self) -> set[int]:
+        """Zobrist placement keys of the positions played up to the current move, which the search scores as draws."""
+        history = self.board.history
+        if self.current_move_index + 1 >= len(history):
+            return set(history.repetition_keys)
+        return {packed_zobrist_key(history.position(ply)) for ply in range(self.current_move_index + 1)}
+
+    def mate_search(self, solver: ProofNumberSolver) -> dict:
+        """ProofNumberSolver.prove() from the current position, with the mate line in notation."""
+        self.board.history.truncate(self.current_move_index + 1)
+        result = solver.prove(self.board)
+        if result["result"] == "mate":
+            line = result.pop("pv")
+            result["line"] = [{"from": self.coords_to_notation(*from_square), "to": self.coords_to_notation(*to_square)} for from_square, to_square in line]
+            # Whole moves of white's, counting the one that mates.
+            result["mate_in"] = (result["plies"] + (1 if self.board.to_move == 'white' else 0)) // 2
+        return {"turn": self.board.to_move, **result}
+
+    def format_progress(self, info: dict) -> dict:
+        """An AISolver progress record with its best move in notation, like the ai_move of a response."""
+        (from_row, from_col), (to_row, to_col) = info["best_move"]
+        return {
+            **info, "best_move": {"from": self.coords_to_notation(from_row, from_col), "to": self.coords_to_notation(to_row, to_col)},
+            "mate_in": self.calculate_mate_in(info["score"], info["depth"])
+        }
+
+    def ponder_states(self, expected_move: tuple | None = None) -> list[dict]:
+        """to_state() after each legal player move, expected_move first, when this game ponders.
+
+        Only minimax/PVS games ponder: greedy and tablebase moves take no time to find.
+        """
+        if not self.solver_config.get("ponder") or not isinstance(self.solver, AISolver) or self.board.to_move != 'black':
+            return []
+        status = position_status(self.board)
+        if status.winner:
+            return []
+        state = self.to_state()
+        history = {**state["history"], "moves": state["history"]["moves"][:self.current_move_index]}
+        states = []
+        for (row, col), moves in status.legal_moves.items():
+            for move in moves:
+                move_history = {**history, "moves": history["moves"] + [encode_move((row, col), move)]}
+                move_state = {**state, "history": move_history, "current_move_index": self.current_move_index + 1, "to_move": 'white'}
+                if ((row, col), move) == expected_move:
+                    states.insert(0, move_state)
+                else:
+                    states.append(move_state)
+        return states
+
     def handle_playback(self, command: str):
         if not self.board: return {"error": "Game not set up."}
         if command == 'undo' and self.current_move_index > 0: self.current_move_index -= 2
-        elif command == 'redo' and self.current_move_index < len(self.board.move_history) - 2: self.current_move_index += 2
+        elif command == 'redo' and self.current_move_index < len(self.board.history) - 2: self.current_move_index += 2
         elif command == 'first': self.current_move_index = 0
-        elif command == 'last': self.current_move_index = len(self.board.move_history) - 1
-        fen_to_load = self.board.move_history[self.current_move_index]
-        self.board.load_from_fen(fen_to_load)
+        elif command == 'last': self.current_move_index = len(self.board.history) - 1
+        self.board.load_position(self.board.history.position(self.current_move_index))
         self.board.to_move = 'black' if (self.current_move_index % 2) == 0 else 'white'
         return self.get_game_state()
     def get_winner(self):
-        if not self.board.white_piece: return 'draw'
-        if self.board.is_checkmate('white'): return 'black'
-        if self.board.is_checkmate('black'): return 'white'
-        if self.board.is_stalemate(self.board.to_move): return 'draw'
-        return None
-    def calculate_mate_in(self, eval_score):
-        if isinstance(self.solver, AISolver) and eval_score >= MATE_SCORE:
-            plies_to_mate = self.solver.search_depth - (eval_score - MATE_SCORE) + 1
+        return position_status(self.board).winner
+    def calculate_mate_in(self, eval_score, search_depth: int | None):
+        if search_depth is not None and eval_score >= MATE_THRESHOLD:
+            plies_to_mate = search_depth - (eval_score - MATE_SCORE) + 1
             return math.ceil(plies_to_mate / 2)
         return None
     def notation_to_coords(self, alg_notation: str) -> tuple[int, int]:
@@ -1,139 +1,159 @@
 # greedy.py
-import copy
 import random
+from .bitboard import KING_ATTACKS, PAWN_ATTACKS, queen_attacks, square_index
 from .board import Board
-from .piece import Piece, Queen, King, Pawn
-from .minimax import manhattan_distance
+from .piece import Piece, Queen, Pawn
+from .ordering import gives_check
+
+class MoveFeatures:
+    """What the greedy rules need to know about one white move, computed once per move."""
+    __slots__ = ('piece', 'move', 'gives_check', 'gives_mate', 'replies', 'capturable', 'is_pawn_move', 'is_safe')
+
+    def __init__(self, piece: Piece, move: tuple, gives_check: bool, replies: int, is_safe: bool):
+        self.piece = piece
+        self.move = move
+        self.gives_check = gives_check
+        # Legal black king moves after this move: it is mate when there are none and the king is in check.
+        self.replies = replies
+        self.gives_mate = gives_check and replies == 0
+        self.capturable = bool(replies >> square_index(*move) & 1)
+        self.is_pawn_move = isinstance(piece, Pawn)
+        # Not next to the black king before the move.
+        self.is_safe = is_safe
+
+def black_king_replies(white_king: int, piece: int | None, piece_is_queen: bool, black_king: int) -> int:
+    """Bitmask of the black king's legal moves, from square indices: its steps minus what white attacks with it lifted off."""
+    attacked = KING_ATTACKS[white_king]
+    if piece is not None:
+        attacked |= queen_attacks(piece, 1 << white_king | 1 << piece) if piece_is_queen else PAWN_ATTACKS[piece]
+    return KING_ATTACKS[black_king] & ~attacked
+
+def move_features(board: Board, legal_moves: dict[Piece, set[tuple]]) -> list[MoveFeatures]:
+    """Features of every white move in legal_moves order, in one pass over the moves without making any of them."""
+    white_king = square_index(board.white_king.row, board.white_king.col)
+    black_king = square_index(board.black_king.row, board.black_king.col)
+    white_piece = board.white_piece
+    piece_square = square_index(white_piece.row, white_piece.col) if white_piece is not None else None
+    is_queen = isinstance(white_piece, Queen)
+    attacked_by_black = KING_ATTACKS[black_king]
+    features = []
+    for piece, moves in legal_moves.items():
+        for move in moves:
+            to_square = square_index(*move)
+            if piece is white_piece:
+                # A pawn reaching the first row promotes to a queen.
+                replies = black_king_replies(white_king, to_square, is_queen or move[0] == 0, black_king)
+            else:
+                replies = black_king_replies(to_square, piece_square, is_queen, black_king)
+            features.append(MoveFeatures(piece, move, gives_check(board, piece, move), replies, not attacked_by_black >> to_square & 1))
+    return features
 
 class GreedySolver:
-    
+    """Plays white by the first of a fixed list of rules that applies.
+
+    Every rule reads the per-move records of move_features(), which are computed from attack
+    tables in a single pass, so no rule makes a move or regenerates black's legal moves.
+    """
+
     def find_best_move(self, board: Board) -> tuple[tuple[Piece, tuple[int, int]], int, dict] | None:
         legal_moves = board.get_all_legal_moves(board.to_move)
         if not legal_moves:
             return None
+        features = move_features(board, legal_moves)
 
-        move, reason = self._find_checkmate_move(board, legal_moves)
+        move, reason = self._find_checkmate_move(features)
         if move:
             return move, 10000, {"decision_rule": reason}
 
-        move, reason = self._find_queen_boxing_move(board, legal_moves)
+        move, reason = self._find_queen_boxing_move(board, features)
         if move:
             return move, 50, {"decision_rule": reason}
 
-        move, reason = self._find_pawn_defense_move(board, legal_moves)
+        move, reason = self._find_pawn_defense_move(board, features)
         if move:
             return move, 20, {"decision_rule": reason}
 
-        move, reason = self._find_safe_pawn_push_move(board, legal_moves)
+        move, reason = self._find_safe_pawn_push_move(features)
         if move:
             return move, 10, {"decision_rule": reason}
 
-        move, reason = self._find_safe_checking_move(board, legal_moves)
+        move, reason = self._find_safe_checking_move(features)
         if move:
             return move, 5, {"decision_rule": reason}
 
-        move, reason = self._find_king_restriction_move(board, legal_moves)
+        move, reason = self._find_king_restriction_move(features)
         if move:
             return move, 4, {"decision_rule": reason}
 
         move, reason = self._find_random_move(legal_moves)
         return move, 0, {"decision_rule": reason}
 
-    def _find_checkmate_move(self, board, legal_moves):
-        for piece, moves in legal_moves.items():
-            for move in moves:
-                temp_board = copy.deepcopy(board)
-                temp_piece = temp_board.get_piece(piece.row, piece.col)
-                temp_board.make_move(temp_piece, move[0], move[1])
-                if temp_board.is_checkmate(temp_board.to_move):
-                    return (piece, move), "Forced Checkmate"
+    def _find_checkmate_move(self, features):
+        for record in features:
+            if record.gives_mate:
+                return (record.piece, record.move), "Forced Checkmate"
         return None, None
 
-    def _find_queen_boxing_move(self, board, legal_moves):
+    def _find_queen_boxing_move(self, board, features):
         if not isinstance(board.white_piece, Queen):
             return None, None
 
         bk_pos = (board.black_king.row, board.black_king.col)
-        queen_moves = legal_moves.get(board.white_piece, set())
-
-        for move in queen_moves:
+        for record in features:
+            if record.piece is not board.white_piece:
+                continue
             # Check if the move destination is a knight's move away from the black king
-            row_dist = abs(move[0] - bk_pos[0])
-            col_dist = abs(move[1] - bk_pos[1])
+            row_dist = abs(record.move[0] - bk_pos[0])
+            col_dist = abs(record.move[1] - bk_pos[1])
             if (row_dist == 2 and col_dist == 1) or (row_dist == 1 and col_dist == 2):
-                return (board.white_piece, move), "Queen Boxing Technique"
+                return (record.piece, record.move), "Queen Boxing Technique"
         return None, None
 
-    def _find_pawn_defense_move(self, board, legal_moves):
+    def _find_pawn_defense_move(self, board, features):
         if not isinstance(board.white_piece, Pawn):
             return None, None
 
         pawn_pos = (board.white_piece.row, board.white_piece.col)
-        attacked_by_black = board.get_all_attacked_squares('black')
-
-        if pawn_pos in attacked_by_black:
-            king_moves = legal_moves.get(board.white_king, set())
-            for move in king_moves:
-                if abs(move[0] - pawn_pos[0]) <= 1 and abs(move[1] - pawn_pos[1]) <= 1:
-                    return (board.white_king, move), "Defend Pawn with King"
+        if abs(pawn_pos[0] - board.black_king.row) <= 1 and abs(pawn_pos[1] - board.black_king.col) <= 1:
+            for record in features:
+                if record.piece is board.white_king and abs(record.move[0] - pawn_pos[0]) <= 1 and abs(record.move[1] - pawn_pos[1]) <= 1:
+                    return (record.piece, record.move), "Defend Pawn with King"
         return None, None
 
-    def _find_safe_pawn_push_move(self, board, legal_moves):
+    def _find_safe_pawn_push_move(self, features):
         best_pawn_move = None
-        best_row = 8 
-        attacked_by_black = board.get_all_attacked_squares('black')
-
-        for piece, moves in legal_moves.items():
-            if isinstance(piece, Pawn):
-                for move in moves:
-                    if move not in attacked_by_black:
-                        if move[0] < best_row:
-                            best_row = move[0]
-                            best_pawn_move = (piece, move)
-        
+        best_row = 8
+
+        for record in features:
+            if record.is_pawn_move and record.is_safe and record.move[0] < best_row:
+                best_row = record.move[0]
+                best_pawn_move = (record.piece, record.move)
+
         if best_pawn_move:
             return best_pawn_move, "Safely Advance Pawn"
         return None, None
 
-    def _find_safe_checking_move(self, board, legal_moves):
-        for piece, moves in legal_moves.items():
-            for move in moves:
-                temp_board = copy.deepcopy(board)
-                temp_piece = temp_board.get_piece(piece.row, piece.col)
-                temp_board.make_move(temp_piece, move[0], move[1])
-                if temp_board.is_check(temp_board.to_move):
-                    # Check if the opponent can just capture the checking piece
-                    opponent_moves = temp_board.get_all_legal_moves(temp_board.to_move)
-                    can_be_captured = False
-                    for opp_piece, opp_moves in opponent_moves.items():
-                        if (move[0], move[1]) in opp_moves:
-                            can_be_captured = True
-                            break
-                    if not can_be_captured:
-                        return (piece, move), "Deliver Safe Check"
+    def _find_safe_checking_move(self, features):
+        for record in features:
+            # Safe when the black king cannot just capture the checking piece.
+            if record.gives_check and not record.capturable:
+                return (record.piece, record.move), "Deliver Safe Check"
         return None, None
 
-    def _find_king_restriction_move(self, board, legal_moves):
+    def _find_king_restriction_move(self, features):
         best_move = None
         min_opponent_moves = float('inf')
 
-        for piece, moves in legal_moves.items():
-            for move in moves:
-                temp_board = copy.deepcopy(board)
-                temp_piece = temp_board.get_piece(piece.row, piece.col)
-                temp_board.make_move(temp_piece, move[0], move[1])
-                
-                opponent_king_moves = temp_board.get_legal_moves_for_piece(temp_board.black_king)
-                num_moves = len(opponent_king_moves)
-                
-                if num_moves < min_opponent_moves:
-                    min_opponent_moves = num_moves
-                    best_move = (piece, move)
-        
+        for record in features:
+            num_moves = record.replies.bit_count()
+            if num_moves < min_opponent_moves:
+                min_opponent_moves = num_moves
+                best_move = (record.piece, record.move)
+
         if best_move:
             return best_move, "Restrict Enemy King"
         return None, None
-        
+
     def _find_random_move(self, legal_moves):
         random_piece = random.choice(list(legal_moves.keys()))
         random_move = random.choice(list(legal_moves[random_piece]))
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import parse_qsl, urlencode
+import httpx
+from .traces import SESSION_ENDPOINTS, read_trace
+
+# Playback commands each simulated game ends with, as the frontend's history buttons send them.
+PLAYBACK_COMMANDS = ("first", "redo", "redo", "last")
+
+class LatencyReport:
+    """Latency and status of every request, per endpoint ("METHOD /path")."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.time_start = time.perf_counter()
+
+    def observe(self, endpoint: str, seconds: float, error: bool):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        self.errors[endpoint] = self.errors.get(endpoint, 0) + error
+
+    def summary(self) -> dict:
+        seconds = time.perf_counter() - self.time_start
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            count = len(latencies)
+            endpoints[endpoint] = {
+                "requests": count, "errors": self.errors[endpoint], "requests_per_second": round(count / seconds, 2),
+                **{f"p{p}_ms": round(latencies[min(count - 1, count * p // 100)] * 1000, 1) for p in (50, 95, 99)}
+            }
+        requests = sum(row["requests"] for row in endpoints.values())
+        return {"seconds": round(seconds, 2), "requests": requests, "requests_per_second": round(requests / seconds, 2), "endpoints": endpoints}
+
+async def send(client: httpx.AsyncClient, report: LatencyReport, method: str, path: str, **kwargs) -> dict:
+    """One request, timed into the report; its JSON body, or {"error": ...} when it has none.
+
+    An answer with a 4xx/5xx status or an "error" field counts as an error.
+    """
+    time_start = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if not isinstance(body, dict):
+            body = {}
+        if response.status_code >= 400:
+            body.setdefault("error", f"HTTP {response.status_code}")
+    except httpx.HTTPError as error:
+        body = {"error": str(error)}
+    report.observe(f"{method} {path}", time.perf_counter() - time_start, "error" in body)
+    return body
+
+async def play_game(client: httpx.AsyncClient, report: LatencyReport, config: dict, max_moves: int, rng: random.Random):
+    """One simulated player: a random setup, random black moves answered by /api/ai_move until the game ends, then playback."""
+    state = await send(client, report, "GET", "/api/setup_random", params=config)
+    session_id = state.get("session_id")
+    if session_id is None:
+        return
+    for _ in range(max_moves):
+        if "error" in state or state["winner"] or state["is_checkmate"] or state["is_stalemate"]:
+            break
+        if state["turn"] == 'black':
+            moves = [(square, move) for square, targets in state["legal_moves"].items() for move in targets]
+            square, (end_row, end_col) = rng.choice(moves)
+            start_row, start_col = map(int, square.split(","))
+            state = await send(client, report, "POST", "/api/player_move", json={
+                "start_row": start_row, "start_col": start_col, "end_row": end_row, "end_col": end_col, "session_id": session_id
+            })
+        else:
+            state = await send(client, report, "GET", "/api/ai_move", params={"session_id": session_id})
+    for command in PLAYBACK_COMMANDS:
+        await send(client, report, "POST", "/api/playback", json={"command": command, "session_id": session_id})
+
+async def run_load(client: httpx.AsyncClient, games: int, concurrency: int, max_moves: int, config: dict, seed: int = 0) -> dict:
+    """Plays games simulated games, concurrency of them at a time."""
+    report, slots = LatencyReport(), asyncio.Semaphore(concurrency)
+
+    async def player(index: int):
+        async with slots:
+            await play_game(client, report, config, max_moves, random.Random(seed + index))
+
+    await asyncio.gather(*(player(index) for index in range(games)))
+    return report.summary()
+
+def fen_squares(placement: str) -> dict[str, str]:
+    """Square of each piece letter of a FEN placement, e.g. {"K": "e1", "P": "e2", "k": "e8"}."""
+    squares = {}
+    for rank, row in zip("87654321", placement.split()[0].split("/")):
+        file = 0
+        for char in row:
+            if char.isdigit():
+                file += int(char)
+            else:
+                squares[char] = "abcdefgh"[file] + rank
+                file += 1
+    return squares
+
+def replay_request(entry: dict) -> tuple[str, str, dict]:
+    """(method, path, httpx keyword arguments) that repeat a trace entry.
+
+    A setup request is sent with the session id it created, so the rest of the trace finds it, and
+    /api/setup_random becomes /api/setup of the position it drew. A WebSocket stream is replayed as /api/ai_move with the same parameters, which runs the same search.
+    """
+    method, path = entry["method"], entry["path"]
+    query, body = parse_qsl(entry["query"], keep_blank_values=True), entry["body"]
+    content_type = entry["content_type"] or ""
+    if path == "/api/ai_move/stream":
+        path = "/api/ai_move"
+    if path == "/api/setup_random" and entry.get("position"):
+        squares = fen_squares(entry["position"])
+        setup = {"white_king_pos": squares["K"], "white_pawn_pos": squares["P"], "black_king_pos": squares["k"], "selective": []}
+        for name, value in query:
+            if name == "selective":
+                setup["selective"].append(value)
+            else:
+                setup[name] = value
+        method, path, query = "POST", "/api/setup", []
+        body, content_type = json.dumps(setup), "application/json"
+    if path in SESSION_ENDPOINTS and entry["session_id"]:
+        if content_type.startswith("application/json"):
+            body = json.dumps({**json.loads(body), "session_id": entry["session_id"]})
+        elif not any(name == "session_id" for name, _ in query):
+            query.append(("session_id", entry["session_id"]))
+    kwargs = {"params": urlencode(query)} if query else {}
+    if body is not None:
+        kwargs["content"] = body.encode()
+        kwargs["headers"] = {"content-type": content_type}
+    return method, path, kwargs
+
+async def replay(client: httpx.AsyncClient, entries: list[dict], speed: float = 1.0) -> dict:
+    """Sends the trace's requests at speed times their recorded rate.
+
+    Requests of one session stay in order: one that comes due while the session's previous
+    request is still running is sent once it has been answered.
+    """
+    report = LatencyReport()
+    sessions, chains = {}, []
+    for entry in entries:
+        if entry["session_id"] is None:
+            chains.append([entry])
+        else:
+            if entry["session_id"] not in sessions:
+                sessions[entry["session_id"]] = []
+                chains.append(sessions[entry["session_id"]])
+            sessions[entry["session_id"]].append(entry)
+    time_start = time.perf_counter()
+
+    async def run(chain: list[dict]):
+        for entry in chain:
+            delay = time_start + entry["at"] / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            method, path, kwargs = replay_request(entry)
+            await send(client, report, method, path, **kwargs)
+
+    await asyncio.gather(*(run(chain) for chain in chains))
+    return report.summary()
+
+@asynccontextmanager
+async def open_client(url: str | None):
+    """A client for the server at url or, without one, for app.main in this process."""
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+            yield client
+        return
+    from .main import app
+    async with app.router.lifespan_context(app), httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=None) as client:
+        yield client
+
+async def _run(args) -> dict:
+    async with open_client(args.url) as client:
+        if args.command == "run":
+            config = {"ai_depth": args.depth, "algorithm": args.algorithm, "board_backend": args.backend}
+            return await run_load(client, args.games, args.concurrency, args.moves, config, args.seed)
+        return await replay(client, read_trace(args.trace), args.speed)
+
+def print_report(report: dict):
+    print(f"{report['requests']} requests in {report['seconds']}s: {report['requests_per_second']} req/s")
+    print(f"{'endpoint':<28} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, row in report["endpoints"].items():
+        print(f"{endpoint:<28} {row['requests']:>8} {row['errors']:>6} {row['requests_per_second']:>8} "
+              f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+
+def compare_reports(old: dict, new: dict) -> list[str]:
+    lines = [f"{'endpoint':<28} {'p50 ms':>17} {'p95 ms':>17} {'p99 ms':>17} {'errors':>9}"]
+    for endpoint in sorted(old["endpoints"].keys() | new["endpoints"].keys()):
+        before, after = old["endpoints"].get(endpoint), new["endpoints"].get(endpoint)
+        if before is None or after is None:
+            lines.append(f"{endpoint:<28} only in {'new' if before is None else 'old'}")
+            continue
+        columns = [f"{before[field]:>7} -> {after[field]:<7}" for field in ("p50_ms", "p95_ms", "p99_ms")]
+        lines.append(f"{endpoint:<28} {' '.join(columns)} {before['errors']:>3} -> {after['errors']:<3}")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with simulated games or a recorded trace.")
+    parser.add_argument("--url", help="Server to test, e.g. http://127.0.0.1:8000; without it app.main runs in this process.")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Play simulated games: setup, player and AI moves, playback.")
+    run_parser.add_argument("--games", type=int, default=20)
+    run_parser.add_argument("--concurrency", type=int, default=4, help="Games played at the same time.")
+    run_parser.add_argument("--moves", type=int, default=20, help="Moves (player and AI) per game at most.")
+    run_parser.add_argument("--depth", type=int, default=4)
+    run_parser.add_argument("--algorithm", choices=["minimax", "pvs", "greedy", "tablebase", "pns"], default="minimax")
+    run_parser.add_argument("--backend", choices=["grid", "bitboard"], default="grid")
+    run_parser.add_argument("--seed", type=int, default=0)
+
+    replay_parser = commands.add_parser("replay", help="Replay a trace recorded with TRACE_PATH.")
+    replay_parser.add_argument("trace")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Multiple of the recorded request rate.")
+
+    compare_parser = commands.add_parser("compare", help="Latency of two --json reports side by side.")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        print("\n".join(compare_reports(old, new)))
+        return
+    report = asyncio.run(_run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    errors = sum(row["errors"] for row in report["endpoints"].values())
+    if errors:
+        print(f"{errors} requests failed.", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,52 @@
-from fastapi import FastAPI, UploadFile, File
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Literal
+from .admission import create_admission_controller, material_key
+from .analysis import analyse_stream, read_positions
+from .cache import create_analysis_cache, warm_cache
 from .game import Game
+from .metrics import Metrics
+from .parallel import ROOT_WORKERS
+from .pns import DEFAULT_MAX_NODES, DEFAULT_MAX_PLIES
+from .ponder import create_ponderer
+from .sessions import create_session_store
+from .traces import create_trace_recorder, SESSION_ENDPOINTS
+from .workers import create_search_pool, SearchPoolFull, SearchCancelled
+import asyncio
+import io
+import json
 import os
+import time
 
-app = FastAPI()
+sessions = create_session_store()
+search_pool = create_search_pool()
+admission_controller = create_admission_controller(search_pool.workers)
+ponderer = create_ponderer(search_pool)
+metrics = Metrics()
+analysis_cache = create_analysis_cache()
+trace_recorder = create_trace_recorder()
+search_timeout_ms = int(os.getenv("SEARCH_TIMEOUT_MS", "30000"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # ANALYSIS_CACHE_WARM names a position file searched into the cache in the background.
+    warm_path = os.getenv("ANALYSIS_CACHE_WARM")
+    warm_task = None
+    if warm_path and analysis_cache.enabled:
+        config = {"algorithm": "minimax", "ai_depth": int(os.getenv("ANALYSIS_CACHE_WARM_DEPTH", "5")), "time_budget_ms": None, "threads": 1}
+        warm_task = asyncio.create_task(warm_cache(analysis_cache, search_pool, warm_path, config))
+    yield
+    if warm_task is not None:
+        warm_task.cancel()
+    if trace_recorder is not None:
+        trace_recorder.close()
+    search_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 allowed_origins_str = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000")
 origins = [origin.strip() for origin in allowed_origins_str.split(",")]
@@ -20,59 +61,356 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-game = Game()
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    time_start = time.perf_counter()
+    response = await call_next(request)
+    # The router leaves the matched route in the scope; unmatched paths share one label.
+    route = request.scope.get("route")
+    metrics.observe_request(
+        getattr(route, "path", "unmatched"), request.method, getattr(request.state, "algorithm", ""),
+        response.status_code, time.perf_counter() - time_start
+    )
+    return response
+
+@app.middleware("http")
+async def record_trace(request: Request, call_next):
+    if trace_recorder is None or not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    time_start = time.perf_counter()
+    body = await request.body()
+    response = await call_next(request)
+    session_id, position = request.query_params.get("session_id"), None
+    if request.url.path in SESSION_ENDPOINTS and response.status_code == 200:
+        # The created session and its position are only in the response, so it is read and passed on in one piece.
+        content = b"".join([chunk async for chunk in response.body_iterator])
+        state = json.loads(content)
+        session_id, position = state.get("session_id"), state.get("board_fen")
+        response = Response(content, response.status_code, dict(response.headers), response.media_type)
+    trace_recorder.record(
+        request.method, request.url.path, request.url.query, request.headers.get("content-type"), body,
+        session_id, time_start, response.status_code, time.perf_counter() - time_start, position
+    )
+    return response
+
+def start_session(session_id: str | None, setup):
+    game = Game()
+    response = setup(game)
+    if "error" not in response:
+        response["session_id"] = sessions.create(game, session_id)
+        ponderer.cancel(response["session_id"])
+    return response
+
+def with_session(session_id: str | None, action):
+    with sessions.checkout(session_id) as game:
+        if game is None:
+            return {"error": "Unknown or expired session. Set up a new game."}
+        response = action(game)
+    response["session_id"] = session_id
+    return response
+
+# solver.SELECTIVE_OPTIONS, spelled out so the API schema lists them.
+SelectiveOption = Literal['check_extension', 'seventh_rank_extension', 'promotion_extension', 'quiescence', 'late_move_reductions']
 
 class SetupRequest(BaseModel):
     white_king_pos: str
     white_pawn_pos: str
     black_king_pos: str
     ai_depth: int = 5
-    algorithm: Literal['minimax', 'greedy'] = 'minimax'
+    algorithm: Literal['minimax', 'pvs', 'greedy', 'tablebase', 'pns'] = 'minimax'
+    board_backend: Literal['grid', 'bitboard'] = 'grid'
+    time_budget_ms: int | None = None
+    threads: int = Field(1, ge=1, le=ROOT_WORKERS)
+    ponder: bool = False
+    selective: list[SelectiveOption] = []
+    session_id: str | None = None
 
 class FileSetupRequest(BaseModel):
     ai_depth: int = 5
-    algorithm: Literal['minimax', 'greedy'] = 'minimax'
+    algorithm: Literal['minimax', 'pvs', 'greedy', 'tablebase', 'pns'] = 'minimax'
+    board_backend: Literal['grid', 'bitboard'] = 'grid'
+    time_budget_ms: int | None = None
+    threads: int = Field(1, ge=1, le=ROOT_WORKERS)
+    ponder: bool = False
+    selective: list[SelectiveOption] = []
 
 class MoveRequest(BaseModel):
     start_row: int
     start_col: int
     end_row: int
     end_col: int
+    session_id: str | None = None
 
 class PlaybackRequest(BaseModel):
     command: str
+    session_id: str | None = None
 
 # --- API Endpoints ---
 @app.post("/api/setup")
 def setup_game_endpoint(req: SetupRequest):
-    return game.setup_game_from_positions(
+    return start_session(req.session_id, lambda game: game.setup_game_from_positions(
         req.white_king_pos, req.white_pawn_pos, req.black_king_pos, 
-        req.ai_depth, req.algorithm
-    )
+        req.ai_depth, req.algorithm, req.board_backend, req.time_budget_ms, req.threads, req.ponder, req.selective
+    ))
 
 @app.post("/api/setup_from_file")
-async def setup_from_file_endpoint(file: UploadFile = File(...), ai_depth: int = 5, algorithm: str = 'minimax'):
+async def setup_from_file_endpoint(file: UploadFile = File(...), ai_depth: int = 5, algorithm: str = 'minimax', board_backend: Literal['grid', 'bitboard'] = 'grid', time_budget_ms: int | None = None, threads: int = Query(1, ge=1, le=ROOT_WORKERS), ponder: bool = False, selective: list[SelectiveOption] = Query([]), session_id: str | None = None):
     text_content = await file.read()
-    return game.setup_game_from_text(text_content.decode("utf-8"), ai_depth, algorithm)
+    return start_session(session_id, lambda game: game.setup_game_from_text(text_content.decode("utf-8"), ai_depth, algorithm, board_backend, time_budget_ms, threads, ponder, selective))
 
 @app.get("/api/setup_random")
-def setup_random_endpoint(ai_depth: int = 5, algorithm: str = 'minimax'):
-    return game.setup_game_random(ai_depth, algorithm)
+def setup_random_endpoint(ai_depth: int = 5, algorithm: str = 'minimax', board_backend: Literal['grid', 'bitboard'] = 'grid', time_budget_ms: int | None = None, threads: int = Query(1, ge=1, le=ROOT_WORKERS), ponder: bool = False, selective: list[SelectiveOption] = Query([]), session_id: str | None = None):
+    return start_session(session_id, lambda game: game.setup_game_random(ai_depth, algorithm, board_backend, time_budget_ms, threads, ponder, selective))
 
 @app.get("/api/state")
-def get_state_endpoint():
-    return game.get_game_state()
+def get_state_endpoint(session_id: str | None = None):
+    return with_session(session_id, lambda game: game.get_game_state())
 
 @app.post("/api/player_move")
 def player_move_endpoint(req: MoveRequest):
     start_coords = (req.start_row, req.start_col)
     end_coords = (req.end_row, req.end_col)
-    return game.handle_player_move(start_coords, end_coords)
+
+    def move(game):
+        response = game.handle_player_move(start_coords, end_coords)
+        if "error" not in response:
+            ponderer.player_moved(req.session_id, game.to_state())
+        return response
+    return with_session(req.session_id, move)
 
 @app.get("/api/ai_move")
-def ai_move_endpoint():
-    return game.request_ai_move()
+async def ai_move_endpoint(request: Request, session_id: str | None = None, time_budget_ms: int | None = None, timeout_ms: int | None = None, profile: Literal['timers', 'cprofile', 'sample'] | None = None, multipv: int = 1):
+    # The session is only locked to snapshot the game and to play the result; the search runs in the pool.
+    # multipv N > 1 also returns the N best root moves of a minimax/PVS search, as ai_move.multipv.
+    if multipv < 1:
+        return {"error": "multipv must be at least 1."}
+    time_start = time.time()
+    snapshot = await run_in_threadpool(with_session, session_id, search_snapshot)
+    if "error" in snapshot:
+        return snapshot
+    request.state.algorithm = algorithm = snapshot["state"]["solver_config"]["algorithm"]
+    result = None
+    # Cached and pondered results only hold the best line.
+    if profile is None and multipv == 1:
+        result = await cached_result(snapshot, time_budget_ms)
+    # A per-request budget or a profile asks for a different search than the pondered one.
+    if result is None and time_budget_ms is None and profile is None and multipv == 1:
+        result = await ponderer.take(session_id, snapshot["state"])
+        await run_in_threadpool(analysis_cache.put, *snapshot["cache_key"], result)
+    if result is None:
+        async def search(state: dict, time_budget_ms: int | None):
+            search_start = time.perf_counter()
+            result = await search_pool.search(state, time_budget_ms, (timeout_ms or search_timeout_ms) / 1000, request.is_disconnected, profile, multipv=multipv)
+            metrics.observe_search(algorithm, time.perf_counter() - search_start, result[2] if result else None)
+            return result
+        try:
+            result = await admitted_search(client_key(request), snapshot, time_budget_ms, search)
+        except SearchPoolFull:
+            return JSONResponse(status_code=503, content={"error": "Too many AI searches in progress. Try again later."})
+        except TimeoutError:
+            return JSONResponse(status_code=504, content={"error": "AI search timed out."})
+        except SearchCancelled:
+            return {"error": "AI search cancelled."}
+    return await play_search_result(session_id, snapshot["state"], result, time_start)
+
+def search_snapshot(game) -> dict:
+    return game.check_ai_turn() or {
+        "state": game.to_state(), "cache_key": game.cache_key(), "material": material_key(game.board),
+        "repetition_keys": game.repetition_keys()
+    }
+
+def client_key(connection) -> str:
+    # Requests and WebSockets both carry the peer address; clients behind one proxy share a budget.
+    return connection.client.host if connection.client else ""
+
+async def admitted_search(client: str, snapshot: dict, time_budget_ms: int | None, search):
+    """Runs the awaitable search(state, time_budget_ms) as far as the admission controller allows, and caches its result.
+
+    A downgraded request is answered from the analysis cache when it holds the position at the
+    admitted depth or deeper, and otherwise by the cheaper search or greedy; analysis["admission"] says which.
+    """
+    state = snapshot["state"]
+    config = state["solver_config"]
+    admission = admission_controller.admit(client, snapshot["material"], config["algorithm"], config["ai_depth"], time_budget_ms or config["time_budget_ms"])
+    result = None
+    try:
+        if admission.downgraded:
+            position, to_move, algorithm, _ = snapshot["cache_key"]
+            result = await run_in_threadpool(analysis_cache.get, position, to_move, algorithm, max(admission.depth, 1), snapshot["repetition_keys"])
+            if result is not None:
+                admission.action = "cache"
+            elif admission.action == "greedy":
+                greedy_state = {**state, "solver_config": {**config, "algorithm": "greedy"}}
+                result = await run_in_threadpool(lambda: Game.from_state(greedy_state).search_ai_move())
+            elif admission.action == "time_budget":
+                time_budget_ms = admission.time_budget_ms
+            else:
+                state = {**state, "solver_config": {**config, "ai_depth": admission.depth}}
+        if result is None:
+            result = await search(state, time_budget_ms)
+            await run_in_threadpool(analysis_cache.put, *snapshot["cache_key"], result)
+    finally:
+        admission_controller.release(admission, result[2] if result else None)
+    if result and admission.downgraded:
+        result[2]["admission"] = admission.report()
+    return result
+
+async def cached_result(snapshot: dict, time_budget_ms: int | None):
+    # Only fixed-depth searches are answered from the cache; budgeted ones still fill it.
+    if time_budget_ms is not None or snapshot["state"]["solver_config"]["time_budget_ms"] is not None:
+        return None
+    return await run_in_threadpool(analysis_cache.get, *snapshot["cache_key"], snapshot["repetition_keys"])
+
+async def play_search_result(session_id: str | None, state: dict, result, time_start: float) -> dict:
+    """Plays a search of the game snapshot state, unless the game moved on meanwhile, and starts pondering the reply."""
+    ponder_states = []
+    def apply(game):
+        if game.to_state() != state:
+            return {"error": "The game changed while the AI was thinking."}
+        response = game.apply_ai_move(result, time_start)
+        # The second move of the principal variation is the reply the AI expects.
+        pv = result[2].get("pv", []) if result else []
+        ponder_states.extend(game.ponder_states(pv[1] if len(pv) > 1 else None))
+        return response
+    response = await run_in_threadpool(with_session, session_id, apply)
+    if ponder_states:
+        ponderer.start(session_id, ponder_states)
+    return response
+
+@app.websocket("/api/ai_move/stream")
+async def ai_move_stream_endpoint(websocket: WebSocket, session_id: str | None = None, time_budget_ms: int | None = None, timeout_ms: int | None = None):
+    # Streams {"type": "info"} records while the search runs: one per completed depth (event "depth")
+    # and per searched root move (event "root_move", provisional). Sending "stop" ends the search with
+    # the deepest completed depth; the played move then arrives as {"type": "result"}.
+    await websocket.accept()
+    if trace_recorder is not None:
+        trace_recorder.record("GET", websocket.url.path, websocket.url.query, None, None, session_id, time.perf_counter())
+    time_start = time.time()
+    snapshot = await run_in_threadpool(with_session, session_id, search_snapshot)
+    if "error" in snapshot:
+        await websocket.send_json({"type": "error", **snapshot})
+        await websocket.close()
+        return
+    cached = await cached_result(snapshot, time_budget_ms)
+    if cached is not None:
+        response = await play_search_result(session_id, snapshot["state"], cached, time_start)
+        await websocket.send_json({"type": "error" if "error" in response else "result", **response})
+        await websocket.close()
+        return
+    loop = asyncio.get_running_loop()
+    infos = asyncio.Queue()
+    stop, depth_done, disconnected = asyncio.Event(), asyncio.Event(), asyncio.Event()
+    formatter = Game()
+
+    async def forward():
+        while True:
+            info = await infos.get()
+            if info["event"] == "depth":
+                depth_done.set()
+            await websocket.send_json({"type": "info", **formatter.format_progress(info)})
+
+    async def listen():
+        try:
+            while True:
+                if (await websocket.receive_text()).strip().lower() == "stop":
+                    stop.set()
+        except WebSocketDisconnect:
+            disconnected.set()
+
+    async def is_disconnected():
+        return disconnected.is_set()
+
+    async def search(state: dict, time_budget_ms: int | None):
+        search_start = time.perf_counter()
+        result = await search_pool.search(
+            state, time_budget_ms, (timeout_ms or search_timeout_ms) / 1000, is_disconnected,
+            progress=lambda info: loop.call_soon_threadsafe(infos.put_nowait, info),
+            # Stopping before the first depth completes would leave no move to play.
+            stop_requested=lambda: stop.is_set() and depth_done.is_set()
+        )
+        metrics.observe_search(state["solver_config"]["algorithm"], time.perf_counter() - search_start, result[2] if result else None)
+        return result
+
+    tasks = [asyncio.create_task(forward()), asyncio.create_task(listen())]
+    try:
+        result = await admitted_search(client_key(websocket), snapshot, time_budget_ms, search)
+        response = await play_search_result(session_id, snapshot["state"], result, time_start)
+        message = {"type": "error", **response} if "error" in response else {"type": "result", **response}
+    except SearchPoolFull:
+        message = {"type": "error", "error": "Too many AI searches in progress. Try again later."}
+    except TimeoutError:
+        message = {"type": "error", "error": "AI search timed out."}
+    except SearchCancelled:
+        return
+    finally:
+        for task in tasks:
+            task.cancel()
+    while not infos.empty():
+        await websocket.send_json({"type": "info", **formatter.format_progress(infos.get_nowait())})
+    await websocket.send_json(message)
+    await websocket.close()
+
+@app.get("/api/mate_search")
+async def mate_search_endpoint(request: Request, session_id: str | None = None, mate_in: int | None = None, max_nodes: int = DEFAULT_MAX_NODES, max_plies: int = DEFAULT_MAX_PLIES, timeout_ms: int | None = None):
+    # Proves or refutes a forced mate for white from the game's current position, with either side to move.
+    # mate_in N only accepts mates in at most N white moves, in place of max_plies.
+    snapshot = await run_in_threadpool(with_session, session_id, lambda game: {"state": game.to_state()} if game.board else {"error": "Game not set up."})
+    if "error" in snapshot:
+        return snapshot
+    request.state.algorithm = "pns"
+    if mate_in is not None:
+        max_plies = 2 * mate_in - (1 if snapshot["state"]["to_move"] == 'white' else 0)
+    try:
+        result = await search_pool.mate_search(snapshot["state"], max_nodes, max_plies, (timeout_ms or search_timeout_ms) / 1000, request.is_disconnected)
+    except SearchPoolFull:
+        return JSONResponse(status_code=503, content={"error": "Too many AI searches in progress. Try again later."})
+    except TimeoutError:
+        return JSONResponse(status_code=504, content={"error": "Mate search timed out."})
+    except SearchCancelled:
+        return {"error": "Mate search cancelled."}
+    return {**result, "session_id": session_id}
+
+@app.post("/api/analysis/batch")
+async def batch_analysis_endpoint(request: Request, file: UploadFile = File(...), ai_depth: int = 5, algorithm: Literal['minimax', 'pvs', 'greedy', 'tablebase', 'pns'] = 'minimax', board_backend: Literal['grid', 'bitboard'] = 'grid', time_budget_ms: int | None = None, timeout_ms: int | None = None):
+    # One NDJSON line per position as it finishes; at most one search per pool worker is in flight,
+    # so interactive games keep the queue slots.
+    config = {"algorithm": algorithm, "ai_depth": ai_depth, "time_budget_ms": time_budget_ms, "threads": 1}
+    request.state.algorithm = algorithm
+    # The upload is closed once this handler returns, so read it before streaming starts.
+    text_content = await file.read()
+    records = read_positions(io.StringIO(text_content.decode("utf-8")), config, board_backend)
+
+    async def lines():
+        async for row in analyse_stream(search_pool, records, time_budget_ms, (timeout_ms or search_timeout_ms) / 1000, search_pool.workers, analysis_cache):
+            yield json.dumps(row) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.post("/api/playback")
 def playback_endpoint(req: PlaybackRequest):
-    return game.handle_playback(req.command)
+    ponderer.cancel(req.session_id)
+    return with_session(req.session_id, lambda game: game.handle_playback(req.command))
+
+@app.get("/api/sessions/stats")
+def session_stats_endpoint():
+    return sessions.stats()
+
+@app.get("/api/pool/stats")
+def pool_stats_endpoint():
+    return search_pool.stats()
+
+@app.get("/api/admission/stats")
+def admission_stats_endpoint():
+    return admission_controller.stats()
+
+@app.get("/api/analysis_cache/stats")
+def analysis_cache_stats_endpoint():
+    return analysis_cache.stats()
+
+@app.get("/api/ponder/stats")
+def ponder_stats_endpoint():
+    return ponderer.stats()
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(search_pool.stats()), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,95 @@
+import threading
+from collections import defaultdict
+
+# Upper bounds, in seconds, of the latency histogram buckets; +Inf is added when rendering.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Search analysis fields summed into counters, with their metric names.
+SEARCH_COUNTERS = {
+    "nodes_visited": "search_nodes_total", "cutoffs": "search_cutoffs_total", "tt_probes": "search_tt_probes_total",
+    "movegen_calls": "search_movegen_calls_total", "eval_calls": "search_eval_calls_total"
+}
+# SearchPool.stats() fields exported as gauges or counters.
+POOL_GAUGES = ("running", "queued", "pondering")
+POOL_COUNTERS = ("submitted", "completed", "rejected", "cancelled", "timed_out", "pondered", "ponder_preempted")
+
+def _labels(names: tuple, values: tuple) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple = LATENCY_BUCKETS):
+        self.name, self.help_text, self.label_names, self.buckets = name, help_text, label_names, buckets
+        # label values -> [per-bucket counts, sum, count]
+        self.series = {}
+
+    def observe(self, label_values: tuple, value: float):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bucket_labels = self.label_names + ("le",)
+        for label_values, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(bucket_labels, label_values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(bucket_labels, label_values + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, label_values)} {count}")
+        return lines
+
+class Metrics:
+    """Request and search metrics of this server process, rendered in the Prometheus text format.
+
+    Latency is kept per endpoint and algorithm; search counters sum, per algorithm, the
+    analysis of every search /api/ai_move ran in the pool (pondered answers are not counted).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_latency = Histogram("http_request_duration_seconds", "Time to respond to an API request.", ("endpoint", "method", "algorithm"))
+        self.search_latency = Histogram("search_duration_seconds", "Time from submitting an AI search to its result.", ("algorithm",))
+        self.responses = defaultdict(int)
+        self.searches = defaultdict(int)
+        self.search_counters = defaultdict(int)
+
+    def observe_request(self, endpoint: str, method: str, algorithm: str, status: int, seconds: float):
+        with self.lock:
+            self.request_latency.observe((endpoint, method, algorithm), seconds)
+            self.responses[(endpoint, method, str(status))] += 1
+
+    def observe_search(self, algorithm: str, seconds: float, analysis: dict | None):
+        with self.lock:
+            self.search_latency.observe((algorithm,), seconds)
+            self.searches[algorithm] += 1
+            for field in SEARCH_COUNTERS:
+                if analysis and analysis.get(field):
+                    self.search_counters[(SEARCH_COUNTERS[field], algorithm)] += analysis[field]
+
+    def render(self, pool_stats: dict) -> str:
+        with self.lock:
+            lines = self.request_latency.render()
+            lines += ["# HELP http_responses_total API responses by status code.", "# TYPE http_responses_total counter"]
+            lines += [f"http_responses_total{_labels(('endpoint', 'method', 'status'), key)} {count}" for key, count in sorted(self.responses.items())]
+            lines += self.search_latency.render()
+            lines += ["# HELP searches_total AI searches with a result.", "# TYPE searches_total counter"]
+            lines += [f"searches_total{_labels(('algorithm',), (algorithm,))} {count}" for algorithm, count in sorted(self.searches.items())]
+            for name in SEARCH_COUNTERS.values():
+                lines.append(f"# TYPE {name} counter")
+                lines += [f"{name}{_labels(('algorithm',), (algorithm,))} {count}" for (counter, algorithm), count in sorted(self.search_counters.items()) if counter == name]
+        for field in POOL_GAUGES:
+            lines += [f"# TYPE search_pool_{field} gauge", f"search_pool_{field} {pool_stats[field]}"]
+        for field in POOL_COUNTERS:
+            lines += [f"# TYPE search_pool_{field}_total counter", f"search_pool_{field}_total {pool_stats[field]}"]
+        return "\n".join(lines) + "\n"
@@ -1,8 +1,13 @@
+import threading
+import numpy as np
+from .bitboard import KING_ATTACKS, PAWN_ATTACKS, queen_attacks, square_index
 from .board import Board
 from .piece import Queen
 
 # Constants remain the same
 MATE_SCORE = 10000
+# Scores at or above this are forced mates, including tablebase mates found past the search horizon.
+MATE_THRESHOLD = MATE_SCORE - 500
 QUEEN_BONUS = 9000
 PAWN_PROGRESSION_MULTIPLIER = 10
 KING_DISTANCE_PENALTY = 5
@@ -16,14 +21,100 @@ SHRINKING_BOX_BONUS = 2
 def manhattan_distance(p1_coords, p2_coords):
     return abs(p1_coords[0] - p2_coords[0]) + abs(p1_coords[1] - p2_coords[1])
 
+def eval_index(wk: int, piece: int, bk: int) -> int:
+    return wk << 12 | piece << 6 | bk
+
+def _mask_bits(masks: list[int]) -> np.ndarray:
+    """(len(masks), 64) booleans: row i marks the squares set in masks[i]."""
+    masks = np.array(masks, dtype=np.uint64)[:, None]
+    return (masks >> np.arange(64, dtype=np.uint64) & np.uint64(1)).astype(bool)
+
+def build_eval_tables() -> tuple[np.ndarray, np.ndarray]:
+    """StaticEvaluator's KPK (int) and KQK (float, queen bonus included) scores for every
+    eval_index(wk, piece, bk), so evaluating a leaf is one array read.
+
+    The scores do not depend on the side to move. The black king's mobility is its king
+    steps minus the squares white attacks with the black king lifted off the board, which
+    is what Board.get_legal_moves_for_piece counts in any position the game can reach.
+    """
+    squares = np.arange(64)
+    rows, cols = squares // 8, squares % 8
+    distance = np.abs(rows[:, None] - rows) + np.abs(cols[:, None] - cols)
+    king_steps = _mask_bits(KING_ATTACKS).astype(np.int32)
+    wk, piece, bk = (axis.ravel() for axis in np.meshgrid(squares, squares, squares, indexing='ij'))
+
+    pawn_attacks = _mask_bits([KING_ATTACKS[k] | PAWN_ATTACKS[p] for k in range(64) for p in range(64)])
+    black_moves = (king_steps.sum(axis=1)[None, :] - pawn_attacks.astype(np.int32) @ king_steps.T).ravel()
+    in_promotion_path = (cols[wk] == cols[piece]) & (rows[wk] >= 1) & (rows[wk] < rows[piece])
+    kpk = (
+        (7 - rows[piece]) ** 2 * PAWN_PROGRESSION_MULTIPLIER
+        - distance[wk, piece] * KING_DISTANCE_PENALTY
+        + distance[bk, piece] * OPPONENT_KING_DISTANCE_BONUS
+        - distance[wk, bk] * COORDINATED_ATTACK_PENALTY
+        + in_promotion_path * KING_CONTROL_BONUS
+        - black_moves * OPPONENT_MOVE_RESTRICTION_PENALTY
+    ).astype(np.int32)
+
+    queen_attack_masks = _mask_bits([
+        KING_ATTACKS[k] | queen_attacks(q, 1 << k | 1 << q) for k in range(64) for q in range(64)
+    ])
+    black_moves = (king_steps.sum(axis=1)[None, :] - queen_attack_masks.astype(np.int32) @ king_steps.T).ravel()
+    box_area = (7 - np.abs(rows[piece] - rows[bk])) * (7 - np.abs(cols[piece] - cols[bk]))
+    kqk = (
+        QUEEN_BONUS
+        + (np.abs(rows[bk] - 3.5) + np.abs(cols[bk] - 3.5)) * FORCE_KING_TO_EDGE_MULTIPLIER
+        - distance[wk, bk] * COORDINATED_ATTACK_PENALTY
+        - distance[piece, bk] * (COORDINATED_ATTACK_PENALTY / 2)
+        - box_area * SHRINKING_BOX_BONUS
+        - black_moves * OPPONENT_MOVE_RESTRICTION_PENALTY * 2
+    )
+    return kpk, kqk
+
+_eval_tables = None
+_eval_tables_lock = threading.Lock()
+
+def get_eval_tables() -> tuple[np.ndarray, np.ndarray]:
+    """The shared (kpk, kqk) tables, built on first use."""
+    global _eval_tables
+    with _eval_tables_lock:
+        if _eval_tables is None:
+            _eval_tables = build_eval_tables()
+        return _eval_tables
+
 class StaticEvaluator:
+    def __init__(self):
+        self.kpk_table, self.kqk_table = get_eval_tables()
+
     def evaluate(self, board: Board):
-        if isinstance(board.white_piece, Queen):
-            return QUEEN_BONUS + self.evaluate_kq_vs_k(board)
-        elif not board.white_piece:
+        wk, piece, bk = board.white_king, board.white_piece, board.black_king
+        if not piece:
             return -MATE_SCORE
-        else:
-            return self.evaluate_kp_vs_k(board)
+        index = eval_index(square_index(wk.row, wk.col), square_index(piece.row, piece.col), square_index(bk.row, bk.col))
+        if isinstance(piece, Queen):
+            return self.kqk_table.item(index)
+        return self.kpk_table.item(index)
+
+    def evaluate_batch(self, positions: list[Board]) -> np.ndarray:
+        """evaluate() for many positions at once, as a float array in positions order."""
+        indices = np.zeros(len(positions), dtype=np.int64)
+        is_queen = np.zeros(len(positions), dtype=bool)
+        has_piece = np.zeros(len(positions), dtype=bool)
+        for i, board in enumerate(positions):
+            wk, piece, bk = board.white_king, board.white_piece, board.black_king
+            if piece:
+                indices[i] = eval_index(square_index(wk.row, wk.col), square_index(piece.row, piece.col), square_index(bk.row, bk.col))
+                is_queen[i] = isinstance(piece, Queen)
+                has_piece[i] = True
+        return self.evaluate_indices(indices, is_queen, has_piece)
+
+    def evaluate_indices(self, indices: np.ndarray, is_queen: np.ndarray, has_piece: np.ndarray | None = None) -> np.ndarray:
+        """Vectorised lookup of packed eval_index() values; rows without a white piece score -MATE_SCORE."""
+        scores = np.where(is_queen, self.kqk_table[indices], self.kpk_table[indices])
+        if has_piece is not None:
+            scores = np.where(has_piece, scores, -MATE_SCORE)
+        return scores
+
+    # Reference implementations the tables are built from; they play out the black king's moves on the board.
 
     def evaluate_kp_vs_k(self, board: Board):
         score = 0
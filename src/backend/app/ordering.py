@@ -0,0 +1,106 @@
+from .bitboard import PAWN_ATTACKS, queen_attacks, square_index
+from .board import Board
+from .minimax import manhattan_distance
+from .piece import Piece, Pawn, Queen
+
+MAX_PLY = 128
+
+def _occupancy(board: Board) -> int:
+    occupancy = 0
+    for piece in (board.white_king, board.white_piece, board.black_king):
+        if piece is not None:
+            occupancy |= 1 << square_index(piece.row, piece.col)
+    return occupancy
+
+def gives_check(board: Board, piece: Piece, move: tuple) -> bool:
+    """Whether playing move checks the opponent, answered from attack tables without making it."""
+    # A lone black king can never give check.
+    if piece.color == 'black':
+        return False
+    black_king = 1 << square_index(board.black_king.row, board.black_king.col)
+    to_square = square_index(*move)
+    occupancy = _occupancy(board) & ~(1 << square_index(piece.row, piece.col)) | 1 << to_square
+    if isinstance(piece, Pawn):
+        if move[0] == 0:
+            return bool(queen_attacks(to_square, occupancy) & black_king)
+        return bool(PAWN_ATTACKS[to_square] & black_king)
+    if isinstance(piece, Queen):
+        return bool(queen_attacks(to_square, occupancy) & black_king)
+    # Kings never attack each other, so a king move can only uncover a queen check.
+    queen = board.white_piece
+    if isinstance(queen, Queen):
+        return bool(queen_attacks(square_index(queen.row, queen.col), occupancy) & black_king)
+    return False
+
+def is_promotion(piece: Piece, move: tuple) -> bool:
+    return isinstance(piece, Pawn) and move[0] == 0
+
+class MoveOrderer:
+    """Orders moves without making them: TT move, checks, promotions and captures, killers, history.
+
+    Killers are the last two quiet moves per ply that caused a beta cutoff; the butterfly
+    history table counts cutoffs by (side, from square, to square), weighted by depth squared.
+    The queen-approaches-king bonus of the old ordering is kept as the last tie-break.
+    """
+
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 64 * 64)
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [0] * (2 * 64 * 64)
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    @staticmethod
+    def _history_index(color: str, from_square: tuple, move: tuple) -> int:
+        return (0 if color == 'white' else 4096) + square_index(*from_square) * 64 + square_index(*move)
+
+    def order(self, board: Board, legal_moves: dict[Piece, set[tuple]], tt_move: tuple | None = None, ply: int = 0) -> list[tuple]:
+        killers = self.killers[ply] if ply < MAX_PLY else (None, None)
+        history = self.history
+        black_king = (board.black_king.row, board.black_king.col)
+        scored = []
+        for piece, moves in legal_moves.items():
+            from_square = (piece.row, piece.col)
+            queen_distance = manhattan_distance(from_square, black_king) if isinstance(piece, Queen) else None
+            for move in moves:
+                key = (from_square, move)
+                tactical = is_promotion(piece, move) or board.get_piece(*move) is not None
+                score = (
+                    key == tt_move,
+                    gives_check(board, piece, move),
+                    tactical,
+                    2 if key == killers[0] else 1 if key == killers[1] else 0,
+                    history[self._history_index(piece.color, from_square, move)],
+                    queen_distance is not None and manhattan_distance(move, black_king) < queen_distance
+                )
+                scored.append((score, (piece, move)))
+        # sort() is stable, so equal scores keep move generation order.
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def record_cutoff(self, board: Board, from_square: tuple, move: tuple, depth: int, ply: int, move_number: int):
+        """Called when the move_number-th move searched at a node (0 = first) caused a beta cutoff."""
+        self.cutoffs += 1
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+        # board is the position before the move; captures and promotions already sort early.
+        piece = board.get_piece(*from_square)
+        if board.get_piece(*move) is not None or is_promotion(piece, move):
+            return
+        self.history[self._history_index(piece.color, from_square, move)] += depth * depth
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            key = (from_square, move)
+            if killers[0] != key:
+                killers[1], killers[0] = killers[0], key
+
+    def stats(self) -> dict:
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+        }
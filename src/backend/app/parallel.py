@@ -0,0 +1,151 @@
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from .board import Board
+from .minimax import StaticEvaluator
+from .piece import Piece
+from .solver import AISolver, SearchTimeout
+from .tablebase import load_tablebase
+from .transposition import EXACT
+
+# Concurrent searches that can share one pool; each gets its own stop flag.
+STOP_SLOTS = 32
+# Size of the one root pool per process, and so the largest useful `threads` setting.
+ROOT_WORKERS = int(os.getenv("SEARCH_THREADS", str(os.cpu_count() or 1)))
+
+# Worker process state: the shared stop flags and one solver per tablebase and selective search setting, whose
+# transposition table is kept between tasks like a serial AISolver's is between moves.
+_stop_flags = None
+_worker_solvers = {}
+
+def _init_worker(stop_flags):
+    global _stop_flags
+    _stop_flags = stop_flags
+
+def search_root_move(board: Board, root_move: tuple, depth: int, slot: int, use_tablebase: bool, selective: tuple[str, ...] = ()):
+    """Searches one root move with a full window, like AISolver.search_root does.
+
+    Returns (value, pv after the move, nodes), or None when the search was stopped.
+    """
+    if _stop_flags[slot]:
+        return None
+    if (use_tablebase, selective) not in _worker_solvers:
+        _worker_solvers[use_tablebase, selective] = AISolver(StaticEvaluator(), tablebase=load_tablebase() if use_tablebase else None, selective=selective)
+    solver = _worker_solvers[use_tablebase, selective]
+    solver.move_count = 0
+    solver.root_depth = depth
+    solver.should_stop = lambda: _stop_flags[slot] != 0
+    history = set(board.history.repetition_keys)
+    from_square, move = root_move
+    board.push((board.get_piece(*from_square), move))
+    try:
+        value = solver.minimax(board, depth - 1, -float('inf'), float('inf'), board.to_move == 'white', history)
+    except SearchTimeout:
+        return None
+    return value, solver.principal_variation(board, depth - 1), solver.move_count
+
+class RootSplitPool:
+    """Worker processes that search root moves; every root move is one task, so idle workers pick up the next.
+
+    A search keeps at most `threads` of its root moves in flight, so searches asking for fewer
+    workers than the pool has leave the rest to others.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.stop_flags = multiprocessing.Array('b', STOP_SLOTS, lock=False)
+        self.executor = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(self.stop_flags,)
+        )
+        self.free_slots = list(range(STOP_SLOTS))
+        self.lock = threading.Lock()
+        # Inside a SearchPool worker the exiting process joins its children, so the pool must shut down
+        # before multiprocessing closes its queues (exitpriority 10) or the workers never see the sentinel.
+        multiprocessing.util.Finalize(self, self.executor.shutdown, kwargs={"cancel_futures": True}, exitpriority=100)
+
+    def run(self, board: Board, root_moves: list[tuple], depth: int, use_tablebase: bool, should_stop, selective: tuple[str, ...] = (), threads: int | None = None) -> list[tuple] | None:
+        """Results in root_moves order, or None when no stop slot is free. Raises SearchTimeout once should_stop() is true."""
+        with self.lock:
+            if not self.free_slots:
+                return None
+            slot = self.free_slots.pop()
+        self.stop_flags[slot] = 0
+        try:
+            limit = min(threads or self.workers, self.workers)
+            futures, pending = [], set()
+            while len(futures) < len(root_moves) or pending:
+                while len(futures) < len(root_moves) and len(pending) < limit:
+                    futures.append(self.executor.submit(search_root_move, board, root_moves[len(futures)], depth, slot, use_tablebase, selective))
+                    pending.add(futures[-1])
+                _, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+                if pending and should_stop():
+                    self.stop_flags[slot] = 1
+                    for future in pending:
+                        future.cancel()
+                    wait(pending)
+                    raise SearchTimeout()
+            results = [future.result() for future in futures]
+            if any(result is None for result in results):
+                raise SearchTimeout()
+            return results
+        finally:
+            with self.lock:
+                self.free_slots.append(slot)
+
+_root_pool: RootSplitPool | None = None
+_root_pool_lock = threading.Lock()
+
+def get_root_pool() -> RootSplitPool:
+    """This process's root pool of ROOT_WORKERS workers, started on first use."""
+    global _root_pool
+    with _root_pool_lock:
+        if _root_pool is None:
+            _root_pool = RootSplitPool(ROOT_WORKERS)
+        return _root_pool
+
+class ParallelAISolver(AISolver):
+    """AISolver that splits the root moves across up to `threads` workers of the root pool.
+
+    search_root already gives every root move its own full window, so searching them in
+    parallel and picking the best in the same move order gives the serial best move and
+    evaluation. Only the root is split; each worker runs the ordinary serial minimax.
+    """
+
+    def __init__(self, evaluator: StaticEvaluator, search_depth: int = 4, tt_size_bits: int = 17, tablebase=None, time_budget_ms: int | None = None, threads: int = 2, selective: tuple[str, ...] = ()):
+        super().__init__(evaluator, search_depth, tt_size_bits, tablebase, time_budget_ms, selective)
+        self.threads = threads
+        self.root_pv = None
+
+    def search_root(self, board: Board, legal_moves: dict[Piece, set[tuple]], depth: int):
+        if self.threads <= 1 or depth <= 1:
+            self.root_pv = None
+            return super().search_root(board, legal_moves, depth)
+        root_key = board.hash_key()
+        root_entry = self.transposition_table.probe(root_key)
+        sorted_moves = self.order_moves(board, legal_moves, root_entry[4] if root_entry else None)
+        root_moves = [((piece.row, piece.col), move) for piece, move in sorted_moves]
+        results = get_root_pool().run(board, root_moves, depth, self.tablebase is not None, self.search_interrupted, self.selective, self.threads)
+        if results is None:
+            self.root_pv = None
+            return super().search_root(board, legal_moves, depth)
+        is_maximizing = board.to_move == 'white'
+        best_index, best_value = None, -float('inf') if is_maximizing else float('inf')
+        for index, (value, _, nodes) in enumerate(results):
+            self.move_count += nodes
+            if (value > best_value) if is_maximizing else (value < best_value):
+                best_index, best_value = index, value
+        self.root_pv = [root_moves[best_index]] + results[best_index][1]
+        if self.multipv > 1:
+            self.root_lines = [(value, root_move, [root_move] + pv) for root_move, (value, pv, _) in zip(root_moves, results)]
+        self.transposition_table.store(root_key, depth, best_value, EXACT, root_moves[best_index])
+        return sorted_moves[best_index], best_value
+
+    def principal_variation(self, board: Board, max_length: int) -> list[tuple]:
+        # Below the root the best line lives in the workers' tables, so it comes back with the results.
+        # An aborted iteration leaves root_pv from the last completed one.
+        if self.root_pv is None:
+            return super().principal_variation(board, max_length)
+        return self.root_pv[:max_length]
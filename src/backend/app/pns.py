@@ -0,0 +1,245 @@
+import time
+from .bitboard import BitBoard
+from .board import Board
+from .minimax import MATE_SCORE
+from .piece import Piece
+from .solver import SearchTimeout
+from .status import position_status
+
+# Proof and disproof numbers of a solved node; sums are capped here.
+INFINITY = 1 << 30
+# Positions expanded before a search gives up with result "unknown".
+DEFAULT_MAX_NODES = 200000
+# A line that has not mated black after this many plies counts as no mate.
+DEFAULT_MAX_PLIES = 80
+DEFAULT_MAX_MEMORY_MB = 256
+# Measured with tracemalloc: one transposition table entry, key and list included.
+ENTRY_BYTES = 200
+# Stands for the search horizon in a refutation's line positions: such a refutation is never reused.
+PAST_HORIZON = frozenset((None,))
+
+def weak_sum(numbers: list[int]) -> int:
+    """Weak proof-number sum: the largest unsolved number plus one per other unsolved one.
+
+    A true sum counts a position reached by two moves twice, and in these endgames, where
+    almost every position transposes, the sums grow until they mean nothing.
+    """
+    unsolved = [number for number in numbers if number]
+    return min(max(unsolved) + len(unsolved) - 1, INFINITY) if unsolved else 0
+
+class SearchLimit(Exception):
+    """Raised inside the search once max_nodes, max_memory_mb or time_budget_ms is reached."""
+
+class ProofNumberSolver:
+    """Proves forced mates for white with depth-first proof-number search (df-pn).
+
+    A position where white is to move is proven once one move mates by force; a position where
+    black is to move, once every reply does. Proof and disproof numbers estimate how many more
+    positions must be solved to prove or refute a mate, and the search always works on the
+    most-proving position, descending depth-first under thresholds like Nagai's df-pn. A new
+    position starts with its number of moves as its proof (black) or disproof (white) number,
+    so checks that leave black few replies come first. Numbers live in a transposition table,
+    which is also where the memory limit applies.
+
+    Stalemate, losing the piece, repeating a position of the line or the game, and reaching
+    max_plies refute a line. The proven mate is the shortest one the search proved from the
+    positions it solved, not necessarily the shortest there is.
+    """
+
+    def __init__(self, max_nodes: int = DEFAULT_MAX_NODES, max_plies: int = DEFAULT_MAX_PLIES, max_memory_mb: int = DEFAULT_MAX_MEMORY_MB, time_budget_ms: int | None = None, fallback_solver=None):
+        self.max_nodes = max_nodes
+        self.max_plies = max_plies
+        self.max_entries = max_memory_mb * (1 << 20) // ENTRY_BYTES
+        self.time_budget_ms = time_budget_ms
+        self.deadline = None
+        self.fallback_solver = fallback_solver
+        # Optional callable polled during the search; returning True cancels it.
+        self.should_stop = None
+        self.nodes = 0
+        # hash_key -> [proof, disproof, plies to mate once proven, line positions a refutation relied on]
+        self.table = {}
+        self.history = set()
+        self.line = set()
+
+    def prove(self, board: Board) -> dict:
+        """Searches until the position is solved or a limit is hit.
+
+        Returns {"result": "mate" | "no_mate" | "unknown", "nodes", ...} plus, for a mate, its length
+        in plies and the line as ((from_row, from_col), (to_row, to_col)) pairs with black's longest defence.
+        """
+        time_start = time.perf_counter()
+        self.deadline = time_start + self.time_budget_ms / 1000 if self.time_budget_ms is not None else None
+        self.nodes = 0
+        self.table = {}
+        # Positions of the game so far, and of the line being searched.
+        self.history, self.line = board.history.repetition_keys, set()
+        # The search runs on a bitboard copy, the faster move generator, whatever the game's backend.
+        work = BitBoard()
+        work.load_position(board.packed_position())
+        work.to_move = board.to_move
+        root = self._lookup(work, 0)
+        limit = None
+        try:
+            if root[0] and root[1]:
+                self._search(work, INFINITY, INFINITY, 0)
+        except SearchLimit as reached:
+            limit = str(reached)
+        proof, disproof, plies, _ = root
+        result = {
+            "result": "mate" if proof == 0 else "no_mate" if disproof == 0 else "unknown",
+            "nodes": self.nodes, "table_entries": len(self.table),
+            "seconds": round(time.perf_counter() - time_start, 4), "limit": limit
+        }
+        if proof == 0:
+            result["plies"] = plies
+            result["pv"] = self._proven_line(work)
+        self.table = {}
+        return result
+
+    def find_best_move(self, board: Board) -> tuple[tuple[Piece, tuple[int, int]], int, dict] | None:
+        if board.to_move != 'white':
+            return self.fallback_solver.find_best_move(board) if self.fallback_solver else None
+        proof = self.prove(board)
+        if proof["result"] != "mate":
+            if self.fallback_solver is None:
+                return None
+            result = self.fallback_solver.find_best_move(board)
+            if result:
+                result[2]["mate_search"] = proof
+            return result
+        (from_square, move), plies = proof["pv"][0], proof["plies"]
+        # Same convention as TablebaseSolver: MATE_SCORE + search depth (0) - plies to mate.
+        evaluation = MATE_SCORE - plies
+        analysis = {
+            "evaluation": evaluation, "search_depth": 0, "nodes_visited": proof["nodes"], "pv": proof["pv"],
+            "mate_plies": plies, "table_entries": proof["table_entries"], "decision_rule": "Proof-Number Search"
+        }
+        return (board.get_piece(*from_square), move), evaluation, analysis
+
+    def _lookup(self, board: Board, ply: int) -> list:
+        """The position's table entry, created with initial numbers when it is new.
+
+        A refutation that relied on repeating a position of the line lists those positions and
+        only counts while they are on the current line; past max_plies it never does. A proven
+        mate that would end past max_plies from here counts as past the horizon too.
+        """
+        if ply:
+            if board.zobrist_key in self.history:
+                return [INFINITY, 0, 0, None]
+            if board.zobrist_key in self.line:
+                return [INFINITY, 0, 0, frozenset((board.zobrist_key,))]
+            if ply >= self.max_plies:
+                return [INFINITY, 0, 0, PAST_HORIZON]
+        key = board.hash_key()
+        entry = self.table.get(key)
+        if entry is not None and entry[0] == 0 and ply + entry[2] > self.max_plies:
+            return [INFINITY, 0, 0, PAST_HORIZON]
+        if entry is not None and (entry[3] is None or entry[3] <= self.line):
+            return entry
+        if entry is None and len(self.table) >= self.max_entries:
+            raise SearchLimit("max_memory_mb")
+        status = position_status(board)
+        if status.is_checkmate and board.to_move == 'black':
+            entry = [0, INFINITY, 0, None]
+        elif status.winner:
+            entry = [INFINITY, 0, 0, None]
+        else:
+            moves = sum(len(moves) for moves in status.legal_moves.values())
+            entry = [1, moves, 0, None] if board.to_move == 'white' else [moves, 1, 0, None]
+        self.table[key] = entry
+        return entry
+
+    def _children(self, board: Board, ply: int) -> list[tuple]:
+        children = []
+        for (row, col), moves in position_status(board).legal_moves.items():
+            piece = board.get_piece(row, col)
+            for move in moves:
+                board.push((piece, move))
+                children.append((piece, move, self._lookup(board, ply + 1)))
+                board.pop()
+        return children
+
+    def _search(self, board: Board, proof_threshold: int, disproof_threshold: int, ply: int):
+        """Works below the position until its proof or disproof number reaches its threshold."""
+        self.nodes += 1
+        if self.nodes >= self.max_nodes:
+            raise SearchLimit("max_nodes")
+        if self.nodes & 63 == 0:
+            if self.should_stop is not None and self.should_stop():
+                raise SearchTimeout()
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise SearchLimit("time_budget_ms")
+        entry = self.table[board.hash_key()]
+        white_to_move = board.to_move == 'white'
+        # Proof numbers for white's choices, disproof numbers for black's.
+        own, other = (0, 1) if white_to_move else (1, 0)
+        thresholds = (proof_threshold, disproof_threshold)
+        self.line.add(board.zobrist_key)
+        try:
+            # The line to this position stays the same while it is searched, so the children's entries do too.
+            children = self._children(board, ply)
+            while True:
+                numbers = [0, 0]
+                numbers[own] = min(child[own] for _, _, child in children)
+                numbers[other] = weak_sum([child[other] for _, _, child in children])
+                entry[0], entry[1] = numbers
+                if entry[0] == 0:
+                    plies = [child[2] for _, _, child in children if child[0] == 0]
+                    entry[2] = (min(plies) if white_to_move else max(plies)) + 1
+                elif entry[1] == 0:
+                    entry[3] = self._refutation_line(board, white_to_move, children)
+                if entry[0] >= proof_threshold or entry[1] >= disproof_threshold:
+                    return
+                # The most-proving child and, for its thresholds, the runner-up's number.
+                best_index, second = 0, INFINITY
+                for index, (_, _, child) in enumerate(children):
+                    if child[own] < children[best_index][2][own]:
+                        second = children[best_index][2][own]
+                        best_index = index
+                    elif index != best_index and child[own] < second:
+                        second = child[own]
+                piece, move, child = children[best_index]
+                child_thresholds = [0, 0]
+                # Going a quarter past the runner-up (df-pn 1+epsilon) saves switching back and forth between two children.
+                child_thresholds[own] = min(thresholds[own], second + 1 + second // 4)
+                child_thresholds[other] = min(thresholds[other] - numbers[other] + child[other], INFINITY)
+                board.push((piece, move))
+                self._search(board, child_thresholds[0], child_thresholds[1], ply + 1)
+                board.pop()
+        finally:
+            self.line.discard(board.zobrist_key)
+
+    def _refutation_line(self, board: Board, white_to_move: bool, children: list[tuple]) -> frozenset | None:
+        """The line positions a refutation of this position relied on, or None when it holds on any line."""
+        if white_to_move:
+            refuted = [child[3] for _, _, child in children if child[3] is not None]
+            depends = frozenset().union(*refuted)
+        else:
+            refuted = [child[3] for _, _, child in children if child[1] == 0]
+            if None in refuted:
+                return None
+            depends = min(refuted, key=len)
+        depends = depends - {board.zobrist_key}
+        return depends or None
+
+    def _proven_line(self, board: Board) -> list[tuple]:
+        line = []
+        root_undo_depth = board.undo_depth()
+        while True:
+            proof, _, plies, _ = self.table.get(board.hash_key(), (INFINITY, 0, 0, None))
+            if proof or plies == 0:
+                break
+            best = None
+            for (row, col), moves in position_status(board).legal_moves.items():
+                for move in moves:
+                    board.push((board.get_piece(row, col), move))
+                    child = self.table.get(board.hash_key())
+                    board.pop()
+                    if child is not None and child[0] == 0 and child[2] == plies - 1:
+                        best = best or ((row, col), move)
+            if best is None:
+                break
+            line.append(best)
+            board.push((board.get_piece(*best[0]), best[1]))
+        board.pop_to(root_undo_depth)
+        return line
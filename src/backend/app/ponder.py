@@ -0,0 +1,141 @@
+import asyncio
+import os
+import threading
+import time
+from .workers import SearchPool
+
+# Branches of sessions that never asked for their move again are dropped after this long.
+PONDER_KEEP_SECONDS = 600
+
+class _Branch:
+    __slots__ = ('state', 'time_budget_ms', 'future', 'slot')
+
+    def __init__(self, state: dict, time_budget_ms: int):
+        self.state = state
+        self.time_budget_ms = time_budget_ms
+        self.future = None
+        self.slot = None
+
+class Ponderer:
+    """Searches the AI's answer to every player move while the player is still thinking.
+
+    Each session has one branch per legal player move, started in order on idle SearchPool
+    workers and limited to budget_ms of search each (less when the game plays on a smaller
+    time budget). Once the player moves, the other branches are stopped; the next AI move
+    stops the matching branch too and takes its deepest completed iteration.
+    """
+
+    def __init__(self, pool: SearchPool, budget_ms: int):
+        self.pool = pool
+        self.budget_ms = budget_ms
+        self.branches: dict[str, tuple[float, list[_Branch]]] = {}
+        self.lock = threading.RLock()
+        self.started = self.searched = self.discarded = 0
+        self.hits = self.running_hits = self.misses = 0
+        pool.idle_callback = self._fill
+
+    def start(self, session_id: str, states: list[dict]):
+        """Ponders the positions in states, most likely first, replacing the session's earlier branches."""
+        self.cancel(session_id)
+        if not states:
+            return
+        with self.lock:
+            now = time.time()
+            for stale_id in [key for key, (started, _) in self.branches.items() if now - started > PONDER_KEEP_SECONDS]:
+                self._discard(self.branches.pop(stale_id)[1])
+            budget_ms = min(self.budget_ms, states[0]["solver_config"]["time_budget_ms"] or self.budget_ms)
+            self.branches[session_id] = (now, [_Branch(state, budget_ms) for state in states])
+            self.started += 1
+        self._fill()
+
+    def _fill(self):
+        with self.lock:
+            for _, branches in self.branches.values():
+                for branch in branches:
+                    if branch.future is not None:
+                        continue
+                    submitted = self.pool.ponder(branch.state, branch.time_budget_ms)
+                    if submitted is None:
+                        return
+                    branch.future, branch.slot = submitted
+                    self.searched += 1
+
+    def _discard(self, branches: list[_Branch], keep: _Branch | None = None):
+        for branch in branches:
+            if branch is keep:
+                continue
+            if branch.future is not None:
+                self.pool.stop(branch.future, branch.slot)
+            self.discarded += 1
+
+    def cancel(self, session_id: str):
+        with self.lock:
+            entry = self.branches.pop(session_id, None)
+            if entry is not None:
+                self._discard(entry[1])
+
+    def player_moved(self, session_id: str, state: dict):
+        """Stops every branch except the one for state, the game's to_state() after the player's move."""
+        with self.lock:
+            entry = self.branches.get(session_id)
+            if entry is None:
+                return
+            branch = next((b for b in entry[1] if b.state == state), None)
+            self._discard(entry[1], keep=branch)
+            if branch is None:
+                del self.branches[session_id]
+            else:
+                self.branches[session_id] = (entry[0], [branch])
+        # The branch may still be waiting for a worker; the stopped ones just freed theirs.
+        self._fill()
+
+    async def take(self, session_id: str, state: dict):
+        """The pondered search_ai_move() result for state, or None when there is none to use.
+
+        A branch still searching is stopped and answers with its deepest completed iteration;
+        one that has not completed any yet gives None, so the caller starts a fresh search.
+        """
+        with self.lock:
+            entry = self.branches.pop(session_id, None)
+            if entry is None:
+                return None
+            branch = next((b for b in entry[1] if b.state == state), None)
+            self._discard(entry[1], keep=branch)
+            if branch is None or branch.future is None:
+                self.misses += 1
+                return None
+            finished = branch.future.done()
+            if not finished:
+                self.pool.stop(branch.future, branch.slot)
+                # Still queued: dropped before it searched anything.
+                if branch.future.cancelled():
+                    self.misses += 1
+                    return None
+        try:
+            result = await asyncio.wrap_future(branch.future)
+        except Exception:
+            result = None
+        with self.lock:
+            if result is None:
+                self.misses += 1
+                return None
+            if finished:
+                self.hits += 1
+            else:
+                self.running_hits += 1
+        result[2]["ponder"] = "hit" if finished else "running"
+        return result
+
+    def stats(self) -> dict:
+        with self.lock:
+            answered = self.hits + self.running_hits + self.misses
+            return {
+                "budget_ms": self.budget_ms, "sessions": len(self.branches),
+                "started": self.started, "searched": self.searched, "discarded": self.discarded,
+                "hits": self.hits, "running_hits": self.running_hits, "misses": self.misses,
+                "hit_rate": (self.hits + self.running_hits) / answered if answered else 0.0
+            }
+
+def create_ponderer(pool: SearchPool) -> Ponderer:
+    """Builds the ponderer with PONDER_BUDGET_MS of search per branch."""
+    return Ponderer(pool, int(os.getenv("PONDER_BUDGET_MS", "5000")))
@@ -0,0 +1,21 @@
+from .board import Board
+from .game import BOARD_BACKENDS
+
+def load_position(text: str, board_backend: str = 'grid') -> Board:
+    """Parses the three-line WK/WP/BK format of Board.from_text, white to move."""
+    board = BOARD_BACKENDS[board_backend].from_text(text)
+    board.to_move = 'white'
+    return board
+
+def load_epd(record: str, board_backend: str = 'grid') -> tuple[str, Board]:
+    """Parses "placement side; id name" into (name, board)."""
+    position, _, operations = record.partition(';')
+    placement, side = position.split()
+    name = operations.strip().removeprefix('id').strip() or placement
+    board = BOARD_BACKENDS[board_backend]()
+    board.load_from_fen(placement)
+    if board.white_king is None or board.black_king is None:
+        raise ValueError(f"{placement} needs both kings.")
+    board.to_move = 'white' if side == 'w' else 'black'
+    board.start_history()
+    return name, board
@@ -0,0 +1,104 @@
+import base64
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from .solver import AISolver
+
+# The AISolver hook each timed phase of the search goes through.
+PHASE_METHODS = {"movegen": "generate_moves", "ordering": "order_moves", "eval": "evaluate_leaf", "repetition": "is_repetition"}
+PROFILE_MODES = ("timers", "cprofile", "sample")
+# Rows of the cProfile summary returned with a profiled search.
+PROFILE_SUMMARY_ROWS = 40
+# A sampler thread only gets the GIL every sys.getswitchinterval() (5 ms), so sampling faster gains nothing.
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+class SearchTimers:
+    """Wall time spent in each phase of an AISolver search.
+
+    attach() wraps the solver's generate_moves, order_moves, evaluate_leaf and is_repetition
+    hooks on the instance, so solvers without timers run the plain methods. The phases do not
+    nest, and whatever is left (recursion, make/unmake, TT probes) is reported as "other".
+    """
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASE_METHODS, 0.0)
+
+    def attach(self, solver: AISolver):
+        for phase, name in PHASE_METHODS.items():
+            setattr(solver, name, self._timed(phase, getattr(solver, name)))
+
+    def _timed(self, phase: str, method):
+        seconds, perf_counter = self.seconds, time.perf_counter
+        def timed(*args):
+            start = perf_counter()
+            try:
+                return method(*args)
+            finally:
+                seconds[phase] += perf_counter() - start
+        return timed
+
+    def report(self, total_seconds: float) -> dict:
+        timings = {phase: round(seconds * 1000, 3) for phase, seconds in self.seconds.items()}
+        timings["other"] = round(max(total_seconds - sum(self.seconds.values()), 0.0) * 1000, 3)
+        return timings
+
+class StackSampler:
+    """Samples the stack of the thread that entered it and counts identical stacks.
+
+    folded() is the collapsed-stack text ("outer;inner count" per line) read by
+    flamegraph.pl, speedscope and most other flame graph viewers.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.counts = Counter()
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.counts.most_common())
+
+def profile_call(mode: str, function, *args):
+    """Runs function(*args) under the profiler for mode; returns (its result, profile dict).
+
+    "cprofile" gives a text summary sorted by cumulative time plus the raw stats, base64
+    encoded, which saved as a .prof file opens in snakeviz or converts with flameprof.
+    "sample" gives folded stacks. "timers" adds no profiler; the caller reports SearchTimers.
+    """
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function, *args)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_SUMMARY_ROWS)
+        profiler.create_stats()
+        return result, {"format": "pstats", "summary": summary.getvalue(), "data": base64.b64encode(marshal.dumps(profiler.stats)).decode()}
+    if mode == "sample":
+        with StackSampler() as sampler:
+            result = function(*args)
+        return result, {"format": "folded", "interval_ms": sampler.interval * 1000, "samples": sum(sampler.counts.values()), "data": sampler.folded()}
+    return function(*args), None
@@ -0,0 +1,90 @@
+from .board import Board
+from .minimax import MATE_THRESHOLD
+from .piece import Piece
+from .solver import AISolver
+from .transposition import EXACT, LOWER_BOUND, UPPER_BOUND
+
+# Half-width of the first aspiration window around the previous iteration's score.
+ASPIRATION_WINDOW = 50
+
+class PVSSolver(AISolver):
+    """AISolver running principal variation search (NegaScout) with aspiration windows.
+
+    The first move of every node is searched with the full window and the rest with a null
+    window, re-searched only when they fail high. At the root the window narrows as moves are
+    searched, and each iteration starts from a window around the previous iteration's score.
+    Scores are whole numbers, so a null window of width 1 separates them exactly.
+    """
+    use_pvs = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.aspiration_researches = 0
+
+    def start_search(self, board: Board, multipv: int = 1) -> dict[Piece, set[tuple]]:
+        self.aspiration_researches = 0
+        return super().start_search(board, multipv)
+
+    def search_stats(self) -> dict:
+        return {**super().search_stats(), "aspiration_researches": self.aspiration_researches}
+
+    def search_iteration(self, board: Board, legal_moves: dict[Piece, set[tuple]], depth: int, previous_value: float | None):
+        # A window around the best score says nothing about the runner-up lines of a multipv search.
+        if previous_value is None or abs(previous_value) >= MATE_THRESHOLD or self.multipv > 1:
+            return self.search_root(board, legal_moves, depth)
+        alpha, beta = previous_value - ASPIRATION_WINDOW, previous_value + ASPIRATION_WINDOW
+        while True:
+            move, value = self.search_root(board, legal_moves, depth, alpha, beta)
+            if alpha < value < beta:
+                return move, value
+            # Outside the window the score is only a bound, so open that side and search again.
+            self.aspiration_researches += 1
+            if value <= alpha:
+                alpha = -float('inf')
+            else:
+                beta = float('inf')
+
+    def search_root(self, board: Board, legal_moves: dict[Piece, set[tuple]], depth: int, alpha: float = -float('inf'), beta: float = float('inf')):
+        self.root_depth = depth
+        is_maximizing = board.to_move == 'white'
+        best_move, best_value = None, -float('inf') if is_maximizing else float('inf')
+        alpha_orig, beta_orig = alpha, beta
+        root_key = board.hash_key()
+        root_entry = self.transposition_table.probe(root_key)
+        sorted_moves = self.order_moves(board, legal_moves, root_entry[4] if root_entry else None)
+        history = set(board.history.repetition_keys)
+        self.root_lines = []
+        for move_number, (piece, move) in enumerate(sorted_moves):
+            root_move = ((piece.row, piece.col), move)
+            board.push((piece, move))
+            child_is_maximizing = board.to_move == 'white'
+            # With multipv the first multipv moves get the full window; the rest only have to beat the multipv-th best line.
+            if move_number < self.multipv:
+                value = self.minimax(board, depth - 1, alpha, beta, child_is_maximizing, history)
+            else:
+                scout_alpha, scout_beta = (alpha, alpha + 1) if is_maximizing else (beta - 1, beta)
+                value = self.minimax(board, depth - 1, scout_alpha, scout_beta, child_is_maximizing, history)
+                if alpha < value < beta:
+                    value = self.minimax(board, depth - 1, alpha, beta, child_is_maximizing, history)
+            if self.multipv > 1 and alpha < value < beta:
+                self.root_lines.append((value, root_move, [root_move] + self.principal_variation(board, depth - 1)))
+            board.pop()
+            if is_maximizing and value > best_value or not is_maximizing and value < best_value:
+                best_move, best_value = (piece, move), value
+            if self.multipv > 1:
+                if len(self.root_lines) >= self.multipv:
+                    nth_value = sorted((line[0] for line in self.root_lines), reverse=is_maximizing)[self.multipv - 1]
+                    alpha, beta = (nth_value, beta) if is_maximizing else (alpha, nth_value)
+            elif is_maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if self.progress is not None:
+                self.report_root_move(depth, move_number + 1, len(sorted_moves), best_move, best_value)
+            if alpha >= beta:
+                break
+        if best_value <= alpha_orig: bound = UPPER_BOUND
+        elif best_value >= beta_orig: bound = LOWER_BOUND
+        else: bound = EXACT
+        self.transposition_table.store(root_key, depth, best_value, bound, ((best_move[0].row, best_move[0].col), best_move[1]))
+        return best_move, best_value
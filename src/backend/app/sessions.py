@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from .game import Game
+
+# Rough cost of one filled transposition-table slot (tuple, ints and move tuples).
+TT_ENTRY_BYTES = 200
+
+def estimate_game_bytes(game: Game) -> int:
+    size = len(json.dumps(game.to_state()))
+    solver = game.solver
+    while solver is not None:
+        table = getattr(solver, 'transposition_table', None)
+        if table is not None:
+            size += sys.getsizeof(table.slots) + table.occupied * TT_ENTRY_BYTES
+        solver = getattr(solver, 'fallback_solver', None)
+    return size
+
+class SessionStore(ABC):
+    """Maps session ids to games. Use checkout() so changes made to the game are kept."""
+
+    @abstractmethod
+    def create(self, game: Game, session_id: str | None = None) -> str:
+        pass
+
+    @abstractmethod
+    def checkout(self, session_id: str | None):
+        """Context manager yielding the session's game, or None for an unknown or expired session."""
+        pass
+
+    @abstractmethod
+    def stats(self) -> dict:
+        pass
+
+class _MemorySession:
+    def __init__(self, game: Game):
+        self.game = game
+        self.lock = threading.Lock()
+        self.last_access = time.time()
+        self.size = estimate_game_bytes(game)
+
+class MemorySessionStore(SessionStore):
+    """Live Game objects in this process, evicted least-recently-used first by TTL, count and memory."""
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sessions: OrderedDict[str, _MemorySession] = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def create(self, game: Game, session_id: str | None = None) -> str:
+        session_id = session_id or uuid.uuid4().hex
+        with self.lock:
+            self._remove(session_id)
+            session = _MemorySession(game)
+            self.sessions[session_id] = session
+            self.total_bytes += session.size
+            self._evict()
+        return session_id
+
+    @contextmanager
+    def checkout(self, session_id: str | None):
+        with self.lock:
+            self._evict()
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+                session.last_access = time.time()
+        if session is None:
+            yield None
+            return
+        # One request at a time per game: searches push/pop moves on the live board.
+        with session.lock:
+            yield session.game
+            size = estimate_game_bytes(session.game)
+        with self.lock:
+            if self.sessions.get(session_id) is session:
+                self.total_bytes += size - session.size
+                session.size = size
+                self._evict()
+
+    def _remove(self, session_id: str):
+        session = self.sessions.pop(session_id, None)
+        if session is not None:
+            self.total_bytes -= session.size
+
+    def _evict(self):
+        expired_before = time.time() - self.ttl_seconds
+        while self.sessions:
+            oldest_id, oldest = next(iter(self.sessions.items()))
+            over_limit = len(self.sessions) > self.max_sessions or self.total_bytes > self.max_bytes
+            if oldest.last_access >= expired_before and not over_limit:
+                break
+            # The most recent session is kept even when it alone exceeds the memory cap.
+            if len(self.sessions) == 1 and oldest.last_access >= expired_before:
+                break
+            self._remove(oldest_id)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"backend": "memory", "sessions": len(self.sessions), "bytes": self.total_bytes, "evictions": self.evictions}
+
+class SqliteSessionStore(SessionStore):
+    """Sessions serialised with Game.to_state() into a SQLite file, shared by all workers on the host."""
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl_seconds: float = 3600):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(id TEXT PRIMARY KEY, state TEXT NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _save(self, conn, session_id: str, game: Game):
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (id, state, last_access) VALUES (?, ?, ?)",
+            (session_id, json.dumps(game.to_state(), separators=(',', ':')), now)
+        )
+        conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM sessions WHERE id IN "
+            "(SELECT id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+
+    def create(self, game: Game, session_id: str | None = None) -> str:
+        session_id = session_id or uuid.uuid4().hex
+        with closing(self._connect()) as conn, conn:
+            self._save(conn, session_id, game)
+        return session_id
+
+    @contextmanager
+    def checkout(self, session_id: str | None):
+        # The write lock is taken before the read and held until the save, so requests on one session,
+        # from any process, run one after another like MemorySessionStore's per-session lock makes them.
+        # Checkouts are short (searches run on a copy), so locking the whole file costs little.
+        with closing(self._connect()) as conn:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT state FROM sessions WHERE id = ? AND last_access >= ?",
+                    (session_id, time.time() - self.ttl_seconds)
+                ).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    yield None
+                    return
+                game = Game.from_state(json.loads(row[0]))
+                yield game
+                self._save(conn, session_id, game)
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as conn:
+            sessions, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM sessions").fetchone()
+        return {"backend": "sqlite", "sessions": sessions, "bytes": size}
+
+def create_session_store() -> SessionStore:
+    """Builds the store selected by SESSION_STORE ('memory' or 'sqlite') and the SESSION_* limits."""
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+    max_sessions = int(os.getenv("SESSION_MAX", "1000"))
+    if os.getenv("SESSION_STORE", "memory") == "sqlite":
+        return SqliteSessionStore(os.getenv("SESSION_DB_PATH", "sessions.db"), max_sessions, ttl_seconds)
+    max_bytes = int(float(os.getenv("SESSION_MAX_MB", "256")) * 1024 * 1024)
+    return MemorySessionStore(max_sessions, ttl_seconds, max_bytes)
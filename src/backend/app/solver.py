@@ -1,54 +1,222 @@
-import copy
 import random
 import math
+import time
 from .board import Board
-from .minimax import StaticEvaluator, MATE_SCORE, manhattan_distance
-from .piece import Piece, Queen, King
+from .minimax import StaticEvaluator, MATE_SCORE, MATE_THRESHOLD
+from .ordering import MoveOrderer, gives_check
+from .piece import Piece, Queen, King, Pawn
+from .status import PositionStatus, position_status
+from .tablebase import Tablebase
+from .transposition import TranspositionTable, value_from_tt, EXACT, LOWER_BOUND, UPPER_BOUND
+
+MAX_SEARCH_DEPTH = 64
+# Selective search toggles of AISolver, all off by default.
+SELECTIVE_OPTIONS = ("check_extension", "seventh_rank_extension", "promotion_extension", "quiescence", "late_move_reductions")
+# Late move reductions apply from this move number (0 = first) and remaining depth on.
+LMR_MIN_MOVE_NUMBER = 3
+LMR_MIN_DEPTH = 3
+
+def effective_branching_factor(nodes: int, depth: int) -> float:
+    """The b for which a uniform tree of this depth has as many nodes as the search visited."""
+    return round(nodes ** (1 / depth), 3) if nodes and depth else 0.0
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the deadline passes or should_stop() asks to cancel."""
 
 class AISolver:
-    def __init__(self, evaluator: StaticEvaluator, search_depth: int = 4):
+    # Principal variation search: scout all but the first move of a node with a null window.
+    use_pvs = False
+
+    def __init__(self, evaluator: StaticEvaluator, search_depth: int = 4, tt_size_bits: int = 17, tablebase: Tablebase | None = None, time_budget_ms: int | None = None, selective: tuple[str, ...] = ()):
+        unknown = set(selective) - set(SELECTIVE_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown selective search option: {', '.join(sorted(unknown))}")
         self.evaluator = evaluator
         self.search_depth = search_depth
         self.move_count = 0
+        self.transposition_table = TranspositionTable(tt_size_bits)
+        self.tablebase = tablebase
+        # With a time budget the search deepens iteratively instead of stopping at search_depth.
+        self.time_budget_ms = time_budget_ms
+        self.deadline = None
+        # Optional callable polled during the search; returning True cancels it.
+        self.should_stop = None
+        # Optional callable given an info dict after every completed depth and searched root move.
+        self.progress = None
+        self.search_start = 0.0
+        self.move_orderer = MoveOrderer()
+        # Depth of the current root search, so minimax can tell its ply from its remaining depth.
+        self.root_depth = 0
+        self.movegen_calls = 0
+        self.eval_calls = 0
+        # Extensions search a move a ply deeper: checks, pawn pushes to the seventh rank, promotions.
+        # Quiescence plays out promotions at the leaves; late quiet king moves are searched a ply shallower first.
+        self.selective = tuple(option for option in SELECTIVE_OPTIONS if option in selective)
+        self.extend_checks = "check_extension" in selective
+        self.extend_seventh_rank = "seventh_rank_extension" in selective
+        self.extend_promotions = "promotion_extension" in selective
+        self.use_quiescence = "quiescence" in selective
+        self.use_lmr = "late_move_reductions" in selective
+        self.extensions = 0
+        self.reductions = 0
+        self.lmr_researches = 0
+        # With multipv > 1, search_root keeps (value, root move, pv) of every root move it scores exactly.
+        self.multipv = 1
+        self.root_lines = []
 
-    def order_moves(self, board: Board, legal_moves: dict[Piece, set[tuple]]):
-        all_moves_flat = []
-        for piece, moves in legal_moves.items():
-            for move in moves:
-                all_moves_flat.append((piece, move))
-
-        def get_move_score(move_tuple):
-            piece, move = move_tuple
-            score = 0
-            temp_board = copy.deepcopy(board)
-            temp_piece = temp_board.get_piece(piece.row, piece.col)
-            temp_board.make_move(temp_piece, move[0], move[1])
-            if temp_board.is_check(temp_board.to_move): score += 100
-            if isinstance(piece, Queen):
-                dist_before = manhattan_distance((piece.row, piece.col), (board.black_king.row, board.black_king.col))
-                dist_after = manhattan_distance((move[0], move[1]), (board.black_king.row, board.black_king.col))
-                if dist_after < dist_before: score += 10
-            return score
-        return sorted(all_moves_flat, key=get_move_score, reverse=True)
-
-    def find_best_move(self, board: Board) -> tuple[tuple[Piece, tuple[int, int]], int, dict] | None:
+    def order_moves(self, board: Board, legal_moves: dict[Piece, set[tuple]], tt_move: tuple | None = None, ply: int = 0):
+        return self.move_orderer.order(board, legal_moves, tt_move, ply)
+
+    def start_search(self, board: Board, multipv: int = 1) -> dict[Piece, set[tuple]]:
+        """Resets the per-search counters and returns the root's legal moves."""
+        self.multipv = multipv
+        self.root_lines = []
         self.move_count = 0
+        self.movegen_calls = 0
+        self.eval_calls = 0
+        self.extensions = 0
+        self.reductions = 0
+        self.lmr_researches = 0
+        self.search_start = time.perf_counter()
+        self.transposition_table.new_search()
+        self.move_orderer.new_search()
+        return board.get_all_legal_moves(board.to_move)
+
+    def find_best_move(self, board: Board, time_budget_ms: int | None = None, multipv: int = 1) -> tuple[tuple[Piece, tuple[int, int]], int, dict] | None:
+        """With multipv > 1 the analysis also lists the multipv best root moves as "multipv", from the same search."""
+        legal_moves = self.start_search(board, multipv)
+        if not legal_moves:
+            return None
+        if time_budget_ms is None:
+            time_budget_ms = self.time_budget_ms
+        if time_budget_ms is not None:
+            return self.iterative_deepening(board, legal_moves, time_budget_ms)
+        if self.use_pvs:
+            # Aspiration windows need the previous iteration's score, so PVS always deepens.
+            return self.iterative_deepening(board, legal_moves, None, self.search_depth)
+        root_undo_depth = board.undo_depth()
+        try:
+            best_move, best_value = self.search_root(board, legal_moves, self.search_depth)
+        except SearchTimeout:
+            board.pop_to(root_undo_depth)
+            raise
+        analysis = {
+            "evaluation": best_value,
+            "nodes_visited": self.move_count,
+            "search_depth": self.search_depth,
+            "effective_branching_factor": effective_branching_factor(self.move_count, self.search_depth),
+            "pv": self.principal_variation(board, self.search_depth),
+            **self.search_stats()
+        }
+        if multipv > 1:
+            analysis["multipv"] = self.multipv_lines(board)
+        return best_move, best_value, analysis
+
+    def ponder(self, board: Board, time_budget_ms: int) -> tuple[tuple[Piece, tuple[int, int]], int, dict] | None:
+        """Searches a position the opponent may move into, before they do.
+
+        Deepens to search_depth, or further when the solver plays on a time budget, and stops after
+        time_budget_ms or at should_stop(); the result is the deepest completed iteration.
+        """
+        legal_moves = self.start_search(board)
+        if not legal_moves:
+            return None
+        max_depth = MAX_SEARCH_DEPTH if self.time_budget_ms is not None else self.search_depth
+        return self.iterative_deepening(board, legal_moves, time_budget_ms, max_depth)
+
+    def search_stats(self) -> dict:
+        stats = {
+            "movegen_calls": self.movegen_calls, "eval_calls": self.eval_calls,
+            **self.transposition_table.stats(), **self.move_orderer.stats()
+        }
+        if self.selective:
+            stats.update({
+                "selective": list(self.selective), "extensions": self.extensions,
+                "reductions": self.reductions, "lmr_researches": self.lmr_researches
+            })
+        return stats
+
+    def iterative_deepening(self, board: Board, legal_moves: dict[Piece, set[tuple]], time_budget_ms: int | None, max_depth: int = MAX_SEARCH_DEPTH):
+        """Searches depth 1, 2, 3... until the budget runs out and keeps the deepest completed result.
+
+        Each iteration stores its principal variation in the transposition table, so the next,
+        deeper iteration searches the previous best line first.
+        """
+        time_start = time.perf_counter()
+        root_undo_depth = board.undo_depth()
+        best_move, best_value, depth_reached = None, None, 0
+        iteration_times, aborted, lines = [], False, None
+        # The first iteration always completes so there is a move to play.
+        self.deadline = None
+        for depth in range(1, max_depth + 1):
+            iteration_start = time.perf_counter()
+            try:
+                move, value = self.search_iteration(board, legal_moves, depth, best_value)
+            except SearchTimeout:
+                board.pop_to(root_undo_depth)
+                if best_move is None:
+                    raise
+                aborted = True
+            iteration_times.append(round((time.perf_counter() - iteration_start) * 1000, 3))
+            if aborted:
+                break
+            best_move, best_value, depth_reached = move, value, depth
+            if self.multipv > 1:
+                lines = self.multipv_lines(board)
+            if self.progress is not None:
+                self.report_progress({
+                    "event": "depth", "depth": depth, "best_move": ((move[0].row, move[0].col), move[1]),
+                    "score": value, "pv": self.principal_variation(board, depth)
+                })
+            if time_budget_ms is None:
+                continue
+            # Alpha-beta already found the shortest mate within this depth; deeper iterations cannot improve it.
+            if best_value >= MATE_THRESHOLD:
+                break
+            self.deadline = time_start + time_budget_ms / 1000
+            if time.perf_counter() >= self.deadline:
+                break
+        self.deadline = None
+        analysis = {
+            "evaluation": best_value,
+            "nodes_visited": self.move_count,
+            "search_depth": depth_reached,
+            "effective_branching_factor": effective_branching_factor(self.move_count, depth_reached),
+            "pv": self.principal_variation(board, depth_reached),
+            "time_budget_ms": time_budget_ms,
+            "iteration_times_ms": iteration_times,
+            "aborted": aborted,
+            **self.search_stats()
+        }
+        if lines is not None:
+            analysis["multipv"] = lines
+        return best_move, best_value, analysis
+
+    def search_iteration(self, board: Board, legal_moves: dict[Piece, set[tuple]], depth: int, previous_value: float | None):
+        return self.search_root(board, legal_moves, depth)
+
+    def search_root(self, board: Board, legal_moves: dict[Piece, set[tuple]], depth: int):
         best_move = None
+        self.root_depth = depth
         is_maximizing = board.to_move == 'white'
         best_value = -float('inf') if is_maximizing else float('inf')
-        legal_moves = board.get_all_legal_moves(board.to_move)
-        if not legal_moves:
-            return None
-        sorted_moves = self.order_moves(board, legal_moves)
-        for piece, move in sorted_moves:
-            temp_board = copy.deepcopy(board)
-            piece_on_temp_board = temp_board.get_piece(piece.row, piece.col)
-            temp_board.make_move(piece_on_temp_board, move[0], move[1])
+        root_key = board.hash_key()
+        root_entry = self.transposition_table.probe(root_key)
+        sorted_moves = self.order_moves(board, legal_moves, root_entry[4] if root_entry else None)
+        history = set(board.history.repetition_keys)
+        self.root_lines = []
+        for move_number, (piece, move) in enumerate(sorted_moves, 1):
+            root_move = ((piece.row, piece.col), move)
+            board.push((piece, move))
             board_value = self.minimax(
-                temp_board, self.search_depth - 1, -float('inf'), float('inf'),
-                is_maximizing_player=(temp_board.to_move == 'white'),
-                history=set(board.move_history)
+                board, depth - 1, -float('inf'), float('inf'),
+                is_maximizing_player=(board.to_move == 'white'),
+                history=history
             )
+            if self.multipv > 1:
+                # Every root move gets a full window here, so every score is exact.
+                self.root_lines.append((board_value, root_move, [root_move] + self.principal_variation(board, depth - 1)))
+            board.pop()
             if is_maximizing:
                 if board_value > best_value:
                     best_value = board_value
@@ -57,46 +225,202 @@ class AISolver:
                 if board_value < best_value:
                     best_value = board_value
                     best_move = (piece, move)
-        
-        analysis = {
-            "evaluation": best_value,
-            "nodes_visited": self.move_count,
-            "search_depth": self.search_depth
-        }
-        return best_move, best_value, analysis
+            if self.progress is not None:
+                self.report_root_move(depth, move_number, len(sorted_moves), best_move, best_value)
+        self.transposition_table.store(root_key, depth, best_value, EXACT, ((best_move[0].row, best_move[0].col), best_move[1]))
+        return best_move, best_value
+
+    def multipv_lines(self, board: Board) -> list[dict]:
+        """The multipv best of the last search_root()'s root lines, best first, as {"move", "evaluation", "pv"}."""
+        # sorted() is stable, so equal scores keep search order and the first line is the move search_root picked.
+        lines = sorted(self.root_lines, key=lambda line: line[0], reverse=board.to_move == 'white')
+        return [{"move": move, "evaluation": value, "pv": pv} for value, move, pv in lines[:self.multipv]]
+
+    def principal_variation(self, board: Board, max_length: int) -> list[tuple]:
+        """Follows best moves stored in the transposition table, as ((from_row, from_col), (to_row, to_col)) pairs."""
+        pv, seen = [], set()
+        root_undo_depth = board.undo_depth()
+        while len(pv) < max_length and board.hash_key() not in seen:
+            seen.add(board.hash_key())
+            entry = self.transposition_table.get(board.hash_key())
+            if entry is None or entry[4] is None:
+                break
+            from_square, move = entry[4]
+            piece = board.get_piece(*from_square)
+            if piece is None or piece.color != board.to_move or move not in board.get_legal_moves_for_piece(piece):
+                break
+            pv.append(entry[4])
+            board.push((piece, move))
+        board.pop_to(root_undo_depth)
+        return pv
+
+    def report_progress(self, info: dict):
+        elapsed = time.perf_counter() - self.search_start
+        self.progress({
+            **info, "nodes": self.move_count, "nps": int(self.move_count / elapsed) if elapsed > 0 else 0,
+            "elapsed_ms": round(elapsed * 1000, 1)
+        })
 
-    def minimax(self, board: Board, depth: int, alpha: float, beta: float, is_maximizing_player: bool, history: set):
+    def report_root_move(self, depth: int, move_number: int, moves: int, best_move: tuple, best_value: float):
+        # Within an unfinished iteration the best move so far is only provisional.
+        self.report_progress({
+            "event": "root_move", "depth": depth, "move_number": move_number, "moves": moves,
+            "best_move": ((best_move[0].row, best_move[0].col), best_move[1]), "score": best_value
+        })
+
+    def search_interrupted(self) -> bool:
+        if self.should_stop is not None and self.should_stop():
+            return True
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    # minimax goes through these hooks so SearchTimers can time each kind of work separately.
+    def is_repetition(self, position_key: int, history: set) -> bool:
+        return position_key in history
+
+    def generate_moves(self, board: Board) -> PositionStatus:
+        self.movegen_calls += 1
+        return position_status(board)
+
+    def evaluate_leaf(self, board: Board, distance: int):
+        self.eval_calls += 1
+        if self.tablebase is not None and self.tablebase.covers(board):
+            # Exact result: a draw, or a mate dtm plies past this leaf.
+            dtm = self.tablebase.probe_dtm(board)
+            return 0 if dtm is None else MATE_SCORE + distance - dtm
+        return self.evaluator.evaluate(board)
+
+    def selective_depth(self, board: Board, piece: Piece, move: tuple, depth: int, ply: int, move_number: int, in_check: bool) -> tuple[int, int]:
+        """(depth to search move to, reduction to try first), with the enabled extensions and reductions applied."""
+        # Capped at twice the root depth so a run of checks cannot extend a line forever.
+        if ply < 2 * self.root_depth:
+            extended = self.extend_checks and gives_check(board, piece, move)
+            if not extended and isinstance(piece, Pawn):
+                extended = self.extend_seventh_rank and move[0] == 1 or self.extend_promotions and move[0] == 0
+            if extended:
+                self.extensions += 1
+                return depth, 0
+        if (self.use_lmr and depth >= LMR_MIN_DEPTH and move_number >= LMR_MIN_MOVE_NUMBER and not in_check
+                and isinstance(piece, King) and board.get_piece(*move) is None and not gives_check(board, piece, move)):
+            self.reductions += 1
+            return depth - 1, 1
+        return depth - 1, 0
+
+    def quiescence(self, board: Board, status: PositionStatus, alpha: float, beta: float, is_maximizing_player: bool, history: set, ply: int):
+        """Leaf value once white has promoted and black has taken the new queen, where either side prefers that to standing pat."""
+        value = self.evaluate_leaf(board, self.root_depth - ply)
+        piece = board.white_piece
+        if is_maximizing_player and isinstance(piece, Pawn) and piece.row == 1:
+            moves = [(piece, move) for move in status.legal_moves.get((piece.row, piece.col), ()) if move[0] == 0]
+        elif not is_maximizing_player and isinstance(piece, Queen):
+            king, target = board.black_king, (piece.row, piece.col)
+            moves = [(king, target)] if target in status.legal_moves.get((king.row, king.col), ()) else []
+        else:
+            return value
+        for piece, move in moves:
+            if value >= beta if is_maximizing_player else value <= alpha:
+                break
+            board.push((piece, move))
+            score = self.minimax(board, 0, alpha, beta, not is_maximizing_player, history, ply + 1)
+            board.pop()
+            if is_maximizing_player:
+                value, alpha = max(value, score), max(alpha, score)
+            else:
+                value, beta = min(value, score), min(beta, score)
+        return value
+
+    def minimax(self, board: Board, depth: int, alpha: float, beta: float, is_maximizing_player: bool, history: set, ply: int | None = None):
         self.move_count += 1
-        current_fen = board.to_fen()
-        if current_fen in history: return 0
-        if board.is_checkmate(board.to_move): return -MATE_SCORE - depth if is_maximizing_player else MATE_SCORE + depth
-        if board.is_stalemate(board.to_move): return 0
-        if depth == 0: return self.evaluator.evaluate(board)
-        legal_moves = board.get_all_legal_moves(board.to_move)
-        sorted_moves = self.order_moves(board, legal_moves)
-        new_history = history.copy()
-        new_history.add(current_fen)
+        if self.move_count & 127 == 0 and self.search_interrupted():
+            raise SearchTimeout()
+        if ply is None:
+            ply = self.root_depth - depth
+        # Mate scores count from the root depth rather than the remaining depth, which extensions and reductions change.
+        distance = self.root_depth - ply
+        position_key = board.zobrist_key
+        if self.is_repetition(position_key, history): return 0
+        tt_key = board.hash_key()
+        tt_move = None
+        entry = self.transposition_table.probe(tt_key)
+        if entry is not None:
+            _, entry_depth, entry_value, bound, tt_move, _, entry_distance = entry
+            # Only entries of the same depth cut off: a deeper one would graft a result the fixed-depth
+            # search cannot see, which depends on what was searched before and so differs between PVS and minimax.
+            if entry_depth == depth:
+                value = value_from_tt(entry_value, entry_distance, distance)
+                if bound == EXACT: return value
+                if bound == LOWER_BOUND and value >= beta: return value
+                if bound == UPPER_BOUND and value <= alpha: return value
+        status = self.generate_moves(board)
+        if status.is_checkmate: return -MATE_SCORE - distance if is_maximizing_player else MATE_SCORE + distance
+        if status.is_stalemate: return 0
+        if depth == 0:
+            if self.use_quiescence:
+                return self.quiescence(board, status, alpha, beta, is_maximizing_player, history, ply)
+            return self.evaluate_leaf(board, distance)
+        legal_moves = status.moves_by_piece(board)
+        sorted_moves = self.order_moves(board, legal_moves, tt_move, ply)
+        alpha_orig, beta_orig = alpha, beta
+        best_move = None
+        # The history set holds the current path only, so it is extended and trimmed in place.
+        history.add(position_key)
         if is_maximizing_player:
-            max_eval = -float('inf')
-            for piece, move in sorted_moves:
-                temp_board = copy.deepcopy(board)
-                piece_on_temp_board = temp_board.get_piece(piece.row, piece.col)
-                temp_board.make_move(piece_on_temp_board, move[0], move[1])
-                eval_score = self.minimax(temp_board, depth - 1, alpha, beta, False, new_history)
-                max_eval = max(max_eval, eval_score)
+            best_eval = -float('inf')
+            for move_number, (piece, move) in enumerate(sorted_moves):
+                from_square = (piece.row, piece.col)
+                child_depth, reduction = depth - 1, 0
+                if self.selective:
+                    child_depth, reduction = self.selective_depth(board, piece, move, depth, ply, move_number, status.is_check)
+                board.push((piece, move))
+                full_search = True
+                if reduction:
+                    eval_score = self.minimax(board, child_depth - reduction, alpha, alpha + 1, False, history, ply + 1)
+                    # A reduced move that fails high is searched again at full depth.
+                    full_search = eval_score > alpha
+                    self.lmr_researches += full_search
+                if full_search:
+                    if self.use_pvs and move_number > 0:
+                        eval_score = self.minimax(board, child_depth, alpha, alpha + 1, False, history, ply + 1)
+                        if alpha < eval_score < beta:
+                            eval_score = self.minimax(board, child_depth, alpha, beta, False, history, ply + 1)
+                    else:
+                        eval_score = self.minimax(board, child_depth, alpha, beta, False, history, ply + 1)
+                board.pop()
+                if eval_score > best_eval:
+                    best_eval, best_move = eval_score, (from_square, move)
                 alpha = max(alpha, eval_score)
-                if beta <= alpha: break
-            return max_eval
+                if beta <= alpha:
+                    self.move_orderer.record_cutoff(board, from_square, move, depth, ply, move_number)
+                    break
         else:
-            min_eval = float('inf')
-            for piece, move in sorted_moves:
-                temp_board = copy.deepcopy(board)
-                piece_on_temp_board = temp_board.get_piece(piece.row, piece.col)
-                temp_board.make_move(piece_on_temp_board, move[0], move[1])
-                eval_score = self.minimax(temp_board, depth - 1, alpha, beta, True, new_history)
-                min_eval = min(min_eval, eval_score)
+            best_eval = float('inf')
+            for move_number, (piece, move) in enumerate(sorted_moves):
+                from_square = (piece.row, piece.col)
+                child_depth, reduction = depth - 1, 0
+                if self.selective:
+                    child_depth, reduction = self.selective_depth(board, piece, move, depth, ply, move_number, status.is_check)
+                board.push((piece, move))
+                full_search = True
+                if reduction:
+                    eval_score = self.minimax(board, child_depth - reduction, beta - 1, beta, True, history, ply + 1)
+                    full_search = eval_score < beta
+                    self.lmr_researches += full_search
+                if full_search:
+                    if self.use_pvs and move_number > 0:
+                        eval_score = self.minimax(board, child_depth, beta - 1, beta, True, history, ply + 1)
+                        if alpha < eval_score < beta:
+                            eval_score = self.minimax(board, child_depth, alpha, beta, True, history, ply + 1)
+                    else:
+                        eval_score = self.minimax(board, child_depth, alpha, beta, True, history, ply + 1)
+                board.pop()
+                if eval_score < best_eval:
+                    best_eval, best_move = eval_score, (from_square, move)
                 beta = min(beta, eval_score)
-                if beta <= alpha: break
-            return min_eval
-
-
+                if beta <= alpha:
+                    self.move_orderer.record_cutoff(board, from_square, move, depth, ply, move_number)
+                    break
+        history.discard(position_key)
+        if best_eval <= alpha_orig: bound = UPPER_BOUND
+        elif best_eval >= beta_orig: bound = LOWER_BOUND
+        else: bound = EXACT
+        self.transposition_table.store(tt_key, depth, best_eval, bound, best_move, distance)
+        return best_eval
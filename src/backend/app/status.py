@@ -0,0 +1,64 @@
+import threading
+from .board import Board
+from .piece import Piece
+
+STATUS_CACHE_SIZE = 1 << 14
+
+class PositionStatus:
+    """Legal moves and game-end flags of one position, from the side to move's point of view.
+
+    legal_moves maps (row, col) of each movable piece to its move set, in the same order as
+    Board.get_all_legal_moves. The sets are shared through the cache and must not be modified.
+    """
+    __slots__ = ('legal_moves', 'is_check', 'is_checkmate', 'is_stalemate', 'winner')
+
+    def __init__(self, board: Board):
+        legal_moves = board.get_all_legal_moves(board.to_move)
+        self.legal_moves = {(piece.row, piece.col): moves for piece, moves in legal_moves.items()}
+        self.is_check = board.is_check(board.to_move)
+        self.is_checkmate = self.is_check and not legal_moves
+        self.is_stalemate = not self.is_check and not legal_moves
+        if not board.white_piece or self.is_stalemate:
+            self.winner = 'draw'
+        elif self.is_checkmate:
+            self.winner = 'black' if board.to_move == 'white' else 'white'
+        else:
+            self.winner = None
+
+    def moves_by_piece(self, board: Board) -> dict[Piece, set[tuple]]:
+        """legal_moves keyed by board's own Piece objects, like Board.get_all_legal_moves."""
+        return {board.get_piece(row, col): moves for (row, col), moves in self.legal_moves.items()}
+
+class StatusCache:
+    """PositionStatus by Board.hash_key(); the oldest entry is dropped once max_entries is reached."""
+
+    def __init__(self, max_entries: int = STATUS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: dict[int, PositionStatus] = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, board: Board) -> PositionStatus:
+        key = board.hash_key()
+        status = self.entries.get(key)
+        if status is not None:
+            self.hits += 1
+            return status
+        self.misses += 1
+        status = PositionStatus(board)
+        with self.lock:
+            if len(self.entries) >= self.max_entries:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = status
+        return status
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"status_cache_entries": len(self.entries), "status_cache_hit_rate": self.hits / lookups if lookups else 0.0}
+
+# Shared by Game and the solvers in this process.
+position_statuses = StatusCache()
+
+def position_status(board: Board) -> PositionStatus:
+    return position_statuses.get(board)
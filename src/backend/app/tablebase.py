@@ -0,0 +1,225 @@
+import argparse
+import mmap
+import os
+import time
+from .bitboard import KING_ATTACKS, PAWN_ATTACKS, queen_attacks, square_index
+from .board import Board
+from .minimax import MATE_SCORE
+from .piece import Piece, Pawn, Queen
+
+# File layout: magic, KPK win/draw bits, KPK distance-to-mate bytes, KQK distance-to-mate bytes.
+# Every table is indexed by tablebase_index(); DTM bytes hold plies until black is mated.
+MAGIC = b"KPKQTB1\0"
+POSITIONS = 2 * 64 * 64 * 64
+WHITE_TO_MOVE_POSITIONS = POSITIONS // 2
+NO_WIN = 255
+KPK_BITS_OFFSET = len(MAGIC)
+KPK_DTM_OFFSET = KPK_BITS_OFFSET + POSITIONS // 8
+KQK_DTM_OFFSET = KPK_DTM_OFFSET + POSITIONS
+FILE_SIZE = KQK_DTM_OFFSET + POSITIONS
+DEFAULT_PATH = os.getenv("TABLEBASE_PATH", os.path.join(os.path.dirname(__file__), "tablebase.bin"))
+
+# Black-to-move positions where black can capture or is stalemated can never be won.
+_NEVER_WON = 255
+
+def tablebase_index(white_to_move: bool, wk: int, piece: int, bk: int) -> int:
+    return ((0 if white_to_move else WHITE_TO_MOVE_POSITIONS) | wk << 12 | piece << 6 | bk)
+
+def _adjacent(a: int, b: int) -> bool:
+    return bool(KING_ATTACKS[a] >> b & 1)
+
+def _white_attacks(wk: int, piece: int, is_queen: bool, occupancy: int) -> int:
+    if is_queen:
+        return KING_ATTACKS[wk] | queen_attacks(piece, occupancy)
+    return KING_ATTACKS[wk] | PAWN_ATTACKS[piece]
+
+def _is_legal_white_to_move(wk: int, piece: int, bk: int, is_queen: bool) -> bool:
+    occupancy = 1 << wk | 1 << piece | 1 << bk
+    return not _white_attacks(wk, piece, is_queen, occupancy) >> bk & 1
+
+def _squares(mask: int):
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+def _solve(is_queen: bool, kqk_dtm: bytearray | None = None) -> bytearray:
+    """Retrograde analysis for KQK (is_queen) or KPK under this engine's move rules.
+
+    Positions are finalised in increasing distance-to-mate order: a white-to-move position
+    takes the first (shortest) winning successor, a black-to-move position is won once all
+    of its moves lead to finalised wins. KPK positions that promote read their value from
+    the already solved KQK table.
+    """
+    dtm = bytearray([NO_WIN]) * POSITIONS
+    remaining = bytearray(POSITIONS)
+    buckets = [[] for _ in range(256)]
+    piece_squares = range(64) if is_queen else range(8, 56)
+
+    for wk in range(64):
+        for piece in piece_squares:
+            if piece == wk:
+                continue
+            for bk in range(64):
+                if bk == wk or bk == piece or _adjacent(wk, bk):
+                    continue
+                occupancy = 1 << wk | 1 << piece | 1 << bk
+                black_index = tablebase_index(False, wk, piece, bk)
+                attacked = _white_attacks(wk, piece, is_queen, occupancy & ~(1 << bk))
+                targets = KING_ATTACKS[bk] & ~attacked
+                in_check = attacked >> bk & 1
+                if targets >> piece & 1:
+                    remaining[black_index] = _NEVER_WON
+                elif targets:
+                    remaining[black_index] = targets.bit_count()
+                elif in_check:
+                    dtm[black_index] = 0
+                    buckets[0].append(black_index)
+                else:
+                    remaining[black_index] = _NEVER_WON
+                if is_queen or in_check or piece >= 16 or occupancy >> (piece - 8) & 1:
+                    continue
+                # Promotion exits: white-to-move KPK positions whose push lands in a won KQK position.
+                promoted_dtm = kqk_dtm[tablebase_index(False, wk, piece - 8, bk)]
+                if promoted_dtm != NO_WIN:
+                    white_index = tablebase_index(True, wk, piece, bk)
+                    dtm[white_index] = promoted_dtm + 1
+                    buckets[promoted_dtm + 1].append(white_index)
+
+    for distance in range(255):
+        for index in buckets[distance]:
+            if dtm[index] != distance:
+                continue
+            wk, piece, bk = index >> 12 & 63, index >> 6 & 63, index & 63
+            occupancy = 1 << wk | 1 << piece | 1 << bk
+            if index >= WHITE_TO_MOVE_POSITIONS:
+                predecessors = []
+                for from_square in _squares(KING_ATTACKS[wk] & ~occupancy & ~KING_ATTACKS[bk]):
+                    predecessors.append((from_square, piece))
+                if is_queen:
+                    for from_square in _squares(queen_attacks(piece, occupancy) & ~occupancy):
+                        predecessors.append((wk, from_square))
+                else:
+                    if piece < 48 and not occupancy >> (piece + 8) & 1:
+                        predecessors.append((wk, piece + 8))
+                        if piece >> 3 == 4 and not occupancy >> (piece + 16) & 1:
+                            predecessors.append((wk, piece + 16))
+                for from_wk, from_piece in predecessors:
+                    if not _is_legal_white_to_move(from_wk, from_piece, bk, is_queen):
+                        continue
+                    white_index = tablebase_index(True, from_wk, from_piece, bk)
+                    if dtm[white_index] > distance + 1:
+                        dtm[white_index] = distance + 1
+                        buckets[distance + 1].append(white_index)
+            else:
+                for from_bk in _squares(KING_ATTACKS[bk] & ~occupancy & ~KING_ATTACKS[wk]):
+                    black_index = tablebase_index(False, wk, piece, from_bk)
+                    if remaining[black_index] == _NEVER_WON or dtm[black_index] != NO_WIN:
+                        continue
+                    remaining[black_index] -= 1
+                    if remaining[black_index] == 0:
+                        dtm[black_index] = distance + 1
+                        buckets[distance + 1].append(black_index)
+    return dtm
+
+def generate(path: str = DEFAULT_PATH):
+    time_start = time.time()
+    kqk_dtm = _solve(is_queen=True)
+    kpk_dtm = _solve(is_queen=False, kqk_dtm=kqk_dtm)
+    kpk_bits = bytearray(POSITIONS // 8)
+    for index, value in enumerate(kpk_dtm):
+        if value != NO_WIN:
+            kpk_bits[index >> 3] |= 1 << (index & 7)
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(kpk_bits)
+        f.write(kpk_dtm)
+        f.write(kqk_dtm)
+    return time.time() - time_start
+
+class Tablebase:
+    """Read-only view of a generated tablebase file, memory-mapped so probes are single byte reads."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) != FILE_SIZE or self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a KPK/KQK tablebase file.")
+        self.probes = 0
+
+    def _index(self, board: Board) -> int:
+        wk, piece, bk = board.white_king, board.white_piece, board.black_king
+        return tablebase_index(
+            board.to_move == 'white', square_index(wk.row, wk.col),
+            square_index(piece.row, piece.col), square_index(bk.row, bk.col)
+        )
+
+    def covers(self, board: Board) -> bool:
+        return isinstance(board.white_piece, (Pawn, Queen))
+
+    def is_win(self, board: Board) -> bool:
+        self.probes += 1
+        if isinstance(board.white_piece, Queen):
+            return self.data[KQK_DTM_OFFSET + self._index(board)] != NO_WIN
+        index = self._index(board)
+        return bool(self.data[KPK_BITS_OFFSET + (index >> 3)] >> (index & 7) & 1)
+
+    def probe_dtm(self, board: Board) -> int | None:
+        """Plies until black is mated with best play, or None when white cannot force mate."""
+        self.probes += 1
+        offset = KQK_DTM_OFFSET if isinstance(board.white_piece, Queen) else KPK_DTM_OFFSET
+        value = self.data[offset + self._index(board)]
+        return None if value == NO_WIN else value
+
+_loaded_tablebases = {}
+
+def load_tablebase(path: str = DEFAULT_PATH) -> Tablebase | None:
+    """Returns the shared Tablebase for path, or None when the file has not been generated."""
+    if path not in _loaded_tablebases:
+        _loaded_tablebases[path] = Tablebase(path) if os.path.exists(path) else None
+    return _loaded_tablebases[path]
+
+class TablebaseSolver:
+    def __init__(self, tablebase: Tablebase, fallback_solver=None):
+        self.tablebase = tablebase
+        self.fallback_solver = fallback_solver
+
+    def find_best_move(self, board: Board) -> tuple[tuple[Piece, tuple[int, int]], int, dict] | None:
+        if not self.tablebase.covers(board) and self.fallback_solver:
+            return self.fallback_solver.find_best_move(board)
+        legal_moves = board.get_all_legal_moves(board.to_move)
+        if not legal_moves:
+            return None
+        is_white = board.to_move == 'white'
+        best_move, best_dtm = None, None
+        for piece, moves in legal_moves.items():
+            for move in moves:
+                board.push((piece, move))
+                dtm = self.tablebase.probe_dtm(board) if self.tablebase.covers(board) else None
+                board.pop()
+                if best_move is None:
+                    best_move, best_dtm = (piece, move), dtm
+                elif is_white and dtm is not None and (best_dtm is None or dtm < best_dtm):
+                    best_move, best_dtm = (piece, move), dtm
+                elif not is_white and best_dtm is not None and (dtm is None or dtm > best_dtm):
+                    best_move, best_dtm = (piece, move), dtm
+        if best_dtm is None:
+            if is_white and self.fallback_solver:
+                return self.fallback_solver.find_best_move(board)
+            return best_move, 0, {"evaluation": 0, "search_depth": 0, "dtm": None, "decision_rule": "Tablebase Draw"}
+        # Same convention as AISolver mate scores (white's point of view): MATE_SCORE + search depth - plies to mate.
+        plies_to_mate = best_dtm + 1
+        evaluation = MATE_SCORE - plies_to_mate
+        analysis = {"evaluation": evaluation, "search_depth": 0, "dtm": plies_to_mate, "decision_rule": "Tablebase"}
+        return best_move, evaluation, analysis
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the KPK bitbase and KPK/KQK distance-to-mate tables.")
+    parser.add_argument("command", choices=["generate"])
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    args = parser.parse_args()
+    elapsed = generate(args.output)
+    print(f"Wrote {args.output} ({FILE_SIZE} bytes) in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+import time
+
+# Endpoints that create a session; the trace keeps the id they answered with.
+SESSION_ENDPOINTS = ("/api/setup", "/api/setup_from_file", "/api/setup_random")
+
+class TraceRecorder:
+    """Appends one JSON line per API request to a trace file that app.loadtest can replay.
+
+    A line holds the request (method, path, query string, content type and body), the session it
+    belongs to, when it arrived in seconds since the recorder started, and the status and latency
+    the server answered with. A setup also keeps the position it set up, which for /api/setup_random
+    is the only way to play it again. WebSocket streams are recorded when they open, without status or latency.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self.recorded = 0
+        self.lock = threading.Lock()
+        self.file = open(path, "a")
+
+    def record(self, method: str, path: str, query: str, content_type: str | None, body: bytes | None,
+               session_id: str | None, time_start: float, status: int | None = None, seconds: float | None = None,
+               position: str | None = None):
+        if session_id is None and body and (content_type or "").startswith("application/json"):
+            try:
+                session_id = json.loads(body).get("session_id")
+            except (ValueError, AttributeError):
+                pass
+        line = json.dumps({
+            "at": round(time_start - self.started, 4), "method": method, "path": path, "query": query,
+            "content_type": content_type, "body": body.decode("utf-8", "replace") if body else None,
+            "session_id": session_id, "position": position, "status": status, "ms": round(seconds * 1000, 2) if seconds is not None else None
+        }, separators=(',', ':'))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+            self.recorded += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def read_trace(path: str) -> list[dict]:
+    """The requests of a trace file in arrival order."""
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return sorted(entries, key=lambda entry: entry["at"])
+
+def create_trace_recorder() -> TraceRecorder | None:
+    """Records to TRACE_PATH; None (no recording) when it is unset."""
+    path = os.getenv("TRACE_PATH")
+    return TraceRecorder(path) if path else None
@@ -0,0 +1,68 @@
+from .minimax import MATE_SCORE, MATE_THRESHOLD
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+class TranspositionTable:
+    """Fixed-size hash table of search results keyed by Board.hash_key().
+
+    Each slot holds (key, depth, value, bound, best_move, generation, distance), distance being
+    the root depth minus the node's ply, which mate scores count from. A slot is overwritten
+    when it is empty, holds the same position, was written by an earlier search, or holds a
+    shallower result than the new one (depth-preferred replacement).
+    """
+
+    def __init__(self, size_bits: int = 17):
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.slots = [None] * self.size
+        self.occupied = 0
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self):
+        self.generation += 1
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, key: int):
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def get(self, key: int):
+        """Like probe() but without counting towards the hit rate."""
+        entry = self.slots[key & self.mask]
+        return entry if entry is not None and entry[0] == key else None
+
+    def store(self, key: int, depth: int, value: float, bound: int, best_move: tuple | None, distance: int | None = None):
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None:
+            self.occupied += 1
+        elif entry[0] != key and entry[5] == self.generation and entry[1] > depth:
+            return
+        # Without extensions or reductions on the way, a node's distance is its remaining depth.
+        self.slots[index] = (key, depth, value, bound, best_move, self.generation, depth if distance is None else distance)
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.occupied = 0
+
+    def stats(self) -> dict:
+        return {
+            "tt_probes": self.probes,
+            "tt_hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "tt_occupancy": self.occupied / self.size
+        }
+
+def value_from_tt(value: float, entry_distance: int, distance: int) -> float:
+    # Mate scores carry the distance at the mate node, so re-base them on the probing node.
+    if value >= MATE_THRESHOLD:
+        return value - (entry_distance - distance)
+    if value < -MATE_SCORE:
+        return value + (entry_distance - distance)
+    return value
@@ -0,0 +1,256 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from .game import Game
+from .pns import ProofNumberSolver
+from .profiling import SearchTimers, profile_call
+from .solver import AISolver, SearchTimeout
+
+class SearchPoolFull(Exception):
+    pass
+
+class SearchCancelled(Exception):
+    pass
+
+# Set in each worker process: one byte per pool slot, non-zero once that slot's search is cancelled,
+# and the queue streamed searches send their (stream_id, info) progress records to.
+_cancel_flags = None
+_progress_queue = None
+
+def _init_worker(cancel_flags, progress_queue):
+    global _cancel_flags, _progress_queue
+    _cancel_flags = cancel_flags
+    _progress_queue = progress_queue
+
+def run_search(game_state: dict, time_budget_ms: int | None, slot: int, ponder: bool = False, profile: str | None = None, stream_id: int | None = None, multipv: int = 1):
+    """Worker entry point. Rebuilds the game from Game.to_state() so no Board is shared between processes.
+
+    profile (a profiling.PROFILE_MODES value) adds per-phase search timings to the analysis,
+    and for "cprofile" or "sample" the captured profile as analysis["profile"].
+
+    With a stream_id the search reports its progress, and a minimax/PVS search deepens
+    iteratively like a ponder search so that stopping it keeps the deepest completed depth.
+    """
+    game = Game.from_state(game_state)
+    timers = SearchTimers() if profile else None
+    solver = game.solver
+    while solver is not None:
+        if isinstance(solver, (AISolver, ProofNumberSolver)):
+            solver.should_stop = lambda: _cancel_flags[slot] != 0
+        if isinstance(solver, AISolver):
+            if stream_id is not None:
+                solver.progress = lambda info: _progress_queue.put((stream_id, info))
+            if timers is not None:
+                timers.attach(solver)
+        solver = getattr(solver, 'fallback_solver', None)
+    if stream_id is not None and isinstance(game.solver, AISolver):
+        ponder, time_budget_ms = True, time_budget_ms or game.solver.time_budget_ms
+    time_start = time.perf_counter()
+    try:
+        result, captured = profile_call(profile, game.search_ai_move, time_budget_ms, ponder, multipv)
+    except SearchTimeout:
+        return None
+    if result and timers is not None:
+        result[2]["timings_ms"] = timers.report(time.perf_counter() - time_start)
+        if captured is not None:
+            result[2]["profile"] = captured
+    return result
+
+def run_mate_search(game_state: dict, max_nodes: int, max_plies: int, slot: int) -> dict | None:
+    """Worker entry point for Game.mate_search() with a ProofNumberSolver of these limits."""
+    game = Game.from_state(game_state)
+    solver = ProofNumberSolver(max_nodes=max_nodes, max_plies=max_plies)
+    solver.should_stop = lambda: _cancel_flags[slot] != 0
+    try:
+        return game.mate_search(solver)
+    except SearchTimeout:
+        return None
+
+class SearchPool:
+    """Bounded process pool for AI searches.
+
+    A search holds one of workers + max_queue slots from submission until its worker returns,
+    so at most max_queue searches wait behind the running ones and the rest are rejected.
+    The slot index is also the search's cancel flag, polled by AISolver.should_stop.
+
+    Ponder searches only start on idle workers and are stopped early, keeping their deepest
+    completed iteration, when a regular search would otherwise have to wait for them.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cancel_flags = multiprocessing.Array('b', workers + max_queue, lock=False)
+        # Spawned rather than forked: the server process already runs threads.
+        context = multiprocessing.get_context('spawn')
+        self.progress_queue = context.Queue()
+        self.executor = ProcessPoolExecutor(
+            workers, mp_context=context,
+            initializer=_init_worker, initargs=(self.cancel_flags, self.progress_queue)
+        )
+        self.free_slots = list(range(workers + max_queue))
+        self.lock = threading.Lock()
+        self.ponder_slots = set()
+        self.submitted = self.completed = self.rejected = self.cancelled = self.timed_out = 0
+        self.pondered = self.ponder_preempted = 0
+        self.search_seconds = 0.0
+        # Called without the lock whenever a search ends, e.g. so a Ponderer can use the freed worker.
+        self.idle_callback = None
+        self.closed = False
+        # Progress callbacks of streamed searches by stream id, fed by one reader thread.
+        self.stream_ids = itertools.count()
+        self.progress_listeners = {}
+        threading.Thread(target=self._read_progress, daemon=True).start()
+
+    def _active(self) -> int:
+        return self.workers + self.max_queue - len(self.free_slots)
+
+    def _read_progress(self):
+        while True:
+            stream_id, info = self.progress_queue.get()
+            if stream_id is None:
+                return
+            listener = self.progress_listeners.get(stream_id)
+            # Records can arrive after their search ended; by then nobody listens.
+            if listener is not None:
+                listener(info)
+
+    def _submit(self, game_state: dict, time_budget_ms: int | None, ponder: bool = False, profile: str | None = None, progress=None, mate_limits: tuple | None = None, multipv: int = 1):
+        with self.lock:
+            if ponder:
+                if self.closed or self._active() >= self.workers:
+                    return None
+            elif not self.free_slots:
+                self.rejected += 1
+                raise SearchPoolFull()
+            elif self._active() >= self.workers:
+                running_ponder = next((s for s in self.ponder_slots if not self.cancel_flags[s]), None)
+                if running_ponder is not None:
+                    self.cancel_flags[running_ponder] = 1
+                    self.ponder_preempted += 1
+            slot = self.free_slots.pop()
+            if ponder:
+                self.ponder_slots.add(slot)
+                self.pondered += 1
+            else:
+                self.submitted += 1
+            stream_id = None
+            if progress is not None:
+                stream_id = next(self.stream_ids)
+                self.progress_listeners[stream_id] = progress
+        self.cancel_flags[slot] = 0
+        time_start = time.perf_counter()
+        if mate_limits is not None:
+            future = self.executor.submit(run_mate_search, game_state, *mate_limits, slot)
+        else:
+            future = self.executor.submit(run_search, game_state, time_budget_ms, slot, ponder, profile, stream_id, multipv)
+        future.add_done_callback(lambda f: self._release(slot, f, time_start, stream_id))
+        return future, slot
+
+    def _release(self, slot: int, future, time_start: float, stream_id: int | None = None):
+        with self.lock:
+            self.progress_listeners.pop(stream_id, None)
+            if slot in self.ponder_slots:
+                self.ponder_slots.discard(slot)
+            elif not future.cancelled() and not self.cancel_flags[slot]:
+                self.completed += 1
+                self.search_seconds += time.perf_counter() - time_start
+            self.free_slots.append(slot)
+        if self.idle_callback is not None:
+            self.idle_callback()
+
+    def _cancel(self, future, slot: int, timed_out: bool):
+        # A queued search is dropped; a running one stops at its next node check.
+        if not future.cancel():
+            self.cancel_flags[slot] = 1
+        with self.lock:
+            if timed_out:
+                self.timed_out += 1
+            else:
+                self.cancelled += 1
+
+    def ponder(self, game_state: dict, time_budget_ms: int):
+        """Starts Game.search_ai_move(ponder=True) on an idle worker: (future, slot), or None when none is idle."""
+        return self._submit(game_state, time_budget_ms, ponder=True)
+
+    def stop(self, future, slot: int):
+        """Stops a ponder search; if it was already running its future still gets the partial result."""
+        if future.cancel():
+            return
+        with self.lock:
+            # Once done the slot may already belong to another search.
+            if not future.done():
+                self.cancel_flags[slot] = 1
+
+    async def search(self, game_state: dict, time_budget_ms: int | None, timeout_seconds: float, is_disconnected=None, profile: str | None = None, progress=None, stop_requested=None, multipv: int = 1):
+        """Runs Game.search_ai_move() in a worker and returns its result, profiled as run_search() describes when profile is set.
+
+        Raises SearchPoolFull when every slot is taken, TimeoutError after timeout_seconds and
+        SearchCancelled when the awaitable is_disconnected() reports that the client went away.
+
+        A progress callback streams the search: it is called from a reader thread with each
+        info dict the solver reports. Once stop_requested() is true the search stops early and
+        returns the deepest depth it completed.
+        """
+        future, slot = self._submit(game_state, time_budget_ms, profile=profile, progress=progress, multipv=multipv)
+        return await self._wait(future, slot, timeout_seconds, is_disconnected, stop_requested)
+
+    async def mate_search(self, game_state: dict, max_nodes: int, max_plies: int, timeout_seconds: float, is_disconnected=None) -> dict:
+        """Runs Game.mate_search() in a worker; raises like search()."""
+        future, slot = self._submit(game_state, None, mate_limits=(max_nodes, max_plies))
+        return await self._wait(future, slot, timeout_seconds, is_disconnected)
+
+    async def _wait(self, future, slot: int, timeout_seconds: float, is_disconnected=None, stop_requested=None):
+        waiter = asyncio.wrap_future(future)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout_seconds
+        stopped = False
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._cancel(future, slot, timed_out=True)
+                    raise TimeoutError()
+                done, _ = await asyncio.wait({waiter}, timeout=min(0.1, remaining))
+                if done:
+                    return waiter.result()
+                if stop_requested is not None and not stopped and stop_requested():
+                    # Unlike a cancel the caller still waits, for the deepest depth completed so far.
+                    self.cancel_flags[slot] = 1
+                    stopped = True
+                if is_disconnected is not None and await is_disconnected():
+                    self._cancel(future, slot, timed_out=False)
+                    raise SearchCancelled()
+        except asyncio.CancelledError:
+            self._cancel(future, slot, timed_out=False)
+            raise
+
+    def stats(self) -> dict:
+        with self.lock:
+            active = self._active()
+            return {
+                "workers": self.workers, "max_queue": self.max_queue,
+                "running": min(active, self.workers), "queued": max(active - self.workers, 0),
+                "submitted": self.submitted, "completed": self.completed, "rejected": self.rejected,
+                "cancelled": self.cancelled, "timed_out": self.timed_out,
+                "pondering": len(self.ponder_slots), "pondered": self.pondered, "ponder_preempted": self.ponder_preempted,
+                "avg_search_seconds": self.search_seconds / self.completed if self.completed else 0.0
+            }
+
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+        for slot in range(len(self.cancel_flags)):
+            self.cancel_flags[slot] = 1
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.progress_queue.put((None, None))
+
+def create_search_pool() -> SearchPool:
+    """Builds the pool from SEARCH_WORKERS (default: CPU count) and SEARCH_MAX_QUEUE."""
+    workers = int(os.getenv("SEARCH_WORKERS", str(os.cpu_count() or 1)))
+    max_queue = int(os.getenv("SEARCH_MAX_QUEUE", str(workers * 4)))
+    return SearchPool(workers, max_queue)
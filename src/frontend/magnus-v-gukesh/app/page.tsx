@@ -14,6 +14,7 @@ interface GameState {
     winner: 'white' | 'black' | 'draw' | null;
     history_count: number;
     current_move_index: number;
+    session_id: string;
     ai_move?: AnalysisInfo;
 }
 
@@ -25,6 +26,18 @@ interface AnalysisInfo {
     analysis: Record<string, string | number>;
 }
 
+interface SearchInfo {
+    event: 'depth' | 'root_move';
+    depth: number;
+    best_move: { from: string; to: string };
+    score: number;
+    mate_in: number | null;
+    nodes: number;
+    nps: number;
+    move_number?: number;
+    moves?: number;
+}
+
 interface ErrorResponse {
     error: string;
 }
@@ -80,9 +93,12 @@ export default function Home() {
     const [selectedAlgorithm, setSelectedAlgorithm] = useState('minimax');
     const [aiDepth, setAiDepth] = useState(5);
     const [analysisInfo, setAnalysisInfo] = useState<AnalysisInfo | null>(null);
+    const [searchInfo, setSearchInfo] = useState<SearchInfo | null>(null);
     const [error, setError] = useState('');
     const [isLoading, setIsLoading] = useState(false);
     const fileInputRef = useRef<HTMLInputElement>(null);
+    const sessionIdRef = useRef<string | null>(null);
+    const searchSocketRef = useRef<WebSocket | null>(null);
 
     // --- Effects ---
     useEffect(() => {
@@ -110,6 +126,7 @@ export default function Home() {
             if ("error" in response.data) {
                 setError(response.data.error);
             } else {
+                sessionIdRef.current = response.data.session_id;
                 setGame(response.data);
                 if (response.data.ai_move) {
                     setAnalysisInfo(response.data.ai_move);
@@ -125,7 +142,7 @@ export default function Home() {
 
     const handleSetup = (type: 'random' | 'file', payload?: File) => {
         let apiCall;
-        const params = { algorithm: selectedAlgorithm, ai_depth: aiDepth };
+        const params = { algorithm: selectedAlgorithm, ai_depth: aiDepth, session_id: sessionIdRef.current ?? undefined };
         setAnalysisInfo(null);
         setSelectedSquare(null);
         setLastMove(null);
@@ -142,13 +159,42 @@ export default function Home() {
     };
 
     const handleAiMove = () => {
-        handleApiCall(() => axios.get(`${API_BASE_URL}/api/ai_move`));
+        // The search streams its progress; "stop" makes it play the best move of the deepest finished depth.
+        setIsLoading(true);
+        setError('');
+        setSearchInfo(null);
+        const url = `${API_BASE_URL.replace(/^http/, 'ws')}/api/ai_move/stream?session_id=${sessionIdRef.current}`;
+        const socket = new WebSocket(url);
+        searchSocketRef.current = socket;
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'info') {
+                setSearchInfo(message);
+            } else if (message.type === 'error') {
+                setError(message.error);
+            } else if (message.type === 'result') {
+                sessionIdRef.current = message.session_id;
+                setGame(message);
+                if (message.ai_move) {
+                    setAnalysisInfo(message.ai_move);
+                }
+            }
+        };
+        socket.onerror = () => setError('Failed to connect to the backend. Is the Python server running?');
+        socket.onclose = () => {
+            searchSocketRef.current = null;
+            setIsLoading(false);
+        };
+    };
+
+    const handleStopSearch = () => {
+        searchSocketRef.current?.send('stop');
     };
 
     const handlePlayback = (command: string) => {
         setSelectedSquare(null);
         setLastMove(null);
-        handleApiCall(() => axios.post(`${API_BASE_URL}/api/playback`, { command }));
+        handleApiCall(() => axios.post(`${API_BASE_URL}/api/playback`, { command, session_id: sessionIdRef.current }));
     };
     
     const handleReset = () => {
@@ -179,7 +225,8 @@ export default function Home() {
                     start_row: selectedSquare.row,
                     start_col: selectedSquare.col,
                     end_row: row,
-                    end_col: col
+                    end_col: col,
+                    session_id: sessionIdRef.current
                 });
                 setSelectedSquare(null);
                 handleApiCall(apiCall);
@@ -260,10 +307,12 @@ export default function Home() {
                                     className="w-full p-2 bg-gray-700 rounded border border-gray-600 focus:ring-2 focus:ring-blue-500 disabled:opacity-50"
                                 >
                                     <option value="minimax">Minimax</option>
+                                    <option value="pvs">Minimax (PVS)</option>
                                     <option value="greedy">Greedy</option>
+                                    <option value="pns">Proof-Number (Mate Search)</option>
                                 </select>
                             </div>
-                             {selectedAlgorithm === 'minimax' && (
+                             {(selectedAlgorithm === 'minimax' || selectedAlgorithm === 'pvs' || selectedAlgorithm === 'pns') && (
                                 <div>
                                     <label htmlFor="depth" className="block text-sm font-medium text-gray-300 mb-1">AI Depth ({aiDepth})</label>
                                     <input 
@@ -290,7 +339,20 @@ export default function Home() {
                     <div className="p-4 bg-gray-800 rounded-lg shadow-lg flex-grow">
                         <h2 className="text-2xl font-bold border-b border-gray-700 pb-2 mb-4">Analysis</h2>
                         <div className="space-y-2 text-sm">
-                            {isLoading ? <p className="animate-pulse">AI is thinking...</p> : 
+                            {isLoading ? (
+                                <>
+                                    <p className="animate-pulse">AI is thinking...</p>
+                                    {searchInfo && (
+                                        <>
+                                            <p><span className="font-bold text-gray-300">Depth:</span> {searchInfo.depth}{searchInfo.event === 'root_move' ? ` (move ${searchInfo.move_number}/${searchInfo.moves})` : ''}</p>
+                                            <p><span className="font-bold text-gray-300">Best Move:</span> {searchInfo.best_move.from} to {searchInfo.best_move.to}</p>
+                                            <p><span className="font-bold text-gray-300">Score:</span> {searchInfo.score}{searchInfo.mate_in ? ` (mate in ${searchInfo.mate_in})` : ''}</p>
+                                            <p><span className="font-bold text-gray-300">Nodes:</span> {searchInfo.nodes} ({searchInfo.nps} nodes/s)</p>
+                                        </>
+                                    )}
+                                    {searchSocketRef.current && <button onClick={handleStopSearch} className="px-4 py-2 bg-yellow-600 rounded hover:bg-yellow-500 font-semibold">Stop and Move</button>}
+                                </>
+                            ) : 
                              analysisInfo ? (
                                 <>
                                     <p><span className="font-bold text-gray-300">AI Move:</span> {analysisInfo.from} to {analysisInfo.to}</p>